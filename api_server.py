@@ -0,0 +1,246 @@
+"""
+Async HTTP API over the document search backends.
+
+Exposes search, document-by-name, related-documents and summary endpoints on
+one aiohttp event loop. Blocking SDK calls run on a thread pool and go through
+the same functions and process-wide caches as the Streamlit app.
+
+    python api_server.py --port 8080
+
+    GET /search?q=annual+report&top=20&skip=0&content=1
+    GET /documents/{name}
+    GET /related?people=...&organizations=...&locations=...
+    GET /summary/{name}?stream=1
+    GET /cache/stats
+    GET /prompt/stats
+    GET /routing/stats
+"""
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator
+
+from aiohttp import web
+
+from caches import ALL_CACHES, summary_cache
+from graph_explore import entities_by_label
+from model_routing import summary_router
+from prompt_compaction import compaction_stats
+from groq_analyzer import (
+    DEFAULT_MODEL_NAME, GroqAnalyzer, get_summary, store_summary, stored_summary, summary_cache_key
+)
+from search_core import (
+    cached_search, create_gremlin_client, create_search_client, fetch_document,
+    fetch_related_documents, project_metadata
+)
+
+MAX_TOP = 1000
+
+
+def _json_response(data, status: int = 200) -> web.Response:
+    return web.json_response(data, status=status, dumps=lambda obj: json.dumps(obj, default=str))
+
+
+def _error(message: str, status: int) -> web.Response:
+    return _json_response({"error": message}, status=status)
+
+
+def _summarize_result(doc: dict, include_content: bool) -> dict:
+    """Compact representation of a search hit"""
+    result = {
+        "DocumentName": doc.get("DocumentName"),
+        "Library": doc.get("Library"),
+        "score": doc.get("@search.score"),
+        "metadata": project_metadata(doc),
+        "people": doc.get("people") or [],
+        "organizations": doc.get("organizations") or [],
+        "locations": doc.get("locations") or [],
+    }
+    if include_content:
+        result["merged_content"] = doc.get("merged_content")
+    return result
+
+
+async def _run_blocking(func: Callable, *args):
+    """Run a blocking backend call on the thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+async def _iterate_in_thread(make_iterator: Callable[[], Iterator[str]]) -> AsyncIterator[str]:
+    """Consume a blocking iterator on the thread pool, yielding items on the event loop"""
+    loop = asyncio.get_running_loop()
+    items: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for item in make_iterator():
+                loop.call_soon_threadsafe(items.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(items.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(items.put_nowait, done)
+
+    loop.run_in_executor(None, produce)
+    while True:
+        item = await items.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def handle_search(request: web.Request) -> web.Response:
+    search_text = request.query.get("q", "").strip()
+    if not search_text:
+        return _error("Missing query parameter 'q'", 400)
+    try:
+        top = min(int(request.query.get("top", 50)), MAX_TOP)
+        skip = int(request.query.get("skip", 0))
+    except ValueError:
+        return _error("'top' and 'skip' must be integers", 400)
+    if top < 0 or skip < 0:
+        return _error("'top' and 'skip' must not be negative", 400)
+    include_content = request.query.get("content") in ("1", "true")
+
+    try:
+        results = await _run_blocking(cached_search, request.app["search_client"], search_text, top, skip)
+    except Exception as e:
+        return _error(f"Search failed: {str(e)}", 502)
+    return _json_response({
+        "count": len(results),
+        "results": [_summarize_result(doc, include_content) for doc in results],
+    })
+
+
+async def handle_document(request: web.Request) -> web.Response:
+    doc_name = request.match_info["name"]
+    try:
+        doc = await _run_blocking(fetch_document, request.app["search_client"], doc_name)
+    except Exception as e:
+        return _error(f"Search failed: {str(e)}", 502)
+    if doc is None:
+        return _error(f"Document not found: {doc_name}", 404)
+    return _json_response(doc)
+
+
+async def handle_related(request: web.Request) -> web.Response:
+    entities = entities_by_label(
+        request.query.getall("people", []),
+        request.query.getall("organizations", []),
+        request.query.getall("locations", [])
+    )
+    if not any(entities.values()):
+        return _error("Provide at least one of 'people', 'organizations' or 'locations'", 400)
+    try:
+        results, cost, used_cheap_plan = await _run_blocking(
+            fetch_related_documents, request.app["gremlin_client"], entities
+        )
+    except Exception as e:
+        return _error(f"Error querying related documents: {str(e)}", 502)
+    return _json_response({"count": len(results), "results": results, "cost": cost,
+                           "reduced": used_cheap_plan})
+
+
+async def handle_summary(request: web.Request) -> web.StreamResponse:
+    doc_name = request.match_info["name"]
+    try:
+        doc = await _run_blocking(fetch_document, request.app["search_client"], doc_name)
+    except Exception as e:
+        return _error(f"Search failed: {str(e)}", 502)
+    if doc is None:
+        return _error(f"Document not found: {doc_name}", 404)
+
+    analyzer = request.app["groq_analyzer"]
+    content = doc.get("merged_content") or ""
+    if request.query.get("stream") not in ("1", "true"):
+        try:
+            summary = await _run_blocking(get_summary, analyzer, doc_name, content)
+        except Exception as e:
+            return _error(f"Error generating summary: {str(e)}", 502)
+        return _json_response({"DocumentName": doc_name, "summary": summary})
+
+    response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8"})
+    await response.prepare(request)
+
+    key = summary_cache_key(doc_name, content)
+    found, summary = summary_cache.get(key)
+    if not found:
+        summary = await _run_blocking(stored_summary, doc_name, content)
+        found = summary is not None
+        if found:
+            summary_cache.set(key, summary)
+    if found:
+        await response.write(summary.encode())
+        await response.write_eof()
+        return response
+
+    chunks = []
+    route = analyzer.route(content)
+    try:
+        async for chunk in _iterate_in_thread(lambda: analyzer.stream_summary(content, route)):
+            chunks.append(chunk)
+            await response.write(chunk.encode())
+    except Exception as e:
+        await response.write(f"\nError generating summary: {str(e)}".encode())
+    else:
+        # Only complete summaries are shared with the app
+        summary = "".join(chunks)
+        summary_cache.set(key, summary)
+        await _run_blocking(store_summary, doc_name, content, summary, route.model)
+    await response.write_eof()
+    return response
+
+
+async def handle_cache_stats(request: web.Request) -> web.Response:
+    return _json_response([cache.stats() for cache in ALL_CACHES])
+
+
+async def handle_prompt_stats(request: web.Request) -> web.Response:
+    return _json_response(compaction_stats.stats())
+
+
+async def handle_routing_stats(request: web.Request) -> web.Response:
+    return _json_response(summary_router.stats())
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return _json_response({"status": "ok"})
+
+
+def create_app(workers: int = 16) -> web.Application:
+    app = web.Application()
+
+    async def on_startup(app: web.Application):
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=workers))
+        app["search_client"] = create_search_client()
+        app["gremlin_client"] = create_gremlin_client()
+        app["groq_analyzer"] = GroqAnalyzer(api_key=os.getenv("GROQ_API_KEY"), model_name=DEFAULT_MODEL_NAME,
+                                            router=summary_router)
+
+    async def on_cleanup(app: web.Application):
+        app["gremlin_client"].close()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/search", handle_search)
+    app.router.add_get("/documents/{name}", handle_document)
+    app.router.add_get("/related", handle_related)
+    app.router.add_get("/summary/{name}", handle_summary)
+    app.router.add_get("/cache/stats", handle_cache_stats)
+    app.router.add_get("/prompt/stats", handle_prompt_stats)
+    app.router.add_get("/routing/stats", handle_routing_stats)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the document search API")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=16, help="Threads for blocking backend calls")
+    args = parser.parse_args()
+    web.run_app(create_app(args.workers), host=args.host, port=args.port)
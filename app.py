@@ -1,55 +1,51 @@
 import streamlit as st
 import os
-from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
-from dotenv import load_dotenv
-from gremlin_python.driver import client, serializer
-from groq import Groq
 from typing import Dict, List
 import hashlib
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
 from PIL import Image
 import base64
+from dedup import find_near_duplicates, find_related_near_duplicates
+from document_open import open_document
+from entity_index import get_entity_index, split_by_label
+from entity_network import MAX_DOCUMENTS, build_network, get_layout, network_documents, network_figure
+from library_schema import LIBRARY_SCHEMAS, FilterError, compile_filter, effective_capability, filter_fields
+from groq_analyzer import DEFAULT_MODEL_NAME, GroqAnalyzer
+from model_routing import summary_router
+from search_core import (
+    LIBRARY_METADATA_FIELDS, ConfigurationError, create_gremlin_client,
+    create_search_client, fetch_document, fetch_index_capabilities, fetch_related_documents, project_metadata
+)
+from resilience import gremlin_backend, search_backend
+from result_frame import view_positions
+from result_set import ResultSet
+from search_executor import LatestSearch, run_search_job
+from suggest import get_suggestions
+from query_log import count_backend_calls, log_related, log_search, result_libraries
+from session_memory import (
+    EVICTED_KEY, IDLE_EVICT_SECONDS, process_rss_bytes, register_current_session,
+    session_registry, start_session_sweeper
+)
+from warm_up import start_background_warm_up
+from gremlin_cost import cost_tracker, get_session_budget
+from graph_explore import (
+    DEFAULT_DOCUMENT_FANOUT, DEFAULT_ENTITY_FANOUT, LOCATION_LABEL, MAX_HOPS,
+    ORGANIZATION_LABEL, PEOPLE_LABEL, entities_by_label, explore_related_documents
+)
 
 
+# Icons of the entity types in entity search results
+ENTITY_ICONS = {PEOPLE_LABEL: "👤", ORGANIZATION_LABEL: "🏢", LOCATION_LABEL: "📍"}
+
 # Configure Streamlit page
 st.set_page_config(page_title="Document Search System", layout="wide")
 
-class GroqAnalyzer:
-    def __init__(self, api_key: str, model_name: str):
-        """Initialize Groq analyzer with API key"""
-        self.client = Groq(api_key=api_key)
-        self.model_name = model_name
-
-    def generate_summary(self, content: str) -> str:
-        """Generate a concise summary of document content"""
-        content_words = len(content.split())
-        
-        if content_words < 500:
-            points = "three"
-        elif content_words < 1000:
-            points = "five"
-        else:
-            points = "seven"
-            
-        prompt = f"""Analyze the following document content and provide a {points}-point summary:
-        Document Content: {content[:4000]}  # Limit content length
-        
-        Provide a clear, bullet-point summary that includes {points} main points.
-        Make each point concise but informative."""
-
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "You are a document analysis expert that provides clear, structured summaries in bullet points."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            return f"Error generating summary: {str(e)}"
+# How often a pending background search is checked while the script waits
+SEARCH_POLL_SECONDS = 0.1
+# Related documents listed under an open document
+RELATED_PREVIEW_ROWS = 5
 
 def get_hash(text):
     """Generate a unique hash for vertex IDs"""
@@ -73,45 +69,23 @@ def get_image_base64(image_path):
 def init_gremlin_client():
     """Initialize Gremlin client"""
     try:
-        gremlin_client = client.Client(
-            f'wss://{os.getenv("GREMLIN_HOST")}:{os.getenv("GREMLIN_PORT")}/',
-            'g',
-            username=f'/dbs/{os.getenv("GREMLIN_DATABASE")}/colls/{os.getenv("GREMLIN_COLLECTION")}',
-            password=os.getenv("GREMLIN_PASSWORD"),
-            message_serializer=serializer.GraphSONSerializersV2d0()
-        )
-        return gremlin_client
+        return create_gremlin_client()
     except Exception as e:
         st.error(f"Failed to initialize Gremlin client: {str(e)}")
         st.stop()
 
 def init_azure_search():
     """Initialize Azure Search client with proper error handling"""
-    # Load environment variables
-    load_dotenv()
-    
-    # Get Azure Search configurations
-    search_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
-    search_key = os.getenv("AZURE_SEARCH_API_KEY")
-    index_name = os.getenv("AZURE_SEARCH_INDEX_NAME")
-    
-    # Validate credentials
-    if not all([search_endpoint, search_key, index_name]):
+    try:
+        return create_search_client()
+    except ConfigurationError:
         st.error("""
         Missing Azure Search credentials. Please ensure you have a .env file with:
-        - AZURE_SEARCH_ENDPOINT
-        - AZURE_SEARCH_KEY
+        - AZURE_SEARCH_SERVICE_ENDPOINT
+        - AZURE_SEARCH_API_KEY
         - AZURE_SEARCH_INDEX_NAME
         """)
         st.stop()
-    
-    try:
-        # Initialize the search client
-        credential = AzureKeyCredential(search_key)
-        client = SearchClient(endpoint=search_endpoint,
-                            index_name=index_name,
-                            credential=credential)
-        return client
     except Exception as e:
         st.error(f"Failed to initialize Azure Search client: {str(e)}")
         st.stop()
@@ -121,7 +95,8 @@ def init_groq():
     try:
         analyzer = GroqAnalyzer(
             api_key=os.getenv("GROQ_API_KEY"),
-            model_name="llama-3.3-70b-versatile"
+            model_name=DEFAULT_MODEL_NAME,
+            router=summary_router
         )
         return analyzer
     except Exception as e:
@@ -159,101 +134,83 @@ def init_session_state():
         st.session_state.document_summaries = {}
     if 'viewing_document' not in st.session_state:
         st.session_state.viewing_document = False
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    if 'last_search_key' not in st.session_state:
+        st.session_state.last_search_key = None
+    if 'exploration_results' not in st.session_state:
+        st.session_state.exploration_results = []
+    if 'gremlin_ru_spent' not in st.session_state:
+        st.session_state.gremlin_ru_spent = 0.0
+    if 'latest_search' not in st.session_state:
+        st.session_state.latest_search = LatestSearch()
+    if 'opening_document' not in st.session_state:
+        st.session_state.opening_document = None
 
-def search_documents(client, search_text):
+def search_documents(search_text, rerank, search_filter=None):
     """
-    Search documents using Azure Search
+    Search documents using Azure Search on a background worker. A newer query
+    from this session supersedes any search still in flight, so only the
+    newest results are ever rendered.
     """
+    latest_search = st.session_state.latest_search
+    search_key = (search_text, rerank, search_filter)
+    if latest_search.pending_key != search_key:
+        search_client = st.session_state.search_client
+        latest_search.submit(search_key, lambda: run_search_job(search_client, search_text, rerank, search_filter))
+    
+    # Wait in short polls: each status update lets Streamlit stop this run for a newer query
+    status = st.empty()
+    started = time.perf_counter()
+    while True:
+        future = latest_search.wait(SEARCH_POLL_SECONDS)
+        if future is not None:
+            break
+        status.caption(f"Searching... {time.perf_counter() - started:.1f}s")
+    status.empty()
+    if not latest_search.finish(future):
+        return None
+    
     try:
-        results = client.search(
-            search_text,
-            select=[
-                # Basic fields
-                "DocumentName", "Library", "merged_content", 
-                "people", "organizations", "locations",
-                
-                # General library fields
-                "Doc_Type_General", "Date_General", "Remarks_General",
-                
-                # HR library fields
-                "Employee_No_HR", "Department_HR", "Document_Type_HR", 
-                "Name_HR", "Date_HR", "Country_HR",
-                
-                # Florix library fields
-                "Document_Type_Florix", "Remarks_Florix",
-                
-                # DFTROPIO library fields
-                "SERIAL_NO_DFTROPIO", "Name_DFTROPIO", "DOB_DFTROPIO",
-                "BOOK_CATEGORY_DFTROPIO", "DESCRIPTION_DFTROPIO",
-                "VOLUME_NUMBER_DFTROPIO", "SERIAL_RANGE_DFTROPIO", "ACT_NUMBER_DFTROPIO",
-                
-                # Finance library fields
-                "Document_ID_Finance", "Document_Type_Finance", 
-                "Date_Finance", "Info_Finance",
-                
-                # Ayala Annual Report library fields
-                "Name_Ayala_Annual_Report", "Year_Ayala_Annual_Report",
-                "DocumentType_Ayala_Annual_Report", "Remarks_Ayala_Annual_Report",
-                
-                # Ayala Legal Docs library fields
-                "Name_Ayala_Legal_Docs", "DocumentType_Ayala_Legal_Docs",
-                "Remarks_Ayala_Legal_Docs"
-            ],
-            include_total_count=True
-        )
-        return list(results)  # Convert to list to make it reusable
+        outcome = future.result()
     except Exception as e:
         st.error(f"Search failed: {str(e)}")
         return []
+    if outcome.stale:
+        st.warning("Azure Search is not responding: showing earlier results for this query.")
+    log_search(search_text, outcome.latency_ms, len(outcome.results),
+               libraries=result_libraries(outcome.results),
+               payload_chars=sum(len(doc.get('merged_content') or '') for doc in outcome.results),
+               backend_calls=outcome.backend_calls, rerank=rerank, filter=search_filter)
+    return outcome.results
 
-def get_related_documents(gremlin_client, selected_people, selected_organizations, selected_locations):
-    """Get documents related to selected entities using Gremlin query"""
+def get_related_documents(gremlin_client, selected_people, selected_organizations, selected_locations,
+                          limit=None):
+    """Get documents related to selected entities using Gremlin query, the top `limit` if given"""
     try:
-        # Convert sets to lists for Gremlin query
-        people_list = list(selected_people)
-        orgs_list = list(selected_organizations)
-        locations_list = list(selected_locations)
+        entities = entities_by_label(selected_people, selected_organizations, selected_locations)
         
-        # Only proceed if there are selected entities
-        if not (people_list or orgs_list or locations_list):
-            return []
-            
-        # Build the OR conditions dynamically based on which lists have items
-        or_conditions = []
-        if people_list:
-            # Using 'peopl' to match your database label
-            or_conditions.append(f"has('name', within({str(people_list)})).hasLabel('peopl')")
-        if orgs_list:
-            or_conditions.append(f"has('name', within({str(orgs_list)})).hasLabel('organization')")
-        if locations_list:
-            or_conditions.append(f"has('name', within({str(locations_list)})).hasLabel('location')")
-            
-        # Join the conditions with .or()
-        or_clause = ".or(" + ",".join(or_conditions) + ")"
-        
-        # Construct the complete query
-        query = f"""
-        g.V()
-        .hasLabel('document')
-        .where(
-            out('mentions')
-            {or_clause}
-        )
-        .project('document', 'library', 'matched_entities')
-        .by('name')
-        .by(out('belongs_to').values('name'))
-        .by(
-            out('mentions')
-            .group()
-            .by('type')
-            .by(values('name').fold())
-        )
-        """
-        
-        print(f"Executing query: {query}")  # For debugging
+        # Budget-aware, cached lookup of documents mentioning any selected entity
+        started = time.perf_counter()
+        with count_backend_calls() as calls:
+            result, cost, used_cheap_plan = fetch_related_documents(
+                gremlin_client,
+                entities,
+                session_spent=st.session_state.get('gremlin_ru_spent', 0.0),
+                limit=limit
+            )
+        log_related(entities, (time.perf_counter() - started) * 1000, len(result),
+                    libraries=result_libraries(result, key='library'),
+                    payload_chars=len(str(result)), backend_calls=dict(calls),
+                    request_charge=cost['request_charge'], reduced=used_cheap_plan)
+        if used_cheap_plan:
+            st.warning("Session RU budget reached: showing a reduced set of related documents.")
+        if cost.get('stale'):
+            st.warning("The graph database is not responding: showing earlier results for this selection.")
         
-        # Execute query
-        result = gremlin_client.submit(query).all().result()
+        st.session_state.gremlin_ru_spent = st.session_state.get('gremlin_ru_spent', 0.0) + cost['request_charge']
+        print(f"Gremlin query: {cost['request_charge']} RU, {cost['server_time_ms']} ms server, "
+              f"{cost['results']} results")  # For debugging
         
         return result
     except Exception as e:
@@ -261,17 +218,81 @@ def get_related_documents(gremlin_client, selected_people, selected_organization
         print(f"Full error: {e}")  # For debugging
         return []
 
-def group_by_library(search_results):
-    """
-    Group search results by library
-    """
-    library_groups = {}
-    for result in search_results:
-        library = result.get('Library', 'Unknown Library')
-        if library not in library_groups:
-            library_groups[library] = []
-        library_groups[library].append(result)
-    return library_groups
+def display_backend_status():
+    """Warn in the sidebar about backends whose circuit breaker is not closed"""
+    for backend in (search_backend, gremlin_backend):
+        state = backend.breaker.state
+        if state != "closed":
+            st.sidebar.warning(f"{backend.name} is failing (circuit {state}); cached results are shown where available.")
+
+def display_ru_report():
+    """Display aggregated Gremlin RU usage in the sidebar"""
+    with st.sidebar.expander("Gremlin RU Usage", expanded=False):
+        session_budget = get_session_budget()
+        spent = st.session_state.gremlin_ru_spent
+        if session_budget:
+            st.write(f"This session: {spent:.1f} / {session_budget:.0f} RU")
+        else:
+            st.write(f"This session: {spent:.1f} RU")
+        
+        report = cost_tracker.report(by="selection")
+        if report:
+            st.write("**Most expensive entity selections**")
+            st.dataframe(report, hide_index=True, use_container_width=True)
+        else:
+            st.write("No Gremlin queries recorded yet.")
+
+def display_session_memory():
+    """Admin view of per-session memory, shown with ?admin=<ADMIN_TOKEN>"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token or st.query_params.get("admin") != admin_token:
+        return
+    with st.sidebar.expander("Session Memory (admin)", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Measure now", key="measure_sessions"):
+                session_registry.measure_all()
+        with col2:
+            if st.button("Evict idle", key="evict_sessions"):
+                stats = session_registry.sweep(IDLE_EVICT_SECONDS)
+                st.write(f"Evicted {stats['evicted']} sessions, freed {stats['freed_bytes'] / 1024 ** 2:.1f} MB")
+
+        rows = session_registry.report()
+        total_mb = sum(row["state_kb"] for row in rows) / 1024
+        rss = process_rss_bytes()
+        st.write(f"{len(rows)} sessions, {total_mb:.1f} MB of session state"
+                 + (f", process RSS {rss / 1024 ** 2:.0f} MB" if rss else ""))
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+
+def restore_evicted_state():
+    """Fetch again the payloads evicted while this session was idle"""
+    evicted = st.session_state.get(EVICTED_KEY)
+    if not evicted:
+        return
+    st.session_state[EVICTED_KEY] = {}
+    with st.spinner("Restoring your session..."):
+        if "search_results" in evicted and st.session_state.last_search_key:
+            search_text, rerank, search_filter = st.session_state.last_search_key
+            try:
+                outcome = run_search_job(st.session_state.search_client, search_text or "*", rerank, search_filter)
+                st.session_state.search_results = ResultSet(outcome.results)
+            except Exception as e:
+                st.error(f"Search failed: {str(e)}")
+        if "similar_docs" in evicted and st.session_state.similar_doc_history:
+            entities = st.session_state.similar_doc_history[-1]['entities']
+            st.session_state.similar_docs = get_related_documents(
+                st.session_state.gremlin_client,
+                set(entities['people']),
+                set(entities['organizations']),
+                set(entities['locations'])
+            )
+        doc_name = evicted.get("current_doc_content")
+        if doc_name:
+            try:
+                st.session_state.current_doc_content = fetch_document(st.session_state.search_client, doc_name)
+            except Exception as e:
+                st.error(f"Search failed: {str(e)}")
 
 def display_header():
     """Display the Enadoc logo and AI Document Search title at the top with minimal spacing"""
@@ -477,155 +498,184 @@ def apply_table_styles():
     </style>
     """, unsafe_allow_html=True)
 
-def display_document_content(doc, doc_id, is_similar_view=False):
-    """Display document content and entities with selectable checkboxes in organized tiles"""
-    # Keep document name in a variable but don't display it
-    doc_name = doc.get('DocumentName', 'Untitled Document')
-    # Store the document name but hide it with CSS
-    st.markdown(f'<div class="document-title" style="display: none;">{doc_name}</div>', unsafe_allow_html=True)
-    
-    # ----- DOCUMENT SUMMARY SECTION -----
-    st.markdown('<div class="document-section">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">Document Summary</div>', unsafe_allow_html=True)
-    
-    # Generate or retrieve document summary
-    if doc_name not in st.session_state.document_summaries:
-        with st.spinner("Generating document summary..."):
-            content = doc.get('merged_content', '')
-            summary = st.session_state.groq_analyzer.generate_summary(content)
-            st.session_state.document_summaries[doc_name] = summary
-    
-    # Display the summary
-    st.markdown(st.session_state.document_summaries[doc_name])
-    
-    # Add expander for full content
-    with st.expander("View Full Document Content", expanded=False):
-        st.write(doc.get('merged_content', 'Content not available'))
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    # ----- DOCUMENT METADATA SECTION -----
-    st.markdown('<div class="document-section">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">Document Metadata</div>', unsafe_allow_html=True)
+def open_similar_documents():
+    """Switch to the similar documents of the selected entities"""
+    st.session_state.show_similar_docs = True
+    st.session_state.viewing_document = False  # Exit document view
+    st.session_state.search_results = None  # Clear previous search results
+    
+    # Add current selections to history
+    st.session_state.similar_doc_history.append({
+        'entities': {
+            'people': list(st.session_state.selected_people),
+            'organizations': list(st.session_state.selected_organizations),
+            'locations': list(st.session_state.selected_locations)
+        }
+    })
     
-    library = doc.get('Library', 'Unknown')
+    related_docs = get_related_documents(
+        st.session_state.gremlin_client,
+        st.session_state.selected_people,
+        st.session_state.selected_organizations,
+        st.session_state.selected_locations
+    )
     
-    # Function to create a Streamlit native table from metadata dictionary
-    def display_metadata_table(metadata_dict):
-        # Create a clean table using Streamlit columns with an empty column to adjust spacing
-        for field, value in metadata_dict.items():
-            # Add a third column that's empty, which can push the first two closer together
-            col1, col2, col3 = st.columns([0.8, 1, 2], gap="small")
-            with col1:
-                st.markdown(f"**{field}:**")
-            with col2:
-                st.write(value)
-            with col3:
-                # Empty column to adjust layout
-                pass
-        
-    if library == "General":
-        # Create metadata dictionary
-        metadata = {
-            "Document Type": doc.get('Doc_Type_General') or "N/A",
-            "Date": doc.get('Date_General') or "N/A",
-            "Remarks": doc.get('Remarks_General') or "N/A"
-        }
-        
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "HR":
-        # Create metadata dictionary
-        metadata = {
-            "Employee Number": doc.get('Employee_No_HR') or "N/A",
-            "Department": doc.get('Department_HR') or "N/A",
-            "Document Type": doc.get('Document_Type_HR') or "N/A",
-            "Name": doc.get('Name_HR') or "N/A",
-            "Date": doc.get('Date_HR') or "N/A",
-            "Country": doc.get('Country_HR') or "N/A"
-        }
+    if related_docs:
+        st.session_state.similar_docs = related_docs
+    else:
+        st.session_state.similar_docs = []
+    st.session_state.exploration_results = []
+    st.experimental_rerun()
+
+def display_metadata_filters():
+    """Library and metadata filter widgets. Returns the compiled OData filter, or None."""
+    with st.expander("Filter by library and metadata", expanded=False):
+        library = st.selectbox("Library", ["All libraries"] + list(LIBRARY_SCHEMAS), key="filter_library")
+        if library not in LIBRARY_SCHEMAS:
+            return None
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "Florix":
-        # Create metadata dictionary
-        metadata = {
-            "Document Type": doc.get('Document_Type_Florix') or "N/A",
-            "Remarks": doc.get('Remarks_Florix') or "N/A"
-        }
+        # Filterable/searchable attributes of the live index, where readable
+        capabilities = fetch_index_capabilities()
+        values = {}
+        for field in filter_fields(LIBRARY_SCHEMAS[library], capabilities):
+            if field.kind == "range":
+                col1, col2 = st.columns(2)
+                with col1:
+                    low = st.text_input(f"{field.label} from", key=f"filter_{field.field}_from")
+                with col2:
+                    high = st.text_input(f"{field.label} to", key=f"filter_{field.field}_to")
+                values[field.field] = (low, high)
+            else:
+                exact = effective_capability(field, capabilities).filterable
+                hint = "exact values, comma-separated" if exact else "contains any of, comma-separated"
+                values[field.field] = st.text_input(f"{field.label} ({hint})", key=f"filter_{field.field}")
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "DFTROPIO":
-        # Create metadata dictionary
-        metadata = {
-            "Serial No": doc.get('SERIAL_NO_DFTROPIO') or "N/A",
-            "Name": doc.get('Name_DFTROPIO') or "N/A",
-            "DOB": doc.get('DOB_DFTROPIO') or "N/A",
-            "Book Category": doc.get('BOOK_CATEGORY_DFTROPIO') or "N/A",
-            "Description": doc.get('DESCRIPTION_DFTROPIO') or "N/A",
-            "Volume Number": doc.get('VOLUME_NUMBER_DFTROPIO') or "N/A",
-            "Serial Range": doc.get('SERIAL_RANGE_DFTROPIO') or "N/A",
-            "Act Number": doc.get('ACT_NUMBER_DFTROPIO') or "N/A"
-        }
+        try:
+            search_filter = compile_filter(library, values, capabilities)
+        except FilterError as e:
+            try:
+                search_filter = compile_filter(library, {}, capabilities)
+                st.warning(f"{str(e)}; filtering by library only.")
+            except FilterError as library_error:
+                st.warning(f"{str(library_error)}; searching without a filter.")
+                return None
+        st.caption(f"Filter: `{search_filter}`")
+        return search_filter
+
+def display_entity_search():
+    """Find related documents straight from fuzzy-matched entity names, without opening a document"""
+    with st.expander("Search by person, organization or location", expanded=False):
+        # Starts the background index build on first use
+        index = get_entity_index(st.session_state.gremlin_client)
+        entity_query = st.text_input("Entity name", key="entity_query")
+        if not entity_query:
+            return
+        if index is None:
+            st.info("Loading entity names, please try again in a moment.")
+            return
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "Finance":
-        # Create metadata dictionary
-        metadata = {
-            "Document ID": doc.get('Document_ID_Finance') or "N/A",
-            "Document Type": doc.get('Document_Type_Finance') or "N/A",
-            "Date": doc.get('Date_Finance') or "N/A",
-            "Info": doc.get('Info_Finance') or "N/A"
-        }
+        matches = index.search(entity_query)
+        if not matches:
+            st.write("No matching people, organizations or locations.")
+            return
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "Ayala_Annual_Report":
-        # Create metadata dictionary
-        metadata = {
-            "Name": doc.get('Name_Ayala_Annual_Report') or "N/A",
-            "Year": doc.get('Year_Ayala_Annual_Report') or "N/A",
-            "Document Type": doc.get('DocumentType_Ayala_Annual_Report') or "N/A",
-            "Remarks": doc.get('Remarks_Ayala_Annual_Report') or "N/A"
-        }
+        chosen = []
+        for match in matches:
+            if st.checkbox(f"{ENTITY_ICONS.get(match.label, '')} {match.name}",
+                           key=f"entity_match_{match.label}_{match.name}"):
+                chosen.append(match)
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    elif library == "Ayala_Legal_Docs":
-        # Create metadata dictionary
-        metadata = {
-            "Name": doc.get('Name_Ayala_Legal_Docs') or "N/A",
-            "Document Type": doc.get('DocumentType_Ayala_Legal_Docs') or "N/A",
-            "Remarks": doc.get('Remarks_Ayala_Legal_Docs') or "N/A"
-        }
+        if st.button("Find Related Documents", key="entity_search_related", disabled=not chosen):
+            # Every spelling of a chosen name is looked up, since the graph needs exact names
+            entities = split_by_label(chosen)
+            st.session_state.selected_people = entities[PEOPLE_LABEL]
+            st.session_state.selected_organizations = entities[ORGANIZATION_LABEL]
+            st.session_state.selected_locations = entities[LOCATION_LABEL]
+            open_similar_documents()
+
+def start_document_open(doc_name, doc=None, hint=None):
+    """Start fetching, summarizing and the speculative related-documents query for a document"""
+    spent = st.session_state.get('gremlin_ru_spent', 0.0)
+    budget = get_session_budget()
+    return open_document(
+        st.session_state.search_client,
+        st.session_state.groq_analyzer,
+        st.session_state.gremlin_client,
+        doc_name,
+        doc=doc,
+        hint=hint,
+        summarize=doc_name not in st.session_state.document_summaries,
+        # Speculation is skipped once the session's RU budget is spent
+        speculate=not (budget and spent >= budget),
+        session_spent=spent
+    )
+
+def wait_for_document(futures, doc_name):
+    """Wait for the content of a document being opened. Returns the document, or None."""
+    status = st.empty()
+    started = time.perf_counter()
+    while not futures.content.done():
+        status.caption(f"Opening {doc_name}... {time.perf_counter() - started:.1f}s")
+        wait([futures.content], timeout=SEARCH_POLL_SECONDS)
+    status.empty()
+    try:
+        doc = futures.content.result()
+    except Exception as e:
+        st.error(f"Search failed: {str(e)}")
+        return None
+    if doc is None:
+        st.error(f"Document not found: {doc_name}")
+    return doc
+
+def display_summary(summary_slot, future, doc_name):
+    """Fill the summary section once the summary future completes"""
+    try:
+        summary = future.result()
+    except Exception as e:
+        summary = f"Error generating summary: {str(e)}"
+    st.session_state.document_summaries[doc_name] = summary
+    summary_slot.markdown(summary)
+
+def display_related_preview(related_slot, futures, doc_name, doc_id):
+    """Fill the related-documents section once the speculative query completes"""
+    with related_slot.container():
+        st.markdown('<div class="section-title">Related Documents</div>', unsafe_allow_html=True)
+        try:
+            results, cost, used_cheap_plan = futures.related.result()
+        except Exception as e:
+            st.caption(f"Related documents are not available: {str(e)}")
+            return
+        # Charge the session once per query, however many reruns waited on it
+        if not getattr(futures.related, 'charged', False):
+            futures.related.charged = True
+            st.session_state.gremlin_ru_spent = st.session_state.get('gremlin_ru_spent', 0.0) + cost['request_charge']
         
-        # Display metadata as Streamlit table
-        display_metadata_table(metadata)
-    
-    else:
-        st.write("No specific metadata fields available for this library type.")
-    
-    st.markdown('</div>', unsafe_allow_html=True)
-    
-    
-    # ----- ENTITIES IN DOCUMENT SECTION -----
-    st.markdown('<div class="document-section">', unsafe_allow_html=True)
-    st.markdown('<div class="section-title">Entities in Document</div>', unsafe_allow_html=True)
-    
-    # Reset entity selections if viewing a new document in similar view
-    if is_similar_view:
-        st.session_state.selected_people = set()
-        st.session_state.selected_organizations = set()
-        st.session_state.selected_locations = set()
-    
+        others = [row for row in results if row['document'] != doc_name]
+        entity_names = [name for names in futures.related_entities.values() for name in sorted(names)]
+        if not others:
+            st.caption("No other documents mention " + ", ".join(entity_names) + ".")
+            return
+        st.caption(f"{len(others)}{'+' if used_cheap_plan else ''} documents also mention "
+                   + ", ".join(entity_names))
+        for row in others[:RELATED_PREVIEW_ROWS]:
+            st.markdown(f'<span class="row-spacing">📄 {row["document"]} · {row.get("library") or "Unknown"}</span>',
+                        unsafe_allow_html=True)
+        if st.button("Show Related Documents", key=f"related_{doc_id}"):
+            # The results are already in the related-documents cache
+            entities = futures.related_entities
+            st.session_state.selected_people = set(entities[PEOPLE_LABEL])
+            st.session_state.selected_organizations = set(entities[ORGANIZATION_LABEL])
+            st.session_state.selected_locations = set(entities[LOCATION_LABEL])
+            open_similar_documents()
+
+@st.experimental_fragment
+def display_entity_picker(doc, doc_id):
+    """
+    Entity checkboxes, the current selection and the Clear / Find Similar buttons.
+    A fragment: ticking a checkbox reruns only this section. The selection is
+    handed to the rest of the app through the selected_* sets in session state,
+    and the buttons rerun the whole app.
+    """
     # Display extracted entities with checkboxes
     col1, col2, col3 = st.columns(3)
     
@@ -724,419 +774,253 @@ def display_document_content(doc, doc_id, is_similar_view=False):
             if (st.session_state.selected_people or 
                 st.session_state.selected_organizations or 
                 st.session_state.selected_locations):
-                
-                st.session_state.show_similar_docs = True
-                st.session_state.viewing_document = False  # Exit document view
-                st.session_state.search_results = None  # Clear previous search results
-                
-                # Add current selections to history
-                st.session_state.similar_doc_history.append({
-                    'entities': {
-                        'people': list(st.session_state.selected_people),
-                        'organizations': list(st.session_state.selected_organizations),
-                        'locations': list(st.session_state.selected_locations)
-                    }
-                })
-                
-                related_docs = get_related_documents(
-                    st.session_state.gremlin_client,
-                    st.session_state.selected_people,
-                    st.session_state.selected_organizations,
-                    st.session_state.selected_locations
-                )
-                
-                if related_docs:
-                    st.session_state.similar_docs = related_docs
-                else:
-                    st.session_state.similar_docs = []
-                st.experimental_rerun()
+                open_similar_documents()
             else:
                 st.warning("Please select at least one entity to find similar documents.")
         st.markdown('</div>', unsafe_allow_html=True)
     
     # Close the centered container
     st.markdown('</div>', unsafe_allow_html=True)
-    
-    st.markdown('</div>', unsafe_allow_html=True)  # Close entities section
-
-# -------- Library-Specific Display Functions with Reduced Line Spacing --------
 
-def display_general_library_table(documents):
-    """Display General library documents in table format with reduced spacing"""
-    # Using Streamlit columns for the table header
-    col1, col2, col3, col4 = st.columns([0.5, 2, 1.5, 2.5])
-    with col1:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with col2:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
-    with col3:
-        st.markdown('<p class="row-spacing"><b>Date</b></p>', unsafe_allow_html=True)
-    with col4:
-        st.markdown('<p class="row-spacing"><b>Remarks</b></p>', unsafe_allow_html=True)
+def display_document_content(doc, doc_id, is_similar_view=False, futures=None):
+    """
+    Display document content and entities with selectable checkboxes in organized tiles.
+    The summary and related documents are filled in as their background calls complete.
+    """
+    # Keep document name in a variable but don't display it
+    doc_name = doc.get('DocumentName', 'Untitled Document')
+    # Store the document name but hide it with CSS
+    st.markdown(f'<div class="document-title" style="display: none;">{doc_name}</div>', unsafe_allow_html=True)
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    if futures is None:
+        futures = start_document_open(doc_name, doc=doc)
     
-    # Add rows for each document
-    for idx, doc in enumerate(documents):
-        doc_id = f"General_{idx}"
-        
-        # Get metadata values, use 'N/A' if not available
-        doc_type = doc.get('Doc_Type_General') or "N/A"
-        date = doc.get('Date_General') or "N/A"
-        remarks = doc.get('Remarks_General') or "N/A"
-        
-        # Create row using columns with row-spacing class
-        col1, col2, col3, col4 = st.columns([0.5, 2, 1.5, 2.5])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{date}</span>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<span class="row-spacing">{remarks}</span>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
-
-def display_hr_library_table(documents):
-    """Display HR library documents in table format with reduced spacing"""
-    # Using Streamlit columns for the table header
-    col1, col2, col3, col4, col5, col6 = st.columns([0.5, 1, 1.5, 1.5, 1.5, 1])
-    with col1:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with col2:
-        st.markdown('<p class="row-spacing"><b>Emp #</b></p>', unsafe_allow_html=True)
-    with col3:
-        st.markdown('<p class="row-spacing"><b>Department</b></p>', unsafe_allow_html=True)
-    with col4:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
-    with col5:
-        st.markdown('<p class="row-spacing"><b>Name</b></p>', unsafe_allow_html=True)
-    with col6:
-        st.markdown('<p class="row-spacing"><b>Date</b></p>', unsafe_allow_html=True)
+    # ----- DOCUMENT SUMMARY SECTION -----
+    st.markdown('<div class="document-section">', unsafe_allow_html=True)
+    st.markdown('<div class="section-title">Document Summary</div>', unsafe_allow_html=True)
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    # Display the summary, or a placeholder until it is generated
+    summary_slot = st.empty()
+    if doc_name in st.session_state.document_summaries:
+        summary_slot.markdown(st.session_state.document_summaries[doc_name])
+    else:
+        summary_slot.caption("Generating document summary...")
     
-    # Display each document as a row
-    for idx, doc in enumerate(documents):
-        doc_id = f"HR_{idx}"
-        
-        # Get metadata values
-        emp_no = doc.get('Employee_No_HR') or "N/A"
-        dept = doc.get('Department_HR') or "N/A"
-        doc_type = doc.get('Document_Type_HR') or "N/A"
-        name = doc.get('Name_HR') or "N/A"
-        date = doc.get('Date_HR') or "N/A"
-        
-        # Create row using columns
-        col1, col2, col3, col4, col5, col6 = st.columns([0.5, 1, 1.5, 1.5, 1.5, 1])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{emp_no}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{dept}</span>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col5:
-            st.markdown(f'<span class="row-spacing">{name}</span>', unsafe_allow_html=True)
-        with col6:
-            st.markdown(f'<span class="row-spacing">{date}</span>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
-
-def display_florix_library_table(documents):
-    """Display Florix library documents in table format with reduced spacing"""
-    # Using Streamlit columns for the table header
-    col1, col2, col3 = st.columns([0.5, 2, 3])
-    with col1:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with col2:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
-    with col3:
-        st.markdown('<p class="row-spacing"><b>Remarks</b></p>', unsafe_allow_html=True)
+    # Add expander for full content
+    with st.expander("View Full Document Content", expanded=False):
+        st.write(doc.get('merged_content', 'Content not available'))
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    # Display each document as a row
-    for idx, doc in enumerate(documents):
-        doc_id = f"Florix_{idx}"
-        
-        # Get metadata values
-        doc_type = doc.get('Document_Type_Florix') or "N/A"
-        remarks = doc.get('Remarks_Florix') or "N/A"
-        
-        # Create row using columns
-        col1, col2, col3 = st.columns([0.5, 2, 3])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{remarks}</span>', unsafe_allow_html=True)
+    # ----- DOCUMENT METADATA SECTION -----
+    st.markdown('<div class="document-section">', unsafe_allow_html=True)
+    st.markdown('<div class="section-title">Document Metadata</div>', unsafe_allow_html=True)
+    
+    library = doc.get('Library', 'Unknown')
+    
+    # Function to create a Streamlit native table from metadata dictionary
+    def display_metadata_table(metadata_dict):
+        # Create a clean table using Streamlit columns with an empty column to adjust spacing
+        for field, value in metadata_dict.items():
+            # Add a third column that's empty, which can push the first two closer together
+            col1, col2, col3 = st.columns([0.8, 1, 2], gap="small")
+            with col1:
+                st.markdown(f"**{field}:**")
+            with col2:
+                st.write(value)
+            with col3:
+                # Empty column to adjust layout
+                pass
         
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
-
-def display_dftropio_library_table(documents):
-    """Display DFTROPIO library documents in table format with reduced spacing"""
-    # Create scrollable container
-    st.markdown('<div style="overflow-x: auto;">', unsafe_allow_html=True)
+    if library in LIBRARY_METADATA_FIELDS:
+        # Display metadata as Streamlit table
+        display_metadata_table(project_metadata(doc))
+    
+    else:
+        st.write("No specific metadata fields available for this library type.")
     
-    # Using Streamlit columns for the table header - adjust widths as needed
-    cols = st.columns([0.4, 0.8, 1.2, 0.8, 1, 1.2, 0.8, 1, 0.8])
+    st.markdown('</div>', unsafe_allow_html=True)
     
-    with cols[0]:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with cols[1]:
-        st.markdown('<p class="row-spacing"><b>Serial No</b></p>', unsafe_allow_html=True)
-    with cols[2]:
-        st.markdown('<p class="row-spacing"><b>Name</b></p>', unsafe_allow_html=True)
-    with cols[3]:
-        st.markdown('<p class="row-spacing"><b>DOB</b></p>', unsafe_allow_html=True)
-    with cols[4]:
-        st.markdown('<p class="row-spacing"><b>Book Category</b></p>', unsafe_allow_html=True)
-    with cols[5]:
-        st.markdown('<p class="row-spacing"><b>Description</b></p>', unsafe_allow_html=True)
-    with cols[6]:
-        st.markdown('<p class="row-spacing"><b>Volume No</b></p>', unsafe_allow_html=True)
-    with cols[7]:
-        st.markdown('<p class="row-spacing"><b>Serial Range</b></p>', unsafe_allow_html=True)
-    with cols[8]:
-        st.markdown('<p class="row-spacing"><b>Act Number</b></p>', unsafe_allow_html=True)
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    # ----- ENTITIES IN DOCUMENT SECTION -----
+    st.markdown('<div class="document-section">', unsafe_allow_html=True)
+    st.markdown('<div class="section-title">Entities in Document</div>', unsafe_allow_html=True)
     
-    # Display each document as a row with compact styling
-    for idx, doc in enumerate(documents):
-        doc_id = f"DFTROPIO_{idx}"
-        
-        # Get metadata values with fallback to N/A
-        serial_no = doc.get('SERIAL_NO_DFTROPIO') or "N/A"
-        name = doc.get('Name_DFTROPIO') or "N/A"
-        dob = doc.get('DOB_DFTROPIO') or "N/A"
-        book_category = doc.get('BOOK_CATEGORY_DFTROPIO') or "N/A"
-        description = doc.get('DESCRIPTION_DFTROPIO') or "N/A"
-        volume_number = doc.get('VOLUME_NUMBER_DFTROPIO') or "N/A"
-        serial_range = doc.get('SERIAL_RANGE_DFTROPIO') or "N/A"
-        act_number = doc.get('ACT_NUMBER_DFTROPIO') or "N/A"
-        
-        # Create row with all fields using columns
-        cols = st.columns([0.4, 0.8, 1.2, 0.8, 1, 1.2, 0.8, 1, 0.8])
-        
-        with cols[0]:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        
-        # Apply compact styling to each cell
-        with cols[1]:
-            st.markdown(f'<div class="compact-text row-spacing">{serial_no}</div>', unsafe_allow_html=True)
-        with cols[2]:
-            st.markdown(f'<div class="compact-text row-spacing">{name}</div>', unsafe_allow_html=True)
-        with cols[3]:
-            st.markdown(f'<div class="compact-text row-spacing">{dob}</div>', unsafe_allow_html=True)
-        with cols[4]:
-            st.markdown(f'<div class="compact-text row-spacing">{book_category}</div>', unsafe_allow_html=True)
-        with cols[5]:
-            st.markdown(f'<div class="compact-text row-spacing">{description}</div>', unsafe_allow_html=True)
-        with cols[6]:
-            st.markdown(f'<div class="compact-text row-spacing">{volume_number}</div>', unsafe_allow_html=True)
-        with cols[7]:
-            st.markdown(f'<div class="compact-text row-spacing">{serial_range}</div>', unsafe_allow_html=True)
-        with cols[8]:
-            st.markdown(f'<div class="compact-text row-spacing">{act_number}</div>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
+    # Reset entity selections if viewing a new document in similar view
+    if is_similar_view:
+        st.session_state.selected_people = set()
+        st.session_state.selected_organizations = set()
+        st.session_state.selected_locations = set()
     
-    # Close the scrollable container
-    st.markdown('</div>', unsafe_allow_html=True)
+    # Ticking an entity reruns only the picker
+    display_entity_picker(doc, doc_id)
+    
+    st.markdown('</div>', unsafe_allow_html=True)  # Close entities section
+    
+    # ----- RELATED DOCUMENTS SECTION -----
+    related_slot = st.empty()
+    if futures.related is not None:
+        related_slot.caption("Looking for related documents...")
+    
+    # Render the remaining sections in whichever order their calls complete
+    pending = {}
+    if futures.summary is not None and doc_name not in st.session_state.document_summaries:
+        pending[futures.summary] = lambda future: display_summary(summary_slot, future, doc_name)
+    if futures.related is not None:
+        pending[futures.related] = lambda future: display_related_preview(related_slot, futures, doc_name, doc_id)
+    while pending:
+        done, _ = wait(list(pending), timeout=SEARCH_POLL_SECONDS, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.pop(future)(future)
 
-def display_finance_library_table(documents):
-    """Display Finance library documents in table format with reduced spacing"""
-    # Using Streamlit columns for the table header
-    col1, col2, col3, col4, col5 = st.columns([0.5, 1.5, 1.5, 1, 2])
+# -------- Library Tables, Driven by the Library Schema Registry --------
+
+def display_table_controls(schema, frame):
+    """Sort, filter and group-by controls of a library table. Returns the rows to show as (group, positions)."""
+    columns = {field.column: field.field for field in schema.table_fields}
+    col1, col2, col3, col4 = st.columns([2, 1, 2, 2])
     with col1:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
+        sort_column = st.selectbox("Sort by", ["Relevance"] + list(columns), key=f"sort_{schema.name}")
     with col2:
-        st.markdown('<p class="row-spacing"><b>Document ID</b></p>', unsafe_allow_html=True)
+        descending = st.checkbox("Descending", key=f"descending_{schema.name}")
     with col3:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
+        contains = st.text_input("Filter rows", key=f"contains_{schema.name}")
     with col4:
-        st.markdown('<p class="row-spacing"><b>Date</b></p>', unsafe_allow_html=True)
-    with col5:
-        st.markdown('<p class="row-spacing"><b>Info</b></p>', unsafe_allow_html=True)
+        group_column = st.selectbox("Group by", ["None"] + list(columns), key=f"group_{schema.name}")
+    # In memory over the typed frame; Azure Search is not queried again
+    return view_positions(frame, columns.get(sort_column), descending, contains, columns.get(group_column)), group_column
+
+def display_library_table(schema, documents, keys, duplicates=None, frame=None):
+    """Display a library's documents as a table of its schema's columns, with reduced spacing"""
+    if frame is not None:
+        groups, group_column = display_table_controls(schema, frame)
+    else:
+        groups, group_column = [(None, list(range(len(documents))))], None
+    if not any(positions for _, positions in groups):
+        st.caption("No documents match the filter.")
+        return
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    fields = schema.table_fields
+    widths = [schema.view_width] + [field.width for field in fields]
+    cell_class = "compact-text row-spacing" if schema.compact else "row-spacing"
+    
+    if schema.compact:
+        # Create scrollable container
+        st.markdown('<div style="overflow-x: auto;">', unsafe_allow_html=True)
     
-    # Display each document as a row
-    for idx, doc in enumerate(documents):
-        doc_id = f"Finance_{idx}"
-        
-        # Get metadata values
-        document_id = doc.get('Document_ID_Finance') or "N/A"
-        doc_type = doc.get('Document_Type_Finance') or "N/A"
-        date = doc.get('Date_Finance') or "N/A"
-        info = doc.get('Info_Finance') or "N/A"
-        
-        # Create row using columns
-        col1, col2, col3, col4, col5 = st.columns([0.5, 1.5, 1.5, 1, 2])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{document_id}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<span class="row-spacing">{date}</span>', unsafe_allow_html=True)
-        with col5:
-            st.markdown(f'<span class="row-spacing">{info}</span>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
-
-def display_ayala_annual_report_library_table(documents):
-    """Display Ayala Annual Report library documents in table format with reduced spacing"""
     # Using Streamlit columns for the table header
-    col1, col2, col3, col4, col5 = st.columns([0.5, 2, 1, 1.5, 2])
-    with col1:
+    cols = st.columns(widths)
+    with cols[0]:
         st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with col2:
-        st.markdown('<p class="row-spacing"><b>Name</b></p>', unsafe_allow_html=True)
-    with col3:
-        st.markdown('<p class="row-spacing"><b>Year</b></p>', unsafe_allow_html=True)
-    with col4:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
-    with col5:
-        st.markdown('<p class="row-spacing"><b>Remarks</b></p>', unsafe_allow_html=True)
+    for col, field in zip(cols[1:], fields):
+        with col:
+            st.markdown(f'<p class="row-spacing"><b>{field.column}</b></p>', unsafe_allow_html=True)
     
     # Add a separator line
     st.markdown("<hr>", unsafe_allow_html=True)
     
-    # Display each document as a row
-    for idx, doc in enumerate(documents):
-        doc_id = f"Ayala_Annual_Report_{idx}"
-        
-        # Debug: Print what's actually in the document
-        print(f"DEBUG - Document keys: {list(doc.keys())}")
-        print(f"DEBUG - Ayala fields: Name={doc.get('Name_Ayala_Annual_Report')}, Year={doc.get('Year_Ayala_Annual_Report')}")
-
-        # Get metadata values
-        name = doc.get('Name_Ayala_Annual_Report') or "N/A"
-        year = doc.get('Year_Ayala_Annual_Report') or "N/A"
-        doc_type = doc.get('DocumentType_Ayala_Annual_Report') or "N/A"
-        remarks = doc.get('Remarks_Ayala_Annual_Report') or "N/A"
-        
-        # Create row using columns
-        col1, col2, col3, col4, col5 = st.columns([0.5, 2, 1, 1.5, 2])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
-                st.session_state.viewing_document = True
-                st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{name}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{year}</span>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col5:
-            st.markdown(f'<span class="row-spacing">{remarks}</span>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
+    # Near-duplicates are listed under their cluster representative
+    hidden = hidden_duplicates(duplicates)
+    
+    # Display each document as a row, group by group
+    for group, positions in groups:
+        if group is not None:
+            st.markdown(f'<p class="row-spacing"><b>{group_column}: {group}</b> ({len(positions)})</p>',
+                        unsafe_allow_html=True)
+        for idx in positions:
+            if idx not in hidden:
+                display_library_row(schema, documents, keys, duplicates, idx, widths, cell_class)
+    
+    if schema.compact:
+        # Close the scrollable container
+        st.markdown('</div>', unsafe_allow_html=True)
 
-def display_ayala_legal_docs_library_table(documents):
-    """Display Ayala Legal Docs library documents in table format with reduced spacing"""
-    # Using Streamlit columns for the table header
-    col1, col2, col3, col4 = st.columns([0.5, 2.5, 1.5, 2.5])
-    with col1:
-        st.markdown('<p class="row-spacing"><b>View</b></p>', unsafe_allow_html=True)
-    with col2:
-        st.markdown('<p class="row-spacing"><b>Name</b></p>', unsafe_allow_html=True)
-    with col3:
-        st.markdown('<p class="row-spacing"><b>Document Type</b></p>', unsafe_allow_html=True)
-    with col4:
-        st.markdown('<p class="row-spacing"><b>Remarks</b></p>', unsafe_allow_html=True)
+def display_library_row(schema, documents, keys, duplicates, idx, widths, cell_class):
+    """One document row of a library table, followed by its collapsed near-duplicates"""
+    doc = documents[idx]
+    doc_id = keys[idx]
+    fields = schema.table_fields
+    
+    # Create row using columns
+    cols = st.columns(widths)
+    with cols[0]:
+        if st.button("👁️", key=f"view_{doc_id}"):
+            st.session_state.selected_doc_id = doc_id
+            st.session_state.viewing_document = True
+            st.experimental_rerun()
+    for col, field in zip(cols[1:], fields):
+        with col:
+            # Metadata values with fallback to N/A
+            value = doc.get(field.field) or "N/A"
+            st.markdown(f'<span class="{cell_class}">{value}</span>', unsafe_allow_html=True)
     
-    # Add a separator line
-    st.markdown("<hr>", unsafe_allow_html=True)
+    display_duplicate_rows(idx, documents, keys, duplicates)
     
-    # Display each document as a row
-    for idx, doc in enumerate(documents):
-        doc_id = f"Ayala_Legal_Docs_{idx}"
-        
-        # Get metadata values
-        name = doc.get('Name_Ayala_Legal_Docs') or "N/A"
-        doc_type = doc.get('DocumentType_Ayala_Legal_Docs') or "N/A"
-        remarks = doc.get('Remarks_Ayala_Legal_Docs') or "N/A"
-        
-        # Create row using columns
-        col1, col2, col3, col4 = st.columns([0.5, 2.5, 1.5, 2.5])
-        with col1:
-            if st.button("👁️", key=f"view_{doc_id}"):
-                st.session_state.selected_doc_id = doc_id
+    # Add a light separator between rows with reduced margins
+    st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
+
+def hidden_duplicates(duplicates):
+    """Indices of documents shown only under their cluster representative"""
+    return {idx for members in (duplicates or {}).values() for idx in members}
+
+def display_duplicate_rows(idx, documents, keys, duplicates):
+    """Toggle listing the near-duplicates collapsed into this row"""
+    members = (duplicates or {}).get(idx)
+    if not members:
+        return
+    if st.checkbox(f"Show {len(members)} near-duplicate(s)", key=f"dups_{keys[idx]}"):
+        for dup_idx in members:
+            doc_name = documents[dup_idx].get('DocumentName', f'Document {dup_idx+1}')
+            if st.button(f"📄 {doc_name}", key=f"view_{keys[dup_idx]}"):
+                st.session_state.selected_doc_id = keys[dup_idx]
                 st.session_state.viewing_document = True
                 st.experimental_rerun()
-        with col2:
-            st.markdown(f'<span class="row-spacing">{name}</span>', unsafe_allow_html=True)
-        with col3:
-            st.markdown(f'<span class="row-spacing">{doc_type}</span>', unsafe_allow_html=True)
-        with col4:
-            st.markdown(f'<span class="row-spacing">{remarks}</span>', unsafe_allow_html=True)
-        
-        # Add a light separator between rows with reduced margins
-        st.markdown('<hr style="margin: 1px 0; border: 0; border-top: 1px solid #eee;">', unsafe_allow_html=True)
 
-def display_library_documents(library, documents):
-    """Display documents for a specific library with the appropriate table format"""
-    # Choose the appropriate display function based on the library
-    if library == "General":
-        display_general_library_table(documents)
-    elif library == "HR":
-        display_hr_library_table(documents)
-    elif library == "Florix":
-        display_florix_library_table(documents)
-    elif library == "DFTROPIO":
-        display_dftropio_library_table(documents)
-    elif library == "Finance":
-        display_finance_library_table(documents)
-    elif library == "Ayala_Annual_Report":
-        display_ayala_annual_report_library_table(documents)
-    elif library == "Ayala_Legal_Docs":
-        display_ayala_legal_docs_library_table(documents)
+@st.experimental_fragment
+def display_library_documents(library, documents, keys, duplicates=None, frame=None):
+    """
+    Display documents for a specific library with the appropriate table format.
+    A fragment: sorting, filtering and near-duplicate toggles rerun only this
+    table; opening a document reruns the whole app.
+    """
+    # Choose the table layout from the library's schema
+    schema = LIBRARY_SCHEMAS.get(library)
+    if schema is not None:
+        display_library_table(schema, documents, keys, duplicates, frame)
     else:
         # Default display for unknown libraries
         st.warning(f"No custom display format for library: {library}")
         for idx, doc in enumerate(documents):
             doc_name = doc.get('DocumentName', f'Document {idx+1}')
-            doc_id = f"{library}_{idx}"
+            doc_id = keys[idx]
             if st.button(f"📄 {doc_name}", key=f"doc_{doc_id}", use_container_width=True):
                 st.session_state.selected_doc_id = doc_id
                 st.session_state.viewing_document = True
                 st.experimental_rerun()
 
+def apply_suggestion(suggestion):
+    """Callback to replace the search query with a chosen suggestion"""
+    st.session_state.search_query = suggestion
+
+def display_search_suggestions(search_query):
+    """Display suggestions for the submitted query as clickable buttons"""
+    suggestions = [
+        suggestion for suggestion in get_suggestions(
+            st.session_state.search_client,
+            search_query,
+            caller=st.session_state.session_id
+        )
+        if suggestion.lower() != search_query.strip().lower()
+    ]
+    if not suggestions:
+        return
+    
+    st.caption("Suggestions")
+    suggestion_cols = st.columns(len(suggestions))
+    for idx, suggestion in enumerate(suggestions):
+        with suggestion_cols[idx]:
+            st.button(suggestion, key=f"suggestion_{idx}", on_click=apply_suggestion, args=(suggestion,))
+
 def display_similar_documents():
     """Display similar documents grouped by library"""
     # Use h3 for smaller title
@@ -1184,6 +1068,7 @@ def display_similar_documents():
                 
                 if related_docs:
                     st.session_state.similar_docs = related_docs
+                st.session_state.exploration_results = []
                 st.experimental_rerun()
     
     # Display current search path
@@ -1202,104 +1087,243 @@ def display_similar_documents():
     
     st.write("### Similar Documents Found")
     
+    # Entities from the current selection are highlighted
+    selected_entities = entities_by_label(
+        st.session_state.selected_people,
+        st.session_state.selected_organizations,
+        st.session_state.selected_locations
+    )
+    
+    view = st.radio("View", ["List", "Network"], horizontal=True, key="similar_view")
+    if view == "Network":
+        display_similar_network(st.session_state.similar_docs, selected_entities)
+        display_exploration()
+        return
+    
+    display_similar_list(st.session_state.similar_docs, selected_entities)
+    
+    display_exploration()
+
+@st.experimental_fragment
+def display_similar_list(similar_docs, selected_entities):
+    """
+    Similar documents grouped by library. A fragment: collapsing and listing
+    near-duplicates rerun only this list; opening a document reruns the whole app.
+    """
     # Group documents by library
+    library_groups = group_similar_by_library(similar_docs)
+    
+    # Related documents mentioning nearly the same entities are collapsed
+    collapse = st.checkbox("Collapse near-duplicates", value=True, key="collapse_similar_duplicates")
+    
+    # Display documents grouped by library
+    for library, documents in library_groups.items():
+        duplicates = find_related_near_duplicates(documents) if collapse else {}
+        hidden = hidden_duplicates(duplicates)
+        with st.expander(f"{library} ({len(documents)} documents)", expanded=False):
+            for idx, doc in enumerate(documents):
+                if idx in hidden:
+                    continue
+                display_similar_document(doc, selected_entities)
+                members = duplicates.get(idx)
+                if members and st.checkbox(f"Show {len(members)} near-duplicate(s)",
+                                           key=f"similar_dups_{get_hash(doc['document'])}"):
+                    for dup_idx in members:
+                        display_similar_document(documents[dup_idx], selected_entities)
+
+def display_similar_network(similar_docs, selected_entities):
+    """Related documents and their entities as an interactive network"""
+    network_docs = similar_docs
+    if len(similar_docs) > MAX_DOCUMENTS and st.session_state.similar_doc_history:
+        # Only the top documents are drawn, so the graph database ranks and cuts them
+        entities = st.session_state.similar_doc_history[-1]['entities']
+        network_docs = get_related_documents(
+            st.session_state.gremlin_client,
+            set(entities['people']),
+            set(entities['organizations']),
+            set(entities['locations']),
+            limit=MAX_DOCUMENTS
+        ) or similar_docs
+    graph = build_network(network_docs, selected_entities)
+    documents = network_documents(graph)
+    if len(documents) < len(similar_docs):
+        st.caption(f"Showing the top {len(documents)} of {len(similar_docs)} documents "
+                   f"and the {graph.number_of_nodes() - len(documents)} entities they share most.")
+    try:
+        positions = get_layout(graph)
+    except Exception as e:
+        st.error(f"Could not lay out the network: {str(e)}")
+        return
+    st.plotly_chart(network_figure(graph, positions), use_container_width=True)
+    
+    # Hovering shows names; documents are opened from here
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        doc_name = st.selectbox("Document", documents, key="network_document", label_visibility="collapsed")
+    with col2:
+        if st.button("View Document", key="view_network_document", use_container_width=True) and doc_name:
+            row = next((row for row in network_docs if row['document'] == doc_name), None)
+            open_related_document(doc_name, row)
+
+def open_related_document(doc_name, row=None):
+    """Open a related document; it is fetched, summarized and explored concurrently"""
+    st.session_state.opening_document = {'name': doc_name, 'hint': row}
+    st.session_state.current_doc_content = None
+    st.session_state.viewing_document = True  # Set viewing document state
+    st.experimental_rerun()
+
+def group_similar_by_library(similar_docs):
+    """Group Gremlin related-document results by library"""
     library_groups = {}
-    for doc in st.session_state.similar_docs:
+    for doc in similar_docs:
         library = doc['library']
         if library not in library_groups:
             library_groups[library] = []
         library_groups[library].append(doc)
+    return library_groups
+
+def display_similar_document(doc, highlight_entities):
+    """Display a single related document with its entities, highlighting the given ones"""
+    doc_name = doc['document']
+    matched_entities = doc['matched_entities']
+    
+    # Create a container for each document
+    doc_container = st.container()
+    with doc_container:
+        # Display document name and button
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(f'<span class="row-spacing">📄 {doc_name}</span>', unsafe_allow_html=True)
+        with col2:
+            if st.button("View Document", 
+                       key=f"view_similar_{get_hash(doc_name)}", 
+                       use_container_width=True):
+                open_related_document(doc_name, doc)
+        
+        # Display matched entities
+        st.markdown("**Entities in this Document:**")
+        matched_selected = {
+            'People': [],
+            'Organizations': [],
+            'Locations': []
+        }
+        
+        # Check which highlighted entities are present in this document
+        for label, heading in ((PEOPLE_LABEL, 'People'),
+                               (ORGANIZATION_LABEL, 'Organizations'),
+                               (LOCATION_LABEL, 'Locations')):
+            for entity in matched_entities.get(label, []):
+                if entity in highlight_entities.get(label, ()):
+                    matched_selected[heading].append(f"<span style='color: #FF6B6B'>{entity}</span>")
+                else:
+                    matched_selected[heading].append(entity)
+        
+        # Display entities with selected ones highlighted
+        entities_container = st.container()
+        with entities_container:
+            if matched_selected['People']:
+                st.markdown("**People:**", unsafe_allow_html=True)
+                st.markdown(", ".join(matched_selected['People']), unsafe_allow_html=True)
+            
+            if matched_selected['Organizations']:
+                st.markdown("**Organizations:**", unsafe_allow_html=True)
+                st.markdown(", ".join(matched_selected['Organizations']), unsafe_allow_html=True)
+            
+            if matched_selected['Locations']:
+                st.markdown("**Locations:**", unsafe_allow_html=True)
+                st.markdown(", ".join(matched_selected['Locations']), unsafe_allow_html=True)
+        
+        # Add a note about colored entities
+        if (any('FF6B6B' in item for sublist in matched_selected.values() for item in sublist)):
+            st.markdown("<span style='color: #FF6B6B'>▲</span> Highlighted entities are from your selection", unsafe_allow_html=True)
+        
+        st.markdown('<hr style="margin: 5px 0;">', unsafe_allow_html=True)
+
+def display_exploration_hop(hop_result):
+    """Display the documents reached on one exploration hop"""
+    entity_names = [name for names in hop_result['entities'].values() for name in sorted(names)]
+    documents = hop_result['documents']
+    with st.expander(f"Hop {hop_result['hop']} ({len(documents)} documents)", expanded=False):
+        st.caption("Expanded via: " + ", ".join(entity_names))
+        if not documents:
+            st.write("No new documents found on this hop.")
+        for doc in documents:
+            display_similar_document(doc, hop_result['entities'])
+
+def display_exploration():
+    """Multi-hop exploration: documents -> entities -> documents, streamed hop by hop"""
+    st.write("### Explore Further")
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        hops = st.selectbox("Hops", list(range(2, MAX_HOPS + 1)), key="explore_hops")
+    with col2:
+        document_fanout = st.number_input("Documents per hop", min_value=5, max_value=200,
+                                          value=DEFAULT_DOCUMENT_FANOUT, step=5, key="explore_doc_fanout")
+    with col3:
+        entity_fanout = st.number_input("Entities per hop", min_value=1, max_value=100,
+                                        value=DEFAULT_ENTITY_FANOUT, step=1, key="explore_entity_fanout")
+    
+    if st.button("Explore", key="explore_related"):
+        st.session_state.exploration_results = []
+        seed_entities = entities_by_label(
+            st.session_state.selected_people,
+            st.session_state.selected_organizations,
+            st.session_state.selected_locations
+        )
+        try:
+            with st.spinner("Exploring related documents..."):
+                # Hop 1 is the current result set, so only the further hops are queried
+                for hop_result in explore_related_documents(
+                    st.session_state.gremlin_client,
+                    seed_entities,
+                    hops=hops,
+                    document_fanout=document_fanout,
+                    entity_fanout=entity_fanout,
+                    seed_documents=st.session_state.similar_docs,
+                    session_spent=st.session_state.get('gremlin_ru_spent', 0.0)
+                ):
+                    st.session_state.gremlin_ru_spent = st.session_state.get('gremlin_ru_spent', 0.0) + hop_result['cost']
+                    if hop_result['hop'] == 1:
+                        continue
+                    st.session_state.exploration_results.append(hop_result)
+                    # Render each hop as soon as it arrives
+                    display_exploration_hop(hop_result)
+            session_budget = get_session_budget()
+            explored = len(st.session_state.exploration_results) + 1
+            if session_budget and st.session_state.gremlin_ru_spent >= session_budget and explored < hops:
+                st.warning(f"Stopped after hop {explored}: this session's Gremlin RU budget "
+                           f"({session_budget:.0f} RU) is spent.")
+        except Exception as e:
+            st.error(f"Error exploring related documents: {str(e)}")
+            print(f"Full error: {e}")  # For debugging
+        return
     
-    # Display documents grouped by library
-    for library, documents in library_groups.items():
-        with st.expander(f"{library} ({len(documents)} documents)", expanded=False):
-            for doc in documents:
-                doc_name = doc['document']
-                matched_entities = doc['matched_entities']
-                
-                # Create a container for each document
-                doc_container = st.container()
-                with doc_container:
-                    # Display document name and button
-                    col1, col2 = st.columns([4, 1])
-                    with col1:
-                        st.markdown(f'<span class="row-spacing">📄 {doc_name}</span>', unsafe_allow_html=True)
-                    with col2:
-                        if st.button("View Document", 
-                                   key=f"view_similar_{get_hash(doc_name)}", 
-                                   use_container_width=True):
-                            # Fetch full document from Azure Search
-                            results = search_documents(
-                                st.session_state.search_client, 
-                                f"DocumentName eq '{doc_name}'"
-                            )
-                            if results:
-                                st.session_state.current_doc_content = results[0]
-                                st.session_state.viewing_document = True  # Set viewing document state
-                                st.experimental_rerun()
-                    
-                    # Display matched entities
-                    st.markdown("**Entities in this Document:**")
-                    matched_selected = {
-                        'People': [],
-                        'Organizations': [],
-                        'Locations': []
-                    }
-                    
-                    # Check which selected entities are present in this document
-                    # Using 'peopl' to match your database label
-                    if 'peopl' in matched_entities:
-                        for person in matched_entities['peopl']:
-                            if person in st.session_state.selected_people:
-                                matched_selected['People'].append(f"<span style='color: #FF6B6B'>{person}</span>")
-                            else:
-                                matched_selected['People'].append(person)
-                    
-                    if 'organization' in matched_entities:
-                        for org in matched_entities['organization']:
-                            if org in st.session_state.selected_organizations:
-                                matched_selected['Organizations'].append(f"<span style='color: #FF6B6B'>{org}</span>")
-                            else:
-                                matched_selected['Organizations'].append(org)
-                    
-                    if 'location' in matched_entities:
-                        for location in matched_entities['location']:
-                            if location in st.session_state.selected_locations:
-                                matched_selected['Locations'].append(f"<span style='color: #FF6B6B'>{location}</span>")
-                            else:
-                                matched_selected['Locations'].append(location)
-                    
-                    # Display entities with selected ones highlighted
-                    entities_container = st.container()
-                    with entities_container:
-                        if matched_selected['People']:
-                            st.markdown("**People:**", unsafe_allow_html=True)
-                            st.markdown(", ".join(matched_selected['People']), unsafe_allow_html=True)
-                        
-                        if matched_selected['Organizations']:
-                            st.markdown("**Organizations:**", unsafe_allow_html=True)
-                            st.markdown(", ".join(matched_selected['Organizations']), unsafe_allow_html=True)
-                        
-                        if matched_selected['Locations']:
-                            st.markdown("**Locations:**", unsafe_allow_html=True)
-                            st.markdown(", ".join(matched_selected['Locations']), unsafe_allow_html=True)
-                    
-                    # Add a note about colored entities
-                    if (any('FF6B6B' in item for sublist in matched_selected.values() for item in sublist)):
-                        st.markdown("<span style='color: #FF6B6B'>▲</span> Highlighted entities are from your selection", unsafe_allow_html=True)
-                    
-                    st.markdown('<hr style="margin: 5px 0;">', unsafe_allow_html=True)
+    for hop_result in st.session_state.exploration_results:
+        display_exploration_hop(hop_result)
 
 def main():
     # Initialize session state
     init_session_state()
     
+    # Track this session's memory; payloads evicted while it was idle are fetched again
+    register_current_session()
+    start_session_sweeper()
+    restore_evicted_state()
+    
+    # Replay popular queries into the caches once per node after a deployment
+    start_background_warm_up()
+    
     # Apply table styles
     apply_table_styles()
     
     # Display header on every screen
     display_header()
     
+    # RU cost report and backend health
+    display_ru_report()
+    display_backend_status()
+    display_session_memory()
+    
     if st.session_state.viewing_document:
         # Show back button
         back_button_label = "← Back to Search" if not st.session_state.show_similar_docs else "← Back to Similar Documents"
@@ -1308,63 +1332,89 @@ def main():
             st.experimental_rerun()
         
         # Display current document content
-        if st.session_state.show_similar_docs and st.session_state.current_doc_content:
+        opening = st.session_state.opening_document
+        if st.session_state.show_similar_docs and opening and not st.session_state.current_doc_content:
+            # Content, summary and related documents were all started together
+            futures = start_document_open(opening['name'], hint=opening['hint'])
+            doc = wait_for_document(futures, opening['name'])
+            if doc:
+                st.session_state.current_doc_content = doc
+                st.session_state.opening_document = None
+                display_document_content(doc, get_hash(doc.get('DocumentName')), is_similar_view=True,
+                                         futures=futures)
+        elif st.session_state.show_similar_docs and st.session_state.current_doc_content:
             display_document_content(
                 st.session_state.current_doc_content,
                 get_hash(st.session_state.current_doc_content.get('DocumentName')),
                 is_similar_view=True
             )
-        elif st.session_state.selected_doc_id:
-            # Get library and index from selected_doc_id
-            doc_id_parts = st.session_state.selected_doc_id.split('_')
-            if len(doc_id_parts) >= 2:
-                library = '_'.join(doc_id_parts[:-1])  # Join all parts except the last one
-                idx_str = doc_id_parts[-1]  # Last part is the index
-            else:
-                library = doc_id_parts[0]
-                idx_str = "0"
-            idx = int(idx_str)
-            
-            # Get all documents for this library
-            library_docs = []
-            for lib, docs in group_by_library(st.session_state.search_results).items():
-                if lib == library:
-                    library_docs = docs
-                    break
-            
-            if idx < len(library_docs):
-                display_document_content(library_docs[idx], st.session_state.selected_doc_id)
+        elif st.session_state.selected_doc_id and st.session_state.search_results:
+            # Constant-time lookup of the selected document by its stable key
+            doc = st.session_state.search_results.get(st.session_state.selected_doc_id)
+            if doc is not None:
+                display_document_content(doc, st.session_state.selected_doc_id)
     elif st.session_state.show_similar_docs:
         display_similar_documents()
     else:
         # Reset similar document history when starting new search
         st.session_state.similar_doc_history = []
         st.session_state.current_doc_content = None
+        st.session_state.exploration_results = []
         
         # Search input
-        search_query = st.text_input("Enter your search query")
+        search_query = st.text_input("Enter your search query", key="search_query")
         
+        # Suggestions for the submitted query (text_input reruns on Enter or blur, not per keystroke)
+        # are answered from the local prefix cache where possible
         if search_query:
-            # Perform search and store results in session state
-            st.session_state.search_results = search_documents(st.session_state.search_client, search_query)
+            display_search_suggestions(search_query)
+        
+        # Optional local re-ranking of the results within each library
+        rerank_enabled = st.checkbox("Re-rank results by relevance", key="rerank_results")
+        collapse_duplicates = st.checkbox("Collapse near-duplicates", value=True, key="collapse_duplicates")
+        
+        # Library and metadata filters are applied by Azure Search
+        search_filter = display_metadata_filters()
+        
+        # Related documents straight from entity names
+        display_entity_search()
+        
+        # Only run a full search when the query, the filters or the ordering actually changed
+        search_key = (search_query, rerank_enabled, search_filter)
+        if (search_query or search_filter) and (search_key != st.session_state.last_search_key
+                                                or st.session_state.search_results is None):
+            # Perform search and store results in session state; filters alone match every document
+            results = search_documents(search_query or "*", rerank_enabled, search_filter)
+            if results is not None:
+                # Indexed once per search; document keys stay valid across reruns
+                st.session_state.search_results = ResultSet(results)
+                st.session_state.last_search_key = search_key
         
         # Display results if we have them
         if st.session_state.search_results:
-            # Group results by library
-            grouped_results = group_by_library(st.session_state.search_results)
+            # Results grouped by library
+            grouped_results = st.session_state.search_results.libraries
             
             # Display count of results
-            total_results = sum(len(docs) for docs in grouped_results.values())
+            total_results = len(st.session_state.search_results)
             st.write(f"Found {total_results} documents across {len(grouped_results)} libraries")
             
             # Display results grouped by library
-            for library, documents in grouped_results.items():
-                with st.expander(f"{library} ({len(documents)} documents)", expanded=False):
+            for library, (documents, keys) in grouped_results.items():
+                # Signatures are cached per document, so re-clustering on rerun is cheap
+                duplicates = find_near_duplicates(documents) if collapse_duplicates else {}
+                shown = len(documents) - len(hidden_duplicates(duplicates))
+                label = f"{library} ({len(documents)} documents)"
+                if shown < len(documents):
+                    label = f"{library} ({shown} of {len(documents)} documents, near-duplicates collapsed)"
+                with st.expander(label, expanded=False):
                     # Create a container for the library's documents
                     doc_container = st.container()
                     with doc_container:
                         # Display the documents in the appropriate format for this library
-                        display_library_documents(library, documents)
+                        # Sorted, filtered and grouped in memory over the library's typed frame
+                        display_library_documents(library, documents, keys, duplicates,
+                                                  st.session_state.search_results.frame(library))
 
 if __name__ == "__main__":
     main()
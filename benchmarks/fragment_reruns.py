@@ -0,0 +1,203 @@
+"""
+Per-click rerun benchmark: whole-app reruns against fragment reruns.
+
+Drives app.py through Streamlit's AppTest against the load test's stand-in
+backends. The same interaction is replayed two ways:
+- as a full rerun of the script, which is what every click cost before
+  the page was split into fragments;
+- as a rerun of only the fragment that owns the widget, which is what the
+  browser requests now.
+
+The interactions are ticking an entity in the document view, sorting and
+filtering a library table, and toggling near-duplicate collapsing in the
+similar-documents list. For each one it reports latency percentiles and the
+number of page deltas sent.
+
+AppTest itself always reruns the whole script and drops fragments between
+runs. The harness keeps one fragment store per session and queues the
+widget's fragment, as a Streamlit server would.
+
+    python -m benchmarks.fragment_reruns --clicks 30
+"""
+import argparse
+import dataclasses
+import io
+import sys
+import time
+from contextlib import redirect_stdout
+
+from benchmarks.loadtest import (  # noqa: I100 - sets the stand-in environment first
+    APP_PATH, Latency, StubGremlinClient, StubGroqClient, StubSearchClient, synthetic_corpus
+)
+
+import numpy as np  # noqa: E402
+from streamlit.runtime.fragment import MemoryFragmentStorage  # noqa: E402
+from streamlit.testing.v1 import AppTest, app_test  # noqa: E402
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner  # noqa: E402
+
+from groq_analyzer import GroqAnalyzer  # noqa: E402
+
+
+class FragmentScriptRunner(LocalScriptRunner):
+    """LocalScriptRunner with a fragment store that outlives the run, optionally running one fragment"""
+
+    def __init__(self, script_path, session_state, fragment_storage, fragment_id=None, **kwargs):
+        super().__init__(script_path, session_state, **kwargs)
+        self._fragment_storage = fragment_storage
+        self.fragment_id = fragment_id
+
+    def request_rerun(self, rerun_data):
+        if self.fragment_id:
+            rerun_data = dataclasses.replace(rerun_data, fragment_id_queue=[self.fragment_id])
+        return super().request_rerun(rerun_data)
+
+
+class Session:
+    """One app session whose runs can target a single fragment"""
+
+    def __init__(self, backends, timeout: float):
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        search_client, gremlin_client, groq_client = backends
+        analyzer = GroqAnalyzer(api_key="stub")
+        analyzer.client = groq_client
+        self.at.session_state["search_client"] = search_client
+        self.at.session_state["gremlin_client"] = gremlin_client
+        self.at.session_state["groq_analyzer"] = analyzer
+        self.fragment_storage = MemoryFragmentStorage()
+        self.fragment_id = None
+        self.runner = None
+        # Widget id -> id of the fragment that rendered it, from the last full run
+        self.widget_fragments = {}
+        app_test.LocalScriptRunner = self.make_runner
+
+    def make_runner(self, script_path, session_state, **kwargs):
+        self.runner = FragmentScriptRunner(script_path, session_state, self.fragment_storage,
+                                           self.fragment_id, **kwargs)
+        return self.runner
+
+    def deltas(self):
+        return [msg.delta for msg in self.runner.forward_msgs() if msg.WhichOneof("type") == "delta"]
+
+    def run(self, widget=None, fragment_id=None):
+        """Run the script (or one fragment) with `widget`'s new value. Returns (seconds, deltas sent)."""
+        self.fragment_id = fragment_id
+        widget_states = self.at._tree.get_widget_states() if widget is not None else None
+        started = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            self.at._run(widget_states)
+        elapsed = time.perf_counter() - started
+        deltas = self.deltas()
+        self.fragment_id = None
+        if fragment_id is None:
+            self.widget_fragments = {}
+            for delta in deltas:
+                if delta.fragment_id and delta.WhichOneof("type") == "new_element":
+                    element = delta.new_element
+                    proto = getattr(element, element.WhichOneof("type"))
+                    if getattr(proto, "id", None):
+                        self.widget_fragments[proto.id] = delta.fragment_id
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].message)
+        return elapsed, len(deltas)
+
+    def refresh(self):
+        """Full run without widget changes, for a clean page after a fragment run or st.experimental_rerun"""
+        self.run()
+
+    def click_both_ways(self, find_widget, change):
+        """Apply `change` to the widget as a full rerun, then as a fragment rerun"""
+        timings = {}
+        for mode in ("full", "fragment"):
+            self.refresh()
+            widget = find_widget()
+            fragment_id = self.widget_fragments.get(widget.id) if mode == "fragment" else None
+            if mode == "fragment" and fragment_id is None:
+                raise RuntimeError(f"{widget.key} is not rendered by a fragment")
+            change(widget)
+            timings[mode] = self.run(widget, fragment_id)
+        return timings
+
+
+def by_key_prefix(at, kind, prefix):
+    return next(widget for widget in getattr(at, kind) if widget.key and widget.key.startswith(prefix))
+
+
+def scenarios(session: Session, clicks: int):
+    """(name, [{mode: (seconds, deltas)}]) for each interaction"""
+    at = session.at
+    session.refresh()
+    at.text_input(key="search_query").input("report 1")
+    session.run(at.text_input(key="search_query"))
+    session.refresh()
+    library = next(iter(at.session_state["search_results"].libraries))
+    results = []
+
+    sort_options = lambda: by_key_prefix(at, "selectbox", f"sort_{library}")  # noqa: E731
+    samples = []
+    for i in range(clicks):
+        option = sort_options().options[1 + i % (len(sort_options().options) - 1)]
+        samples.append(session.click_both_ways(sort_options, lambda box: box.select(option)))
+    results.append((f"sort {library} table", samples))
+
+    samples = []
+    for i in range(clicks):
+        text = ("", "1", "a")[i % 3]
+        samples.append(session.click_both_ways(lambda: by_key_prefix(at, "text_input", f"contains_{library}"),
+                                               lambda box: box.input(text)))
+    results.append((f"filter {library} table", samples))
+
+    # Open the first result and tick its entities
+    session.run(by_key_prefix(at, "button", "view_").click())
+    session.refresh()
+    samples = []
+    for i in range(clicks):
+        find = lambda: by_key_prefix(at, "checkbox", "person_")  # noqa: E731
+        samples.append(session.click_both_ways(find, lambda box: box.check() if i % 2 == 0 else box.uncheck()))
+    results.append(("tick entity", samples))
+
+    # Find similar documents and toggle near-duplicate collapsing
+    session.refresh()
+    by_key_prefix(at, "checkbox", "person_").check()
+    session.run(by_key_prefix(at, "checkbox", "person_"))
+    session.refresh()
+    session.run(by_key_prefix(at, "button", "similar_").click())
+    session.refresh()
+    samples = []
+    for i in range(clicks):
+        find = lambda: at.checkbox(key="collapse_similar_duplicates")  # noqa: E731
+        samples.append(session.click_both_ways(find, lambda box: box.uncheck() if i % 2 == 0 else box.check()))
+    results.append(("toggle similar duplicates", samples))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare full-app and fragment reruns per click")
+    parser.add_argument("--clicks", type=int, default=30, help="Clicks per interaction and mode")
+    parser.add_argument("--documents", type=int, default=3000, help="Synthetic corpus size")
+    parser.add_argument("--results", type=int, default=200, help="Results per search")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a script run counts as failed")
+    args = parser.parse_args(argv)
+
+    corpus, pools = synthetic_corpus(args.documents)
+    backends = (
+        StubSearchClient(corpus, Latency(120, 1), args.results),
+        StubGremlinClient(corpus, pools, Latency(150, 2)),
+        StubGroqClient(Latency(800, 3)),
+    )
+    session = Session(backends, args.timeout)
+    print(f"{args.results} results per search, {args.clicks} clicks per interaction")
+    print(f"{'interaction':28} {'mode':9} {'p50':>8} {'p95':>8} {'deltas':>7}")
+    for name, samples in scenarios(session, args.clicks):
+        p50s = {}
+        for mode in ("full", "fragment"):
+            seconds = [sample[mode][0] * 1000 for sample in samples]
+            deltas = np.median([sample[mode][1] for sample in samples])
+            p50, p95 = np.percentile(seconds, [50, 95])
+            p50s[mode] = p50
+            print(f"{name:28} {mode:9} {p50:6.0f}ms {p95:6.0f}ms {deltas:7.0f}")
+        print(f"{'':28} {'speedup':9} {p50s['full'] / p50s['fragment']:7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+Multi-session load test of the Streamlit app.
+
+Runs N simulated users of app.py in one process, as a single App Service
+instance would host them. Each session has its own script thread, driven
+through Streamlit's AppTest harness. The backends are local stand-ins for
+Azure Search, Cosmos Gremlin and Groq, with log-normal latencies. Each
+session runs a mix of actions with exponential think time between them:
+- search for a query;
+- open a result;
+- find similar documents from one of its entities;
+- go back.
+
+For each N it reports:
+- reruns per second;
+- per-rerun latency percentiles;
+- CPU use (100% is one core);
+- peak resident memory.
+
+This shows the session count at which one instance saturates. The caches
+are cleared between levels.
+
+Rerun latency includes AppTest's element-tree processing, but not the
+websocket traffic to a browser. Actions that end in st.experimental_rerun
+leave AppTest holding elements of both script runs. Before its next action,
+such a session renders once more to get a clean page. That run is not timed
+or counted, but its CPU is included.
+
+    python -m benchmarks.loadtest --sessions 1 4 16 32 --duration 30
+    python -m benchmarks.loadtest --think 0.5 --search-ms 150 --groq-ms 900
+"""
+import argparse
+import ast
+import hashlib
+import io
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+# Stand-in backends only: no shared cache, summary store, warm-up or real query log
+_workdir = tempfile.mkdtemp(prefix="loadtest-")
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+os.environ.setdefault("SUMMARY_STORE_PATH", "")
+os.environ.setdefault("WARM_UP_ON_STARTUP", "0")
+os.environ.setdefault("QUERY_LOG_PATH", os.path.join(_workdir, "queries.jsonl"))
+
+from unittest.mock import MagicMock  # noqa: E402
+
+import numpy as np  # noqa: E402
+from streamlit.runtime import Runtime  # noqa: E402
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager  # noqa: E402
+from streamlit.runtime.media_file_manager import MediaFileManager  # noqa: E402
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from caches import ALL_CACHES  # noqa: E402
+from graph_explore import ENTITY_LABELS, LOCATION_LABEL, ORGANIZATION_LABEL, PEOPLE_LABEL  # noqa: E402
+from groq_analyzer import GroqAnalyzer  # noqa: E402
+from library_schema import LIBRARY_SCHEMAS  # noqa: E402
+from session_memory import process_rss_bytes  # noqa: E402
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+WORDS = ("report revenue policy employee contract region quarter review board minutes "
+         "payment invoice schedule project budget approval department record").split()
+ENTITY_FIELDS = {PEOPLE_LABEL: "people", ORGANIZATION_LABEL: "organizations", LOCATION_LABEL: "locations"}
+# Actions whose handlers call st.experimental_rerun
+RERUN_ACTIONS = {"open", "open similar", "find similar", "back"}
+_WITHIN = re.compile(r"within\((\[.*?\])\)\)\.hasLabel\('(\w+)'\)")
+
+
+def share_test_runtime():
+    """
+    AppTest installs a mock Runtime before each script run and removes it
+    after, which breaks runs of other sessions still in progress. Fall back
+    to one shared mock whenever no run has installed its own.
+    """
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+
+class Latency:
+    """Log-normal latency around a median, in seconds"""
+
+    def __init__(self, median_ms: float, seed: int):
+        self.median = median_ms / 1000
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self):
+        with self._lock:
+            seconds = self.median * self._rng.lognormvariate(0, 0.35)
+        time.sleep(seconds)
+
+
+def synthetic_corpus(count: int, seed: int = 5):
+    """Documents with each library's metadata and entities drawn from shared pools"""
+    rng = random.Random(seed)
+    pools = {
+        PEOPLE_LABEL: [f"Person {i}" for i in range(300)],
+        ORGANIZATION_LABEL: [f"Organization {i}" for i in range(80)],
+        LOCATION_LABEL: [f"Location {i}" for i in range(40)],
+    }
+    libraries = list(LIBRARY_SCHEMAS.values())
+    corpus = []
+    for i in range(count):
+        schema = rng.choice(libraries)
+        doc = {
+            "DocumentName": f"{schema.name.lower()}_{i:05}.pdf",
+            "Library": schema.name,
+            "merged_content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(150, 600))),
+        }
+        for label, field in ENTITY_FIELDS.items():
+            doc[field] = rng.sample(pools[label], rng.randint(1, 4))
+        for field in schema.fields:
+            if field.dtype == "date":
+                doc[field.field] = f"{rng.randint(2005, 2024)}-{rng.randint(1, 12):02}-{rng.randint(1, 28):02}"
+            elif field.dtype == "number":
+                doc[field.field] = str(rng.randint(2005, 2024))
+            else:
+                doc[field.field] = f"{rng.choice(WORDS).title()} {rng.randint(1, 20)}"
+        corpus.append(doc)
+    return corpus, pools
+
+
+class StubSearchClient:
+    """Stand-in SearchClient: each query matches a stable subset of the corpus"""
+
+    def __init__(self, corpus, latency: Latency, results_per_query: int):
+        self.corpus = corpus
+        self.by_name = {doc["DocumentName"]: doc for doc in corpus}
+        self.latency = latency
+        self.results_per_query = results_per_query
+
+    def search(self, search_text, top=None, skip=None, **kwargs):
+        self.latency.sleep()
+        name = re.fullmatch(r"DocumentName eq '(.*)'", search_text)
+        if name:
+            doc = self.by_name.get(name.group(1))
+            return [doc] if doc else []
+        rng = random.Random(int(hashlib.md5(f"{search_text}|{kwargs.get('filter')}".encode()).hexdigest(), 16))
+        results = [dict(doc, **{"@search.score": 1.0 / (rank + 1)})
+                   for rank, doc in enumerate(rng.sample(self.corpus, self.results_per_query))]
+        start = skip or 0
+        return results[start:start + top] if top else results[start:]
+
+    def autocomplete(self, text, suggester_name, **kwargs):
+        self.latency.sleep()
+        return [{"text": word, "query_plus_text": f"{text} {word}"} for word in WORDS[:3]]
+
+
+class StubResultSet:
+    def __init__(self, rows, request_charge: float):
+        self.rows = rows
+        self.status_attributes = {"x-ms-total-request-charge": request_charge}
+
+    def all(self):
+        return SimpleNamespace(result=lambda: self.rows)
+
+
+class StubGremlinClient:
+    """Stand-in Gremlin client answering the related-documents and entity-name queries"""
+
+    def __init__(self, corpus, pools, latency: Latency):
+        self.corpus = corpus
+        self.pools = pools
+        self.latency = latency
+
+    def submit(self, query):
+        self.latency.sleep()
+        names_query = re.search(r"hasLabel\('(\w+)'\)\.values\('name'\)", query)
+        if names_query:
+            names = self.pools.get(names_query.group(1), [])
+            return StubResultSet(names, 0.1 * len(names))
+        wanted = {label: set(ast.literal_eval(names)) for names, label in _WITHIN.findall(query)}
+        rows = []
+        for doc in self.corpus:
+            if any(wanted.get(label, set()) & set(doc[field]) for label, field in ENTITY_FIELDS.items()):
+                rows.append({
+                    "document": doc["DocumentName"],
+                    "library": doc["Library"],
+                    "matched_entities": {label: list(doc[field]) for label, field in ENTITY_FIELDS.items()},
+                })
+        limit = re.search(r"\.limit\((\d+)\)", query)
+        rows = rows[:int(limit.group(1))] if limit else rows
+        return StubResultSet(rows, 2.5 + 0.3 * len(rows))
+
+    def close(self):
+        pass
+
+
+class StubGroqClient:
+    """Stand-in Groq client with canned bullet-point summaries"""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, **kwargs):
+        self.latency.sleep()
+        message = SimpleNamespace(content="- point one\n- point two\n- point three")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+class SimulatedSession:
+    """One user: a script run per action, timed"""
+
+    def __init__(self, session_id: int, backends, args):
+        self.rng = random.Random(1000 + session_id)
+        self.args = args
+        self.at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+        search_client, gremlin_client, groq_client = backends
+        analyzer = GroqAnalyzer(api_key="stub")
+        analyzer.client = groq_client
+        self.at.session_state["search_client"] = search_client
+        self.at.session_state["gremlin_client"] = gremlin_client
+        self.at.session_state["groq_analyzer"] = analyzer
+        self.timings = []
+        self.actions = []
+        self.errors = 0
+        self.failures = Counter()
+        # The last action ended in st.experimental_rerun
+        self.needs_refresh = False
+
+    def rerun(self, action: str, widget=None):
+        started = time.perf_counter()
+        error = None
+        try:
+            (widget.run() if widget is not None else self.at.run())
+            if self.at.exception:
+                error = self.at.exception[0].message
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        self.timings.append(time.perf_counter() - started)
+        self.actions.append(action)
+        self.needs_refresh = action in RERUN_ACTIONS
+        if error:
+            self.errors += 1
+            self.failures[f"{action}: {error}"[:120]] += 1
+
+    def buttons(self, prefix: str):
+        return [button for button in self.at.button if button.key and button.key.startswith(prefix)]
+
+    def back_button(self):
+        return next((button for button in self.at.button if button.label.startswith("← Back")), None)
+
+    def step(self):
+        """Pick the next action from what the current page offers"""
+        if self.needs_refresh:
+            # Without widget states: the stale elements' states must not be sent back
+            self.at._run()
+            self.needs_refresh = False
+        state = self.at.session_state
+        choice = self.rng.random()
+        if state["viewing_document"]:
+            entities = [box for box in self.at.checkbox
+                        if box.key and box.key.split("_", 1)[0] in ("person", "org", "location")]
+            similar = self.buttons("similar_")
+            if choice < 0.5 and entities and similar:
+                self.rerun("select entity", self.rng.choice(entities).check())
+                similar = self.buttons("similar_")
+                if similar:
+                    self.rerun("find similar", similar[0].click())
+            elif self.back_button() is not None:
+                self.rerun("back", self.back_button().click())
+        elif state["show_similar_docs"]:
+            documents = self.buttons("view_similar_")
+            if choice < 0.6 and documents:
+                self.rerun("open similar", self.rng.choice(documents).click())
+            elif self.back_button() is not None:
+                self.rerun("back", self.back_button().click())
+        else:
+            documents = self.buttons("view_")
+            if choice < 0.5 and documents:
+                self.rerun("open", self.rng.choice(documents).click())
+            else:
+                # Popular queries repeat, so the caches see a realistic hit rate
+                rank = min(int(self.rng.paretovariate(1.2)), self.args.queries)
+                query = f"{WORDS[rank % len(WORDS)]} {rank}"
+                self.rerun("search", self.at.text_input(key="search_query").input(query))
+
+    def run(self, deadline: float):
+        self.rerun("start")
+        while time.monotonic() < deadline:
+            time.sleep(self.rng.expovariate(1 / self.args.think) if self.args.think > 0 else 0)
+            if time.monotonic() >= deadline:
+                break
+            try:
+                self.step()
+            except KeyError:
+                # The page lacks the expected widget, e.g. after a failed run
+                self.needs_refresh = True
+
+
+def run_level(sessions: int, backends, args) -> dict:
+    for cache in ALL_CACHES:
+        cache.invalidate()
+    users = [SimulatedSession(i, backends, args) for i in range(sessions)]
+    peak_rss = [process_rss_bytes() or 0]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(0.5):
+            peak_rss.append(process_rss_bytes() or 0)
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started, cpu_started = time.perf_counter(), time.process_time()
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=user.run, args=(deadline,), daemon=True) for user in users]
+    with redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    done.set()
+    sampler.join()
+
+    timings = [timing for user in users for timing in user.timings]
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99]) if timings else (0.0, 0.0, 0.0)
+    by_action = {}
+    for user in users:
+        for action, timing in zip(user.actions, user.timings):
+            by_action.setdefault(action, []).append(timing)
+    return {
+        "sessions": sessions,
+        "reruns": len(timings),
+        "throughput": len(timings) / elapsed,
+        "p50": p50, "p95": p95, "p99": p99,
+        "max": max(timings, default=0.0),
+        "errors": sum(user.errors for user in users),
+        "cpu": cpu / elapsed,
+        "rss_mb": max(peak_rss) / 2 ** 20,
+        "by_action": {action: float(np.percentile(values, 50)) for action, values in by_action.items()},
+        "failures": sum((user.failures for user in users), Counter()),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate concurrent sessions of the app against stand-in backends")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Session counts to run")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per session count")
+    parser.add_argument("--think", type=float, default=2.0, help="Mean think time between actions, seconds")
+    parser.add_argument("--documents", type=int, default=3000, help="Synthetic corpus size")
+    parser.add_argument("--results", type=int, default=50, help="Results per search")
+    parser.add_argument("--queries", type=int, default=500, help="Distinct queries")
+    parser.add_argument("--search-ms", type=float, default=120.0, help="Median Azure Search latency")
+    parser.add_argument("--gremlin-ms", type=float, default=150.0, help="Median Gremlin latency")
+    parser.add_argument("--groq-ms", type=float, default=800.0, help="Median Groq latency")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a script run counts as failed")
+    args = parser.parse_args(argv)
+
+    share_test_runtime()
+    corpus, pools = synthetic_corpus(args.documents)
+    backends = (
+        StubSearchClient(corpus, Latency(args.search_ms, 1), args.results),
+        StubGremlinClient(corpus, pools, Latency(args.gremlin_ms, 2)),
+        StubGroqClient(Latency(args.groq_ms, 3)),
+    )
+    print(f"{len(corpus)} documents, think time {args.think:g}s, "
+          f"backends {args.search_ms:g}/{args.gremlin_ms:g}/{args.groq_ms:g} ms (search/gremlin/groq)")
+    print(f"{'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} "
+          f"{'errors':>6} {'CPU':>5} {'RSS MB':>7}")
+    results = []
+    for sessions in args.sessions:
+        result = run_level(sessions, backends, args)
+        results.append(result)
+        print(f"{result['sessions']:8} {result['reruns']:7} {result['throughput']:8.1f} "
+              f"{result['p50']:6.2f}s {result['p95']:6.2f}s {result['p99']:6.2f}s {result['max']:6.2f}s "
+              f"{result['errors']:6} {result['cpu']:5.0%} {result['rss_mb']:7.0f}", flush=True)
+    for result in results:
+        actions = ", ".join(f"{action} {p50:.2f}s" for action, p50 in sorted(result["by_action"].items()))
+        print(f"\nMedian rerun by action ({result['sessions']} sessions): {actions}")
+        for failure, count in result["failures"].most_common(5):
+            print(f"  {count:5}  {failure}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
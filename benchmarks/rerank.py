@@ -0,0 +1,86 @@
+"""
+Latency benchmark for the local re-ranker.
+
+Re-ranks synthetic OCR-sized result sets and checks the p95 latency against
+the budget (20 ms for 1,000 candidates):
+
+    python -m benchmarks.rerank --candidates 1000 --runs 50
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from rerank import rerank_documents
+
+VOCABULARY = (
+    "annual report ayala land corporation finance department employee salary slip "
+    "volume serial act number book category description remarks general legal "
+    "agreement contract manila makati philippines board directors shareholders "
+    "revenue income statement balance sheet audit tax page signature date"
+).split()
+
+LIBRARIES = ["General", "HR", "Florix", "DFTROPIO", "Finance", "Ayala_Annual_Report", "Ayala_Legal_Docs"]
+
+
+def make_vocabulary(rng: random.Random, size: int):
+    """Domain words followed by random filler words, as OCR text has a long tail"""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    filler = ["".join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+    return VOCABULARY + filler
+
+
+def make_documents(count: int, words_per_doc: int, seed: int = 7, vocabulary_size: int = 5000):
+    """Synthetic search hits with OCR-like content and library metadata"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng, vocabulary_size)
+    # Zipf-like word frequencies
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    documents = []
+    for idx in range(count):
+        library = rng.choice(LIBRARIES)
+        documents.append({
+            "DocumentName": f"doc_{idx}.pdf",
+            "Library": library,
+            "@search.score": rng.random() * 10,
+            "merged_content": " ".join(rng.choices(vocabulary, weights=weights, k=words_per_doc)),
+            "Date_Finance": f"{rng.randint(1995, 2024)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+            "Year_Ayala_Annual_Report": str(rng.randint(1995, 2024)),
+            "Name_Ayala_Annual_Report": rng.choice(VOCABULARY),
+        })
+    return documents
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--candidates", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=600, help="Words of content per document")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    parser.add_argument("--query", default="ayala annual report 2020")
+    args = parser.parse_args(argv)
+
+    documents = make_documents(args.candidates, args.words)
+    rerank_documents(args.query, documents)  # Warm up
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        rerank_documents(args.query, documents, top_n=args.candidates)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    p50 = statistics.median(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"candidates={args.candidates} words/doc={args.words} runs={args.runs}")
+    print(f"p50={p50:.2f} ms  p95={p95:.2f} ms  max={timings[-1]:.2f} ms  budget={args.budget_ms:.0f} ms")
+    if p95 > args.budget_ms:
+        print("FAIL: p95 latency over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Fault-injection benchmark for the backend resilience layer.
+
+Runs the search path against a local stand-in for Azure Search that adds
+latency spikes, stalls and outages:
+
+1. Tail latency: the same workload with plain calls and with hedged calls;
+   hedging must lower p99.
+2. Outage: the stand-in stalls every request. Calls are cut at the deadline,
+   the breaker opens and fails fast, and expired cache entries are served
+   as stale results.
+
+    python -m benchmarks.resilience --calls 300
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Short deadlines and cache TTLs so the outage scenario runs in seconds
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+os.environ.setdefault("SEARCH_CACHE_TTL_SECONDS", "0.2")
+os.environ.setdefault("SEARCH_DEADLINE_SECONDS", "0.5")
+os.environ.setdefault("BREAKER_RESET_SECONDS", "2")
+
+import numpy as np  # noqa: E402
+
+from resilience import Backend, BackendUnavailable, search_backend  # noqa: E402
+from search_core import search_with_fallback  # noqa: E402
+
+
+class FaultySearchClient:
+    """Stand-in SearchClient with log-normal latency, slow outliers and an outage switch"""
+
+    def __init__(self, median_ms: float, spike_rate: float, spike_ms: float, seed: int = 11):
+        self.median_ms = median_ms
+        self.spike_rate = spike_rate
+        self.spike_ms = spike_ms
+        self.stalled = False
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def search(self, search_text, **kwargs):
+        with self._lock:
+            self.calls += 1
+            latency_ms = self.median_ms * self._rng.lognormvariate(0, 0.3)
+            if self._rng.random() < self.spike_rate:
+                latency_ms = self.spike_ms
+        if self.stalled:
+            latency_ms = 3_000
+        time.sleep(latency_ms / 1000)
+        return [{"DocumentName": f"{search_text}_{i}", "Library": "General"} for i in range(5)]
+
+
+def percentiles(timings):
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    return f"p50={p50:7.1f} ms  p95={p95:7.1f} ms  p99={p99:7.1f} ms  max={max(timings):7.1f} ms"
+
+
+def run_workload(call, calls: int, concurrency: int):
+    def timed(i):
+        start = time.perf_counter()
+        call(i)
+        return (time.perf_counter() - start) * 1000
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(timed, range(calls)))
+
+
+def tail_latency(args) -> bool:
+    client = FaultySearchClient(args.median_ms, args.spike_rate, args.spike_ms)
+    search = lambda i: client.search(f"q{i % 20}")  # noqa: E731
+
+    plain = run_workload(search, args.calls, args.concurrency)
+    hedged_backend = Backend("stand-in", deadline_seconds=5.0, hedge=True)
+    hedged = run_workload(lambda i: hedged_backend.call(lambda: search(i)), args.calls, args.concurrency)
+
+    print("Tail latency")
+    print(f"  plain   {percentiles(plain)}")
+    print(f"  hedged  {percentiles(hedged)}  hedges sent={hedged_backend.hedges_sent} "
+          f"won={hedged_backend.hedges_won} ({hedged_backend.hedges_sent / args.calls:.0%} extra calls)")
+    return np.percentile(hedged, 99) < np.percentile(plain, 99)
+
+
+def outage(args) -> bool:
+    client = FaultySearchClient(args.median_ms, 0.0, 0.0)
+    search_with_fallback(client, "annual report")  # Populate the cache
+    time.sleep(0.3)  # Let the entry expire
+
+    client.stalled = True
+    timings, stale = [], 0
+    for _ in range(10):
+        start = time.perf_counter()
+        try:
+            _, was_stale = search_with_fallback(client, "annual report")
+            stale += was_stale
+        except BackendUnavailable:
+            pass
+        timings.append((time.perf_counter() - start) * 1000)
+
+    print("Outage (every request stalls)")
+    print(f"  calls={len(timings)} stale results served={stale} breaker={search_backend.breaker.state}")
+    print(f"  first call {timings[0]:.0f} ms (deadline), last call {timings[-1]:.2f} ms (breaker open)")
+    return stale == len(timings) and timings[-1] < 5 and search_backend.breaker.state == "open"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fault-injection benchmark for backend resilience")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--median-ms", type=float, default=20.0)
+    parser.add_argument("--spike-rate", type=float, default=0.03, help="Share of requests that hit a latency spike")
+    parser.add_argument("--spike-ms", type=float, default=800.0)
+    args = parser.parse_args(argv)
+
+    ok = tail_latency(args)
+    ok = outage(args) and ok
+    print("OK" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Summary routing benchmark.
+
+Replays a corpus of documents against a stand-in for the Groq API, with open
+loop arrivals, once per routing policy (always large, always fast, routed),
+and reports latency percentiles, SLO attainment, tokens and routing
+decisions. The stand-in's latency grows with prompt and completion tokens
+and with requests beyond each model's concurrency; it is deliberately a bit
+slower than the router's static profiles, so routing has to learn from
+observed latencies.
+
+Latencies are simulated at --time-scale and reported unscaled.
+
+    python -m benchmarks.summary_routing --documents 200 --rps 3
+    python -m benchmarks.summary_routing --corpus path/to/txt/files --slo 3
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+os.environ.setdefault("SUMMARY_STORE_PATH", "")
+
+import numpy as np  # noqa: E402
+
+from groq_analyzer import BATCH_COMPLETION_TOKENS, GroqAnalyzer  # noqa: E402
+from model_routing import FAST_MODEL, LARGE_MODEL, POLICIES, ModelProfile, ModelRouter  # noqa: E402
+from prompt_compaction import count_tokens  # noqa: E402
+
+POINTS = re.compile(r"\b(three|five|seven)-point")
+WORDS = ("report revenue policy employee contract region quarter review board minutes "
+         "payment invoice schedule project budget approval department record").split()
+
+
+def scaled(profile: ModelProfile, factor: float, slowdown: float = 1.0) -> ModelProfile:
+    """A profile whose latencies are multiplied by factor * slowdown"""
+    return profile._replace(base_seconds=profile.base_seconds * factor * slowdown,
+                            prompt_tokens_per_second=profile.prompt_tokens_per_second / (factor * slowdown),
+                            completion_tokens_per_second=profile.completion_tokens_per_second / (factor * slowdown))
+
+
+class StubGroq:
+    """Stand-in Groq client: latency from tokens and load, canned bullet-point replies"""
+
+    def __init__(self, profiles, seed: int = 5):
+        self.profiles = {profile.name: profile for profile in profiles}
+        self.active = Counter()
+        self.usage = Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, max_tokens, **kwargs):
+        profile = self.profiles[model]
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        points = POINTS.search(messages[-1]["content"])
+        expected = BATCH_COMPLETION_TOKENS[points.group(1)] if points else max_tokens // 2
+        with self._lock:
+            completion_tokens = min(max_tokens, int(expected * self._rng.uniform(0.8, 1.2)))
+            self.active[model] += 1
+            queued = max(0, self.active[model] - profile.concurrency)
+            self.usage[f"{model} prompt"] += prompt_tokens
+            self.usage[f"{model} completion"] += completion_tokens
+            jitter = self._rng.lognormvariate(0, 0.15)
+        service = (profile.base_seconds + prompt_tokens / profile.prompt_tokens_per_second
+                   + completion_tokens / profile.completion_tokens_per_second)
+        try:
+            time.sleep(service * (1 + queued / profile.concurrency) * jitter)
+        finally:
+            with self._lock:
+                self.active[model] -= 1
+        message = SimpleNamespace(content="- point one\n- point two\n- point three")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def synthetic_corpus(count: int, seed: int = 3):
+    """Mostly one-page forms, some medium documents and a few long reports"""
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(count):
+        kind = rng.random()
+        words = rng.randint(80, 250) if kind < 0.6 else rng.randint(600, 1500) if kind < 0.9 \
+            else rng.randint(3000, 12000)
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) + f" {i}.{n}" for n in range(words // 12 + 1)]
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def load_corpus(directory: str):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".txt"):
+            with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as document_file:
+                corpus.append(document_file.read())
+    return corpus
+
+
+def replay(policy: str, corpus, args) -> dict:
+    scale = args.time_scale
+    router = ModelRouter(scaled(LARGE_MODEL, scale), scaled(FAST_MODEL, scale),
+                         slo_seconds=args.slo * scale, policy=policy)
+    analyzer = GroqAnalyzer(api_key="stub", router=router)
+    # The real models are somewhat slower than their static profiles
+    analyzer.client = StubGroq([scaled(LARGE_MODEL, scale, 1.3), scaled(FAST_MODEL, scale, 1.2)])
+
+    rng = random.Random(7)
+    arrivals = np.cumsum([rng.expovariate(args.rps) * scale for _ in corpus])
+    latencies = []
+    routes = Counter()
+    lock = threading.Lock()
+
+    def request(content):
+        route = analyzer.route(content)
+        start = time.perf_counter()
+        analyzer.summarize(content, route)
+        with lock:
+            latencies.append((time.perf_counter() - start) / scale)
+            routes[f"{route.model}: {route.reason}"] += 1
+
+    began = time.perf_counter()
+    with redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=64) as pool:
+        for arrival, content in zip(arrivals, corpus):
+            time.sleep(max(0.0, began + arrival - time.perf_counter()))
+            pool.submit(request, content)
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        "policy": policy,
+        "p50": p50, "p95": p95, "p99": p99,
+        "slo_met": float(np.mean(np.array(latencies) <= args.slo)),
+        "usage": analyzer.client.usage,
+        "routes": routes,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a corpus through each summary routing policy")
+    parser.add_argument("--corpus", help="Directory of .txt documents (default: synthetic corpus)")
+    parser.add_argument("--documents", type=int, default=200, help="Synthetic corpus size")
+    parser.add_argument("--rps", type=float, default=3.0, help="Arrival rate, requests per second")
+    parser.add_argument("--slo", type=float, default=3.0, help="Latency SLO in seconds")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Simulated seconds per real second")
+    parser.add_argument("--policies", nargs="+", default=list(POLICIES), choices=POLICIES)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.documents)
+    print(f"{len(corpus)} documents, {args.rps:g} requests/s, SLO {args.slo:g}s")
+    print(f"{'policy':8} {'p50':>7} {'p95':>7} {'p99':>7} {'SLO met':>8} {'prompt tok':>11} {'compl tok':>10}")
+    results = [replay(policy, corpus, args) for policy in args.policies]
+    for result in results:
+        usage = result["usage"]
+        prompt = sum(v for k, v in usage.items() if k.endswith("prompt"))
+        completion = sum(v for k, v in usage.items() if k.endswith("completion"))
+        print(f"{result['policy']:8} {result['p50']:6.2f}s {result['p95']:6.2f}s {result['p99']:6.2f}s "
+              f"{result['slo_met']:8.0%} {prompt:11} {completion:10}")
+    for result in results:
+        print(f"\nRouting ({result['policy']}):")
+        for route, count in result["routes"].most_common():
+            print(f"  {count:5}  {route}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
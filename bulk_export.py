@@ -0,0 +1,303 @@
+"""
+Headless bulk search/export.
+
+Reads a file of queries (one per line, '#' comments allowed), runs them
+concurrently against Azure Search with bounded parallelism and paging, and
+streams the per-library metadata projection to JSONL or CSV. Optionally the
+related-document set of every hit is looked up in the Gremlin graph, one
+query per search page.
+
+Progress is recorded in a checkpoint file so an interrupted export resumes
+where it stopped. The checkpoint also records the output columns, and a
+resume that would change them (e.g. a different --related) is refused:
+
+    python bulk_export.py queries.txt -o results.jsonl --workers 4 --related
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from graph_explore import build_documents_related_query
+from gremlin_cost import submit_gremlin
+from search_core import (
+    LIBRARY_METADATA_FIELDS, create_gremlin_client, create_search_client,
+    iter_search_pages, project_metadata
+)
+
+BASE_COLUMNS = ["query_id", "query", "rank", "score", "Library", "DocumentName"]
+METADATA_COLUMNS = [field for fields in LIBRARY_METADATA_FIELDS.values() for _, field in fields]
+RELATED_COLUMN = "related_documents"
+# Seconds between checks for an aborted export while waiting on the queue or a worker slot
+ABORT_POLL_SECONDS = 0.5
+# First line of a checkpoint, followed by the JSON list of output columns
+COLUMNS_PREFIX = "# columns: "
+
+
+class ExportAborted(Exception):
+    """Raised in workers once the writer has failed and the export is stopping"""
+
+
+def read_queries(path: str) -> List[Tuple[str, str]]:
+    """Read (query_id, query) pairs, skipping blanks, comments and duplicates"""
+    queries = []
+    seen = set()
+    with open(path, encoding="utf-8") as query_file:
+        for line in query_file:
+            query = line.strip()
+            if not query or query.startswith("#"):
+                continue
+            query_id = hashlib.md5(query.encode()).hexdigest()
+            if query_id not in seen:
+                seen.add(query_id)
+                queries.append((query_id, query))
+    return queries
+
+
+def export_columns(include_related: bool) -> List[str]:
+    return BASE_COLUMNS + METADATA_COLUMNS + ([RELATED_COLUMN] if include_related else [])
+
+
+def load_checkpoint(path: str) -> Tuple[Optional[List[str]], Set[str]]:
+    """Output columns and query ids already exported by a previous run"""
+    columns = None
+    completed = set()
+    if not os.path.exists(path):
+        return columns, completed
+    with open(path, encoding="utf-8") as checkpoint_file:
+        for line in checkpoint_file:
+            line = line.strip()
+            if line.startswith(COLUMNS_PREFIX):
+                columns = json.loads(line[len(COLUMNS_PREFIX):])
+            elif line:
+                completed.add(line)
+    return columns, completed
+
+
+def discard_incomplete_rows(output_path: str, output_format: str, completed: Set[str]):
+    """
+    Drop rows of queries that did not finish in the previous run so that
+    re-running them does not produce duplicates. Streams through a temp file.
+    """
+    if not os.path.exists(output_path):
+        return
+    temp_path = output_path + ".tmp"
+    with open(output_path, encoding="utf-8", newline="") as source, \
+            open(temp_path, "w", encoding="utf-8", newline="") as target:
+        if output_format == "csv":
+            reader = csv.DictReader(source)
+            writer = csv.DictWriter(target, fieldnames=reader.fieldnames or [])
+            if reader.fieldnames:
+                writer.writeheader()
+            for row in reader:
+                if row.get("query_id") in completed:
+                    writer.writerow(row)
+        else:
+            for line in source:
+                try:
+                    if json.loads(line).get("query_id") in completed:
+                        target.write(line)
+                except ValueError:
+                    continue  # Partially written last line
+    os.replace(temp_path, output_path)
+
+
+def related_documents_for_page(gremlin_client, page: List[dict], limit: int) -> Dict[str, List[str]]:
+    """Names of documents sharing entities with each document of a search page, in one Gremlin query"""
+    query = build_documents_related_query({doc.get('DocumentName') for doc in page}, limit=limit)
+    if not query:
+        return {}
+    results, _ = submit_gremlin(gremlin_client, query, selection="bulk export")
+    return {
+        result['document']: [name for name in result['related'] if name != result['document']][:limit]
+        for result in results
+    }
+
+
+def export_rows(search_client, gremlin_client, query_id: str, query: str, args) -> Iterator[List[dict]]:
+    """Yield the export rows of one query, one search page at a time"""
+    rank = 0
+    for page in iter_search_pages(search_client, query, page_size=args.page_size,
+                                  max_results=args.max_results):
+        related = related_documents_for_page(gremlin_client, page, args.related_limit) \
+            if gremlin_client is not None else {}
+        rows = []
+        for doc in page:
+            rank += 1
+            row = {
+                "query_id": query_id,
+                "query": query,
+                "rank": rank,
+                "score": doc.get("@search.score"),
+                "Library": doc.get("Library"),
+                "DocumentName": doc.get("DocumentName"),
+            }
+            row.update(project_metadata(doc, by_field=True))
+            if gremlin_client is not None:
+                row[RELATED_COLUMN] = related.get(doc.get("DocumentName"), [])
+            rows.append(row)
+        yield rows
+
+
+class RowWriter:
+    """Streams rows to JSONL or CSV with a fixed column set"""
+
+    def __init__(self, path: str, output_format: str, include_related: bool):
+        self.output_format = output_format
+        self.columns = export_columns(include_related)
+        write_header = output_format == "csv" and (not os.path.exists(path) or os.path.getsize(path) == 0)
+        self._file = open(path, "a", encoding="utf-8", newline="")
+        if output_format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=self.columns, extrasaction="ignore")
+            if write_header:
+                self._csv.writeheader()
+
+    def write(self, row: dict):
+        if self.output_format == "csv":
+            row = dict(row)
+            if isinstance(row.get(RELATED_COLUMN), list):
+                row[RELATED_COLUMN] = "; ".join(row[RELATED_COLUMN])
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def run_export(args) -> int:
+    queries = read_queries(args.queries)
+    checkpoint_path = args.checkpoint or args.output + ".checkpoint"
+    columns = export_columns(args.related)
+    checkpoint_columns, completed = load_checkpoint(checkpoint_path)
+    if checkpoint_columns is not None and checkpoint_columns != columns:
+        if completed:
+            print(f"{args.output} was started with different columns (--related "
+                  f"{'on' if RELATED_COLUMN in checkpoint_columns else 'off'}); resume with the same options "
+                  f"or write to a new output file", file=sys.stderr)
+            return 2
+        # Nothing was exported yet: start over with the new columns
+        for path in (args.output, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    discard_incomplete_rows(args.output, args.format, completed)
+
+    pending = [(query_id, query) for query_id, query in queries if query_id not in completed]
+    print(f"{len(queries)} queries, {len(queries) - len(pending)} already exported, {len(pending)} to run",
+          file=sys.stderr)
+    if not pending:
+        return 0
+
+    search_client = create_search_client()
+    gremlin_client = create_gremlin_client() if args.related else None
+
+    # Bounded queue gives back-pressure: workers wait while the writer catches up
+    messages: "queue.Queue[tuple]" = queue.Queue(maxsize=args.workers * 4)
+    slots = threading.BoundedSemaphore(args.workers)
+    # Set when the writer fails, so workers blocked on the full queue give up
+    aborted = threading.Event()
+
+    def send(message: tuple):
+        while not aborted.is_set():
+            try:
+                messages.put(message, timeout=ABORT_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+        raise ExportAborted()
+
+    def worker(query_id: str, query: str):
+        try:
+            for rows in export_rows(search_client, gremlin_client, query_id, query, args):
+                send(("rows", query_id, rows))
+            send(("done", query_id, None))
+        except ExportAborted:
+            pass
+        except Exception as e:
+            try:
+                send(("error", query_id, f"{query!r}: {e}"))
+            except ExportAborted:
+                pass
+        finally:
+            slots.release()
+
+    writer = RowWriter(args.output, args.format, include_related=args.related)
+    failures = 0
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint_file, \
+            ThreadPoolExecutor(max_workers=args.workers) as executor:
+        if checkpoint_file.tell() == 0:
+            checkpoint_file.write(COLUMNS_PREFIX + json.dumps(columns) + "\n")
+            checkpoint_file.flush()
+
+        def submit_all():
+            for query_id, query in pending:
+                while not slots.acquire(timeout=ABORT_POLL_SECONDS):
+                    if aborted.is_set():
+                        return
+                if aborted.is_set():
+                    slots.release()
+                    return
+                executor.submit(worker, query_id, query)
+
+        submitter = threading.Thread(target=submit_all, daemon=True)
+        submitter.start()
+
+        try:
+            finished = 0
+            while finished < len(pending):
+                kind, query_id, payload = messages.get()
+                if kind == "rows":
+                    for row in payload:
+                        writer.write(row)
+                    continue
+                finished += 1
+                if kind == "done":
+                    # Rows must be durable before the query is marked complete
+                    writer.flush()
+                    checkpoint_file.write(query_id + "\n")
+                    checkpoint_file.flush()
+                else:
+                    failures += 1
+                    print(f"Query failed: {payload}", file=sys.stderr)
+                print(f"[{finished}/{len(pending)}] {kind} {query_id}", file=sys.stderr)
+        except BaseException:
+            # Unblock the workers and the submitter so the pool can shut down
+            aborted.set()
+            raise
+        finally:
+            submitter.join()
+            writer.close()
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run a file of search queries and export the results")
+    parser.add_argument("queries", help="Text file with one query per line")
+    parser.add_argument("-o", "--output", required=True, help="Output file (.jsonl or .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"],
+                        help="Output format (default: from the output file extension)")
+    parser.add_argument("--workers", type=int, default=4, help="Queries run in parallel")
+    parser.add_argument("--page-size", type=int, default=50, help="Search results fetched per request")
+    parser.add_argument("--max-results", type=int, default=1000, help="Results exported per query")
+    parser.add_argument("--related", action="store_true", help="Include related documents from the graph")
+    parser.add_argument("--related-limit", type=int, default=20, help="Related documents per result")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    args = parser.parse_args(argv)
+    if not args.format:
+        args.format = "csv" if args.output.lower().endswith(".csv") else "jsonl"
+    args.workers = max(1, args.workers)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run_export(parse_args()))
@@ -0,0 +1,212 @@
+"""
+Process-wide caches shared by the Streamlit sessions and the HTTP API.
+
+Each cache is an in-memory TTL map with single-flight `get_or_compute`: when
+several threads ask for the same missing key, one computes it and the others
+wait for its result instead of repeating the backend call.
+
+Shared caches also read and write through the node-wide SQLite tier (see
+shared_cache.py), so worker processes on the same node reuse each other's
+results and only one of them computes a missing key.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from shared_cache import get_shared_store, storage_key
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and single-flight computation"""
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int, shared: bool = False):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value), looking in the shared tier on a local miss"""
+        with self._lock:
+            found, value = self._get_locked(key)
+            if found:
+                self.hits += 1
+                return found, value
+            self.misses += 1
+
+        store = self._store()
+        if store is None:
+            return False, None
+        try:
+            found, value, ttl = store.get(self.name, storage_key(key))
+        except sqlite3.Error as e:
+            print(f"DEBUG - Shared cache read failed for {self.name}: {str(e)}")  # For debugging
+            return False, None
+        if found:
+            # Expires locally when it expires in the shared tier
+            self._set_local(key, value, ttl)
+        return found, value
+
+    def _get_locked(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            # Expired entries stay until evicted, for get_stale
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def get_stale(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return (found, value) from this process, ignoring expiry. Used when the backend is down."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            return True, entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._set_local(key, value)
+        store = self._store()
+        if store is not None:
+            try:
+                store.set(self.name, storage_key(key), value, self.ttl_seconds)
+            except sqlite3.Error as e:
+                print(f"DEBUG - Shared cache write failed for {self.name}: {str(e)}")  # For debugging
+
+    def _set_local(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds),
+                                  value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value or compute it once. Exceptions from `compute`
+        propagate to the caller and nothing is cached.
+        """
+        while True:
+            with self._lock:
+                found, value = self._get_locked(key)
+                if found:
+                    self.hits += 1
+                    return value
+                event = self._inflight.get(key)
+                if event is None:
+                    # This thread computes the value
+                    self.misses += 1
+                    event = threading.Event()
+                    self._inflight[key] = event
+                    break
+            # Another thread is computing it; wait and look again
+            event.wait()
+
+        try:
+            found, value, ttl = self._get_or_compute_shared(key, compute)
+            if found:
+                self._set_local(key, value, ttl)
+            else:
+                self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    def _store(self):
+        return get_shared_store() if self.shared else None
+
+    def _get_or_compute_shared(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[bool, Any, float]:
+        """
+        Cross-process single-flight. Returns (found, value, ttl), where found
+        means the value came from the shared tier rather than from `compute`
+        and ttl is the time it has left there.
+        """
+        store = self._store()
+        if store is None:
+            return False, compute(), self.ttl_seconds
+
+        shared_key = storage_key(key)
+        try:
+            found, value, ttl = store.get(self.name, shared_key, count_miss=False)
+            if found:
+                return True, value, ttl
+            # Wait for whichever process holds the lock; take over if it gives up
+            while not store.acquire(self.name, shared_key):
+                found, value, ttl = store.wait_for(self.name, shared_key)
+                if found:
+                    return True, value, ttl
+            store.record(self.name, hit=False)
+        except sqlite3.Error as e:
+            print(f"DEBUG - Shared cache unavailable for {self.name}: {str(e)}")  # For debugging
+            return False, compute(), self.ttl_seconds
+
+        try:
+            return False, compute(), self.ttl_seconds
+        finally:
+            try:
+                store.release(self.name, shared_key)
+            except sqlite3.Error:
+                # The lock lease expires on its own
+                pass
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one key, or everything if no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        store = self._store()
+        if store is not None:
+            try:
+                store.delete(self.name, None if key is None else storage_key(key))
+            except sqlite3.Error as e:
+                print(f"DEBUG - Shared cache invalidation failed for {self.name}: {str(e)}")  # For debugging
+
+    def stats(self) -> dict:
+        """Per-process counters, plus node-wide counters for shared caches"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "cache": self.name,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+        store = self._store()
+        if store is not None:
+            try:
+                stats.update(store.stats(self.name))
+            except sqlite3.Error as e:
+                print(f"DEBUG - Shared cache stats failed for {self.name}: {str(e)}")  # For debugging
+        return stats
+
+
+search_cache = TTLCache("search", float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300")), 256, shared=True)
+document_cache = TTLCache("document", float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300")), 1024, shared=True)
+related_cache = TTLCache("related", float(os.getenv("RELATED_CACHE_TTL_SECONDS", "600")), 256, shared=True)
+summary_cache = TTLCache("summary", float(os.getenv("SUMMARY_CACHE_TTL_SECONDS", "86400")), 2048, shared=True)
+# All entity names in the graph, for the entity index
+entity_names_cache = TTLCache("entity_names", float(os.getenv("ENTITY_INDEX_TTL_SECONDS", "3600")), 1, shared=True)
+# Node positions of entity network graphs, by graph digest
+layout_cache = TTLCache("layout", float(os.getenv("LAYOUT_CACHE_TTL_SECONDS", "86400")), 256, shared=True)
+# Signatures are cheap to recompute, so they stay per process
+signature_cache = TTLCache("signature", 86400, 20000)
+# Compacted summary prompts, by content digest and token budget
+compaction_cache = TTLCache("compaction", 86400, 256)
+
+ALL_CACHES = (search_cache, document_cache, related_cache, summary_cache, entity_names_cache, layout_cache,
+              signature_cache, compaction_cache)
@@ -0,0 +1,202 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding.
+
+Scanned corpora contain many near-identical OCR documents. Each document gets
+a MinHash signature once (cached by name and content checksum), computed with
+NumPy over word 3-gram shingles of its lower-cased text. Signatures are
+banded into LSH buckets so only likely pairs are compared. Documents with
+fewer than SHINGLE_SIZE words have no signature and are never clustered.
+
+Related-document results from the graph carry no content, so their signatures
+are built from the set of entities they mention instead.
+"""
+import re
+import threading
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from caches import signature_cache
+from summary_store import content_digest
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+SIMILARITY_THRESHOLD = 0.8
+
+SHINGLE_SIZE = 3
+MAX_SHINGLE_CHARS = 8000
+
+# Multiply-shift hash family: h(x) = (a * x + b) mod 2**64 >> 32, with odd a
+_rng = np.random.RandomState(20240501)
+_PERMUTATION_A = _rng.randint(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_PERMUTATION_B = _rng.randint(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_SHIFT = np.uint64(32)
+_SHINGLE_WEIGHTS = np.array([1000003 ** k for k in range(SHINGLE_SIZE)][::-1], dtype=np.uint64)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def minhash(hashes: np.ndarray) -> Optional[np.ndarray]:
+    """MinHash signature of a set of 32-bit shingle hashes, or None for an empty set"""
+    if hashes.size == 0:
+        return None
+    hashes = np.unique(hashes.astype(np.uint64))
+    # uint64 arithmetic wraps around, which is the mod 2**64 of the hash family
+    permuted = (_PERMUTATION_A[:, None] * hashes[None, :] + _PERMUTATION_B[:, None]) >> _SHIFT
+    return permuted.min(axis=1)
+
+
+def text_signature(text: str) -> Optional[np.ndarray]:
+    """Signature over word shingles of the lower-cased text, or None if it has no full shingle"""
+    tokens = _TOKEN_PATTERN.findall(text[:MAX_SHINGLE_CHARS].lower())
+    data = np.fromiter((zlib.crc32(token.encode()) for token in tokens), dtype=np.uint64, count=len(tokens))
+    if data.size < SHINGLE_SIZE:
+        return None
+    # Polynomial hash of every SHINGLE_SIZE-word window (uint64 wrap-around), folded to 32 bits
+    windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_SIZE)
+    return minhash((windows * _SHINGLE_WEIGHTS).sum(axis=1) >> _SHIFT)
+
+
+def entity_signature(entities: Iterable[str]) -> Optional[np.ndarray]:
+    """Signature over a set of entity names, or None if there are none"""
+    hashes = np.fromiter((zlib.crc32(entity.lower().encode()) for entity in entities), dtype=np.uint64)
+    return minhash(hashes)
+
+
+def document_signature(doc: dict) -> Optional[np.ndarray]:
+    """Signature of a search result, computed once per document name and content"""
+    content = doc.get('merged_content') or ''
+    key = (doc.get('DocumentName'), zlib.crc32(content[:MAX_SHINGLE_CHARS].encode("utf-8", "ignore")))
+    return signature_cache.get_or_compute(key, lambda: text_signature(content))
+
+
+def related_document_signature(doc: dict) -> Optional[np.ndarray]:
+    """Signature of a graph result, from the entities it mentions"""
+    entities = [f"{label}:{name}" for label, names in (doc.get('matched_entities') or {}).items()
+                for name in names]
+    return entity_signature(entities)
+
+
+def similarity(first: np.ndarray, second: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(first == second))
+
+
+def _band_keys(signature: np.ndarray):
+    for band in range(BANDS):
+        yield band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+
+
+def cluster_near_duplicates(signatures: List[Optional[np.ndarray]],
+                            threshold: float = SIMILARITY_THRESHOLD) -> Dict[int, List[int]]:
+    """
+    Group near-duplicates. Returns {representative index: [duplicate indices]}
+    for clusters with more than one member; the representative is the first
+    member in list order, so the caller's ranking is preserved. Each document
+    joins the first representative it is similar to, so clusters do not chain
+    through intermediate documents. Documents without a signature stay alone.
+    """
+    # Only representatives are bucketed: they are the only merge candidates
+    buckets: Dict[tuple, List[int]] = {}
+    clusters: Dict[int, List[int]] = {}
+    for idx, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        band_keys = list(_band_keys(signature))
+        candidates = sorted({rep for band_key in band_keys for rep in buckets.get(band_key, ())})
+        representative = next((rep for rep in candidates
+                               if similarity(signature, signatures[rep]) >= threshold), None)
+        if representative is not None:
+            clusters.setdefault(representative, []).append(idx)
+            continue
+        for band_key in band_keys:
+            buckets.setdefault(band_key, []).append(idx)
+    return clusters
+
+
+def find_near_duplicates(documents: List[dict]) -> Dict[int, List[int]]:
+    """Near-duplicate clusters of search results, by content"""
+    return cluster_near_duplicates([document_signature(doc) for doc in documents])
+
+
+def find_related_near_duplicates(documents: List[dict]) -> Dict[int, List[int]]:
+    """Near-duplicate clusters of graph results, by mentioned entities"""
+    return cluster_near_duplicates([related_document_signature(doc) for doc in documents])
+
+
+class CanonicalDocumentIndex:
+    """
+    Process-wide LSH index mapping each document to the canonical member of
+    its near-duplicate cluster, so work such as summaries can be shared. The
+    canonical member is the lexicographically smallest name among the
+    near-duplicates seen, so processes that have seen the same documents agree.
+    """
+
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD, max_documents: int = 50000):
+        self.threshold = threshold
+        self.max_documents = max_documents
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._digests: Dict[str, str] = {}
+        self._buckets: Dict[tuple, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _remove(self, doc_name: str):
+        for band_key in _band_keys(self._signatures.pop(doc_name)):
+            bucket = self._buckets[band_key]
+            bucket.remove(doc_name)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def canonical(self, doc_name: str, signature: Optional[np.ndarray], digest: str) -> Tuple[str, str]:
+        """
+        Name and content digest of the canonical near-duplicate of this
+        document (possibly itself). A document without a signature is its own.
+        """
+        with self._lock:
+            known = self._signatures.get(doc_name)
+            if signature is None:
+                if known is not None:
+                    self._remove(doc_name)
+                    self._digests.pop(doc_name, None)
+                return doc_name, digest
+            if known is not None and not np.array_equal(known, signature):
+                # Edited since last seen: index it again under its new signature
+                self._remove(doc_name)
+                known = None
+            if known is None:
+                if len(self._signatures) >= self.max_documents:
+                    self._signatures.clear()
+                    self._digests.clear()
+                    self._buckets.clear()
+                self._signatures[doc_name] = signature
+                for band_key in _band_keys(signature):
+                    self._buckets.setdefault(band_key, []).append(doc_name)
+            self._digests[doc_name] = digest
+
+            canonical = doc_name
+            for band_key in _band_keys(signature):
+                for other in self._buckets.get(band_key, ()):
+                    if other < canonical and similarity(signature, self._signatures[other]) >= self.threshold:
+                        canonical = other
+            return canonical, self._digests[canonical]
+
+
+canonical_index = CanonicalDocumentIndex()
+
+
+def canonical_document(doc: dict) -> Tuple[str, str]:
+    """Canonical near-duplicate name and content digest for a search result"""
+    return canonical_index.canonical(doc.get('DocumentName'), document_signature(doc),
+                                     content_digest(doc.get('merged_content') or ''))
+
+
+def cluster_summary_key(doc: dict) -> str:
+    """
+    Summary cache key shared by every near-duplicate of a search result. It
+    includes the canonical document's content digest, so editing it
+    invalidates the cluster's summary.
+    """
+    name, digest = canonical_document(doc)
+    return f"cluster:{name}:{digest}"
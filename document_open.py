@@ -0,0 +1,138 @@
+"""
+Concurrent fan-out behind opening a document.
+
+Opening a document needs its content, its summary and, speculatively, the
+documents related to its top entities. The calls start together on a shared
+worker pool; the summary starts as soon as the content arrives, and the
+related-documents query only needs the entity names already known from the
+row that was clicked. The page renders each section as its future completes,
+so opening a document takes as long as the slowest call rather than their sum.
+
+Work is keyed and single-flight: a rerun while a call is still in flight
+waits on the same future instead of starting it again.
+"""
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, NamedTuple, Optional, Set
+
+from dedup import cluster_summary_key
+from graph_explore import ENTITY_LABELS, LOCATION_LABEL, ORGANIZATION_LABEL, PEOPLE_LABEL
+from groq_analyzer import get_summary
+from search_core import fetch_document, fetch_related_documents
+
+SPECULATIVE_ENTITIES = int(os.getenv("SPECULATIVE_RELATED_ENTITIES", "3"))
+
+# Search document fields holding each label's entity names
+ENTITY_FIELDS = {PEOPLE_LABEL: 'people', ORGANIZATION_LABEL: 'organizations', LOCATION_LABEL: 'locations'}
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("DOCUMENT_OPEN_WORKERS", "16")),
+                           thread_name_prefix="document-open")
+_inflight: Dict[Hashable, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def submit_once(key: Hashable, func: Callable[[], object]) -> Future:
+    """Run `func` on the pool, or return the future of the same work still in flight"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future
+        future = _inflight[key] = _pool.submit(func)
+    future.add_done_callback(lambda done: _forget(key, done))
+    return future
+
+
+def _forget(key: Hashable, future: Future):
+    with _inflight_lock:
+        if _inflight.get(key) is future:
+            del _inflight[key]
+
+
+def then(future: Future, key: Hashable, func: Callable[[object], object]) -> Future:
+    """Run `func(result)` on the pool once `future` succeeds, without holding a worker while waiting"""
+    chained: Future = Future()
+
+    def start(done: Future):
+        try:
+            value = done.result()
+        except Exception as e:
+            chained.set_exception(e)
+            return
+        inner = submit_once(key, lambda: func(value))
+        inner.add_done_callback(lambda result: _copy_result(result, chained))
+
+    future.add_done_callback(start)
+    return chained
+
+
+def _copy_result(source: Future, target: Future):
+    error = source.exception()
+    if error is not None:
+        target.set_exception(error)
+    else:
+        target.set_result(source.result())
+
+
+def completed(value) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+def top_entities(doc: dict, limit: int = SPECULATIVE_ENTITIES) -> Dict[str, Set[str]]:
+    """
+    The first `limit` entity names of a search document or related-documents
+    row, taking one label at a time so every kind of entity is represented
+    """
+    matched = doc.get('matched_entities') or {}
+    lists = [list(matched.get(label) or doc.get(ENTITY_FIELDS[label]) or ()) for label in ENTITY_LABELS]
+    entities: Dict[str, Set[str]] = {label: set() for label in ENTITY_LABELS}
+    taken = 0
+    for depth in range(max((len(names) for names in lists), default=0)):
+        for label, names in zip(ENTITY_LABELS, lists):
+            if taken < limit and depth < len(names) and names[depth] not in entities[label]:
+                entities[label].add(names[depth])
+                taken += 1
+    return entities
+
+
+class DocumentFutures(NamedTuple):
+    # The full search document
+    content: Future
+    # Summary text, or None when not requested
+    summary: Optional[Future]
+    # (results, cost, used_cheap_plan) for `related_entities`, or None when not speculating
+    related: Optional[Future]
+    related_entities: Dict[str, Set[str]]
+
+
+def open_document(search_client, groq_analyzer, gremlin_client, doc_name: str,
+                  doc: Optional[dict] = None, hint: Optional[dict] = None,
+                  summarize: bool = True, speculate: bool = True,
+                  session_spent: float = 0.0) -> DocumentFutures:
+    """
+    Start everything needed to show a document. `doc` is the full document if
+    already known; `hint` is any row describing it (e.g. a related-documents
+    row), used to pick the entities to speculate on before the content arrives.
+    """
+    if doc is not None:
+        content = completed(doc)
+    else:
+        content = submit_once(("document", doc_name), lambda: fetch_document(search_client, doc_name))
+
+    def generate_summary(full_doc):
+        if full_doc is None:
+            return None
+        # Summaries are shared across sessions, and across near-duplicates of a document
+        return get_summary(groq_analyzer, doc_name, full_doc.get('merged_content', ''),
+                           cache_key=cluster_summary_key(full_doc))
+    summary = then(content, ("summary", doc_name), generate_summary) if summarize else None
+
+    entities = top_entities(doc or hint or {})
+    related = None
+    if speculate and any(entities.values()):
+        selection = tuple((label, tuple(sorted(entities[label]))) for label in ENTITY_LABELS)
+        related = submit_once(("related", selection),
+                              lambda: fetch_related_documents(gremlin_client, entities, session_spent))
+    return DocumentFutures(content, summary, related, entities)
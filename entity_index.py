@@ -0,0 +1,173 @@
+"""
+Fuzzy entity name search over a local trigram index.
+
+All people, organization and location names in the graph are loaded once
+per process (through the shared entity_names cache, so one worker per node
+queries Gremlin) and indexed by the trigrams of their normalized form: case
+folded, diacritics removed, punctuation and whitespace collapsed. A lookup
+counts shared trigrams from the posting lists and ranks candidates by
+similarity, boosting names that start with the typed text, so it answers in
+milliseconds without a backend call.
+
+Names that normalize to the same form (e.g. "José Pérez" and "Jose Perez")
+are one candidate; choosing it selects every spelling, since the graph
+lookup needs exact names.
+"""
+import heapq
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from graph_explore import ENTITY_LABELS
+from search_core import fetch_entity_names
+
+MAX_MATCHES = 10
+MIN_SCORE = 0.3
+# Bonus for candidates that start with the query, or have a word that does
+PREFIX_BONUS = 0.3
+WORD_PREFIX_BONUS = 0.15
+INDEX_MAX_AGE_SECONDS = float(os.getenv("ENTITY_INDEX_TTL_SECONDS", "3600"))
+# Wait before retrying a failed build
+BUILD_RETRY_SECONDS = 60.0
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """Case-folded name without diacritics, punctuation or extra whitespace"""
+    decomposed = unicodedata.normalize("NFKD", name or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", stripped.casefold()).strip()
+
+
+def display_name(names: Iterable[str]) -> str:
+    """The spelling to show: mixed case and with diacritics where there is one"""
+    return max(names, key=lambda name: (not name.isupper(), sum(ord(char) > 127 for char in name), name))
+
+
+def name_trigrams(normalized: str) -> Set[str]:
+    """Trigrams of each word, padded so short words and word starts count"""
+    grams = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class EntityMatch(NamedTuple):
+    label: str
+    # Best known spelling, for display
+    name: str
+    # Every spelling that normalizes the same way
+    names: Tuple[str, ...]
+    score: float
+
+
+class EntityIndex:
+    """Trigram index over (label, name) pairs"""
+
+    def __init__(self, entities: Dict[str, Iterable[str]]):
+        spellings: Dict[Tuple[str, str], List[str]] = {}
+        for label, names in entities.items():
+            for name in names:
+                normalized = normalize_name(name)
+                if normalized:
+                    spellings.setdefault((label, normalized), []).append(name)
+
+        self._entries: List[Tuple[str, str, Tuple[str, ...]]] = []
+        self._sizes: List[int] = []
+        self._postings: Dict[str, List[int]] = {}
+        for (label, normalized), names in spellings.items():
+            entry_id = len(self._entries)
+            self._entries.append((label, normalized, tuple(sorted(set(names)))))
+            grams = name_trigrams(normalized)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(entry_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def search(self, query: str, limit: int = MAX_MATCHES,
+               labels: Optional[Iterable[str]] = None) -> List[EntityMatch]:
+        """Best fuzzy matches for `query`, optionally restricted to some labels"""
+        normalized = normalize_name(query)
+        grams = name_trigrams(normalized)
+        if not grams:
+            return []
+        overlaps = Counter()
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings:
+                overlaps.update(postings)
+
+        allowed = set(labels) if labels is not None else None
+        scored = []
+        for entry_id, overlap in overlaps.items():
+            label, name, names = self._entries[entry_id]
+            if allowed is not None and label not in allowed:
+                continue
+            score = overlap / (len(grams) + self._sizes[entry_id] - overlap)
+            if name.startswith(normalized):
+                score += PREFIX_BONUS
+            elif f" {normalized}" in f" {name}":
+                score += WORD_PREFIX_BONUS
+            if score >= MIN_SCORE:
+                scored.append((score, entry_id))
+
+        matches = []
+        for score, entry_id in heapq.nlargest(limit, scored):
+            label, _, names = self._entries[entry_id]
+            matches.append(EntityMatch(label, display_name(names), names, round(score, 3)))
+        return matches
+
+
+_index: Optional[EntityIndex] = None
+_built_at = 0.0
+_retry_at = 0.0
+_building = False
+_index_lock = threading.Lock()
+
+
+def get_entity_index(gremlin_client, max_age_seconds: float = INDEX_MAX_AGE_SECONDS) -> Optional[EntityIndex]:
+    """
+    The process-wide entity index, or None while the first build is running.
+    Builds run in the background; a stale index keeps answering during a rebuild.
+    """
+    global _building
+    with _index_lock:
+        now = time.monotonic()
+        stale = _index is None or now - _built_at >= max_age_seconds
+        if stale and not _building and now >= _retry_at:
+            _building = True
+            threading.Thread(target=_build, args=(gremlin_client,), name="entity-index", daemon=True).start()
+        return _index
+
+
+def _build(gremlin_client):
+    global _index, _built_at, _retry_at, _building
+    try:
+        started = time.perf_counter()
+        index = EntityIndex(fetch_entity_names(gremlin_client))
+        print(f"DEBUG - Entity index built: {len(index)} names "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")  # For debugging
+        with _index_lock:
+            _index, _built_at = index, time.monotonic()
+    except Exception as e:
+        print(f"DEBUG - Entity index build failed: {str(e)}")  # For debugging
+        _retry_at = time.monotonic() + BUILD_RETRY_SECONDS
+    finally:
+        with _index_lock:
+            _building = False
+
+
+def split_by_label(matches: Iterable[EntityMatch]) -> Dict[str, Set[str]]:
+    """Chosen matches as exact names by graph label, for the related-documents lookup"""
+    entities: Dict[str, Set[str]] = {label: set() for label in ENTITY_LABELS}
+    for match in matches:
+        entities.setdefault(match.label, set()).update(match.names)
+    return entities
@@ -0,0 +1,148 @@
+"""
+Document-entity network of related documents, drawn with WebGL.
+
+Related documents and the entities they mention form a bipartite graph.
+Large result sets are cut to the top documents (most selected entities
+matched, then most entities mentioned) and the entities they share most, so
+the figure stays readable. Node positions come from a networkx spring layout
+computed once per graph and kept in the shared layout cache; every trace is
+a Scattergl, so thousands of points are drawn on the GPU.
+"""
+import hashlib
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+import networkx as nx
+import plotly.graph_objects as go
+
+from caches import layout_cache
+from graph_explore import ENTITY_LABELS, LOCATION_LABEL, ORGANIZATION_LABEL, PEOPLE_LABEL
+
+# Up to 400 nodes networkx lays out with the dense solver, in about 0.2 s at
+# 50 iterations; from 500 nodes it switches to the sparse one, several times slower
+MAX_DOCUMENTS = int(os.getenv("NETWORK_MAX_DOCUMENTS", "200"))
+MAX_ENTITIES = int(os.getenv("NETWORK_MAX_ENTITIES", "200"))
+LAYOUT_ITERATIONS = 50
+LAYOUT_SEED = 7
+
+DOCUMENT_KIND = "document"
+NODE_STYLES = {
+    DOCUMENT_KIND: ("Documents", "#1f77b4", "square"),
+    PEOPLE_LABEL: ("People", "#2ca02c", "circle"),
+    ORGANIZATION_LABEL: ("Organizations", "#ff7f0e", "diamond"),
+    LOCATION_LABEL: ("Locations", "#9467bd", "triangle-up"),
+}
+
+
+def node_id(kind: str, name: str) -> str:
+    return f"{kind}:{name}"
+
+
+def rank_documents(documents: List[dict], selected: Dict[str, Set[str]]) -> List[dict]:
+    """Documents matching the most selected entities first, then those mentioning the most entities"""
+    def rank(doc):
+        matched = doc.get('matched_entities') or {}
+        hits = sum(len(set(names) & selected.get(label, set())) for label, names in matched.items())
+        total = sum(len(names) for names in matched.values())
+        return (-hits, -total, doc['document'])
+    return sorted(documents, key=rank)
+
+
+def build_network(documents: List[dict], selected: Dict[str, Set[str]],
+                  max_documents: int = MAX_DOCUMENTS, max_entities: int = MAX_ENTITIES) -> nx.Graph:
+    """Bipartite document-entity graph of the top documents and their most shared entities"""
+    top = rank_documents(documents, selected)[:max_documents]
+
+    # Selected entities are always kept, then the ones most documents share
+    mentions: Dict[Tuple[str, str], int] = {}
+    for doc in top:
+        for label, names in (doc.get('matched_entities') or {}).items():
+            if label in ENTITY_LABELS:
+                for name in set(names):
+                    mentions[(label, name)] = mentions.get((label, name), 0) + 1
+    kept = set(sorted(mentions, key=lambda entity: (entity[1] not in selected.get(entity[0], set()),
+                                                     -mentions[entity], entity))[:max_entities])
+
+    graph = nx.Graph()
+    for doc in top:
+        document = node_id(DOCUMENT_KIND, doc['document'])
+        graph.add_node(document, kind=DOCUMENT_KIND, name=doc['document'], library=doc.get('library'))
+        for label, names in (doc.get('matched_entities') or {}).items():
+            for name in set(names):
+                if (label, name) in kept:
+                    entity = node_id(label, name)
+                    graph.add_node(entity, kind=label, name=name,
+                                   selected=name in selected.get(label, set()))
+                    graph.add_edge(document, entity)
+    return graph
+
+
+def graph_key(graph: nx.Graph) -> str:
+    """Digest of the graph's nodes and edges, so each distinct graph is laid out once"""
+    digest = hashlib.sha1()
+    for node in sorted(graph.nodes):
+        digest.update(node.encode("utf-8") + b"\0")
+    for edge in sorted(tuple(sorted(edge)) for edge in graph.edges):
+        digest.update("\1".join(edge).encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def compute_layout(graph: nx.Graph) -> Dict[str, Tuple[float, float]]:
+    positions = nx.spring_layout(graph, iterations=LAYOUT_ITERATIONS, seed=LAYOUT_SEED)
+    return {node: (float(x), float(y)) for node, (x, y) in positions.items()}
+
+
+def get_layout(graph: nx.Graph) -> Dict[str, Tuple[float, float]]:
+    """Node positions through the shared layout cache"""
+    if graph.number_of_nodes() == 0:
+        return {}
+    return layout_cache.get_or_compute(graph_key(graph), lambda: compute_layout(graph))
+
+
+def network_figure(graph: nx.Graph, positions: Dict[str, Tuple[float, float]],
+                   height: Optional[int] = 600) -> go.Figure:
+    """WebGL figure: one trace for the edges and one per node kind"""
+    edge_x: List[Optional[float]] = []
+    edge_y: List[Optional[float]] = []
+    for source, target in graph.edges:
+        (x0, y0), (x1, y1) = positions[source], positions[target]
+        edge_x.extend((x0, x1, None))
+        edge_y.extend((y0, y1, None))
+    traces = [go.Scattergl(x=edge_x, y=edge_y, mode="lines", hoverinfo="skip", showlegend=False,
+                           line=dict(width=0.5, color="#c8c8c8"))]
+
+    for kind, (title, color, symbol) in NODE_STYLES.items():
+        nodes = [node for node, data in graph.nodes(data=True) if data['kind'] == kind]
+        if not nodes:
+            continue
+        hover = []
+        sizes = []
+        for node in nodes:
+            data = graph.nodes[node]
+            degree = graph.degree[node]
+            if kind == DOCUMENT_KIND:
+                hover.append(f"{data['name']}<br>{data.get('library') or 'Unknown'} · {degree} entities")
+                sizes.append(9)
+            else:
+                hover.append(f"{data['name']}<br>{degree} documents")
+                sizes.append(14 if data.get('selected') else min(6 + degree, 12))
+        traces.append(go.Scattergl(
+            x=[positions[node][0] for node in nodes],
+            y=[positions[node][1] for node in nodes],
+            mode="markers", name=title, hovertext=hover, hoverinfo="text",
+            marker=dict(size=sizes, color=color, symbol=symbol, line=dict(width=0.5, color="white")),
+        ))
+
+    figure = go.Figure(traces)
+    figure.update_layout(
+        height=height, margin=dict(l=0, r=0, t=10, b=0), hovermode="closest",
+        legend=dict(orientation="h", yanchor="bottom", y=1.0, x=0),
+        xaxis=dict(visible=False), yaxis=dict(visible=False),
+        plot_bgcolor="white",
+    )
+    return figure
+
+
+def network_documents(graph: nx.Graph) -> List[str]:
+    """Names of the documents shown in the network"""
+    return sorted(data['name'] for _, data in graph.nodes(data=True) if data['kind'] == DOCUMENT_KIND)
@@ -0,0 +1,193 @@
+"""
+Multi-hop entity graph exploration.
+
+Expands documents -> entities -> documents breadth-first. Every hop is one
+bounded Gremlin query (server-side `limit`), the entity frontier for the next
+hop is derived locally from the `matched_entities` already returned, and a
+visited set keeps documents and entities from being expanded twice. Hops
+count against the session RU budget: each hop's result size is capped by the
+per-query budget, and exploration stops once the session budget is spent.
+"""
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Set
+
+from gremlin_cost import describe_selection, normalize_query_shape, plan_result_limit, submit_gremlin
+
+# Vertex labels used in the graph ('peopl' matches the database label)
+PEOPLE_LABEL = 'peopl'
+ORGANIZATION_LABEL = 'organization'
+LOCATION_LABEL = 'location'
+ENTITY_LABELS = (PEOPLE_LABEL, ORGANIZATION_LABEL, LOCATION_LABEL)
+
+MAX_HOPS = 3
+DEFAULT_DOCUMENT_FANOUT = 50
+DEFAULT_ENTITY_FANOUT = 20
+
+
+def entities_by_label(selected_people, selected_organizations, selected_locations) -> Dict[str, Set[str]]:
+    """Map the UI entity selections onto graph vertex labels"""
+    return {
+        PEOPLE_LABEL: set(selected_people or ()),
+        ORGANIZATION_LABEL: set(selected_organizations or ()),
+        LOCATION_LABEL: set(selected_locations or ()),
+    }
+
+
+def build_related_documents_query(entities: Dict[str, Set[str]],
+                                  exclude_documents: Optional[Set[str]] = None,
+                                  limit: Optional[int] = None,
+                                  matched_only: bool = False,
+                                  ranked: bool = False) -> str:
+    """
+    Build the Gremlin query for documents that mention any of the given entities.
+    With `matched_only` the cheaper plan is used: only the given entities are
+    projected per document instead of every entity the document mentions.
+    With `ranked` documents matching the most given entities come first, then
+    those mentioning the most entities, so a limit keeps the top documents.
+    Returns an empty string if no entities are given.
+    """
+    # Build the OR conditions dynamically based on which labels have names
+    or_conditions = []
+    for label in ENTITY_LABELS:
+        names = sorted(entities.get(label) or ())
+        if names:
+            or_conditions.append(f"has('name', within({str(names)})).hasLabel('{label}')")
+    if not or_conditions:
+        return ""
+
+    # Join the conditions with .or()
+    or_clause = ".or(" + ",".join(or_conditions) + ")"
+
+    exclude_clause = ""
+    if exclude_documents:
+        exclude_clause = f".has('name', without({str(sorted(exclude_documents))}))"
+
+    order_clause = ""
+    if ranked:
+        order_clause = (f".order().by(out('mentions'){or_clause}.count(), decr)"
+                        f".by(out('mentions').count(), decr).by('name')")
+
+    limit_clause = f".limit({int(limit)})" if limit else ""
+
+    mentions = "out('mentions')"
+    if matched_only:
+        mentions += or_clause
+
+    return f"""
+        g.V()
+        .hasLabel('document')
+        .where(
+            out('mentions')
+            {or_clause}
+        ){exclude_clause}{order_clause}{limit_clause}
+        .project('document', 'library', 'matched_entities')
+        .by('name')
+        .by(out('belongs_to').values('name'))
+        .by(
+            {mentions}
+            .group()
+            .by('type')
+            .by(values('name').fold())
+        )
+        """
+
+
+def build_documents_related_query(document_names: Set[str], limit: Optional[int] = None) -> str:
+    """
+    Build one Gremlin query for the documents sharing an entity with each of
+    the given documents: a {'document', 'related'} row per document found in
+    the graph. A document can appear in its own related list, so callers
+    drop it (and fetch one extra name when limiting).
+    Returns an empty string if no documents are given.
+    """
+    names = sorted(name for name in document_names if name)
+    if not names:
+        return ""
+    limit_clause = f".limit({int(limit) + 1})" if limit else ""
+    return f"""
+        g.V()
+        .hasLabel('document')
+        .has('name', within({str(names)}))
+        .project('document', 'related')
+        .by('name')
+        .by(
+            out('mentions')
+            .in('mentions')
+            .hasLabel('document')
+            .values('name')
+            .dedup(){limit_clause}
+            .fold()
+        )
+        """
+
+
+def next_entity_frontier(documents: List[dict], visited_entities: Dict[str, Set[str]],
+                         entity_fanout: int) -> Dict[str, Set[str]]:
+    """
+    Pick the entities to expand on the next hop from the documents just found.
+    Entities shared by the most documents are preferred; visited ones are skipped.
+    """
+    counts = Counter()
+    for doc in documents:
+        for label, names in (doc.get('matched_entities') or {}).items():
+            if label not in ENTITY_LABELS:
+                continue
+            for name in set(names):
+                if name not in visited_entities.get(label, ()):
+                    counts[(label, name)] += 1
+
+    frontier = {label: set() for label in ENTITY_LABELS}
+    for (label, name), _ in counts.most_common(entity_fanout):
+        frontier[label].add(name)
+    return frontier
+
+
+def explore_related_documents(gremlin_client, seed_entities: Dict[str, Set[str]], hops: int = 2,
+                              document_fanout: int = DEFAULT_DOCUMENT_FANOUT,
+                              entity_fanout: int = DEFAULT_ENTITY_FANOUT,
+                              seed_documents: Optional[List[dict]] = None,
+                              session_spent: float = 0.0) -> Iterator[dict]:
+    """
+    Breadth-first n-hop exploration from a set of seed entities.
+
+    Yields one dict per hop as soon as it is available:
+    {'hop': n, 'entities': {label: names expanded}, 'documents': [...], 'cost': RU charged}.
+    If `seed_documents` is given it is used as the first hop instead of querying.
+    No further hops are queried once `session_spent` plus the hops' charges
+    reaches the session RU budget.
+    """
+    hops = max(1, min(int(hops), MAX_HOPS))
+    visited_documents: Set[str] = set()
+    visited_entities = {label: set(seed_entities.get(label) or ()) for label in ENTITY_LABELS}
+    frontier = {label: set(names) for label, names in visited_entities.items()}
+
+    for hop in range(1, hops + 1):
+        if not any(frontier.values()):
+            break
+
+        charge = 0.0
+        if hop == 1 and seed_documents is not None:
+            documents = list(seed_documents)
+        else:
+            query = build_related_documents_query(frontier, exclude_documents=visited_documents,
+                                                  limit=document_fanout)
+            limit, budget_spent = plan_result_limit(normalize_query_shape(query), session_spent)
+            if budget_spent:
+                break
+            if limit and limit < document_fanout:
+                # Fewer documents keep the hop within the per-query budget
+                query = build_related_documents_query(frontier, exclude_documents=visited_documents, limit=limit)
+            documents, cost = submit_gremlin(gremlin_client, query,
+                                             selection=f"explore hop {hop}: {describe_selection(frontier)}")
+            charge = cost["request_charge"]
+            session_spent += charge
+
+        # Dedup against every earlier hop
+        documents = [doc for doc in documents if doc['document'] not in visited_documents]
+        visited_documents.update(doc['document'] for doc in documents)
+
+        yield {'hop': hop, 'entities': frontier, 'documents': documents, 'cost': charge}
+
+        frontier = next_entity_frontier(documents, visited_entities, entity_fanout)
+        for label, names in frontier.items():
+            visited_entities[label].update(names)
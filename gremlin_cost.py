@@ -0,0 +1,177 @@
+"""
+Request Unit (RU) cost accounting for Cosmos DB Gremlin queries.
+
+Every submission goes through `submit_gremlin`, which records the RU charge,
+server time and result count reported in the response status attributes,
+keyed by a normalized query shape and by the entity selection that caused it.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from query_log import record_backend_call
+from resilience import gremlin_backend
+
+# Status attributes returned by Cosmos DB on every Gremlin response
+REQUEST_CHARGE_ATTRIBUTES = ('x-ms-total-request-charge', 'x-ms-request-charge')
+SERVER_TIME_ATTRIBUTES = ('x-ms-total-server-time-ms', 'x-ms-server-time-ms')
+
+# Result cap used when the session budget is exhausted and the cheap plan is used
+FALLBACK_RESULT_LIMIT = 25
+
+
+def normalize_query_shape(query: str) -> str:
+    """Reduce a query to its shape: literals, numbers and list contents become placeholders"""
+    shape = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", "?", query)
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "N", shape)
+    shape = re.sub(r"\[[?,\s]*\]", "[?]", shape)
+    return re.sub(r"\s+", "", shape)
+
+
+def _first_attribute(attributes: dict, names) -> float:
+    for name in names:
+        if name in attributes:
+            try:
+                return float(attributes[name])
+            except (TypeError, ValueError):
+                return 0.0
+    return 0.0
+
+
+class _CostStats:
+    __slots__ = ("queries", "request_charge", "max_request_charge", "server_time_ms", "results")
+
+    def __init__(self):
+        self.queries = 0
+        self.request_charge = 0.0
+        self.max_request_charge = 0.0
+        self.server_time_ms = 0.0
+        self.results = 0
+
+    def add(self, request_charge: float, server_time_ms: float, results: int):
+        self.queries += 1
+        self.request_charge += request_charge
+        self.max_request_charge = max(self.max_request_charge, request_charge)
+        self.server_time_ms += server_time_ms
+        self.results += results
+
+    def as_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            "total_ru": round(self.request_charge, 2),
+            "avg_ru": round(self.request_charge / self.queries, 2) if self.queries else 0.0,
+            "max_ru": round(self.max_request_charge, 2),
+            "avg_server_ms": round(self.server_time_ms / self.queries, 2) if self.queries else 0.0,
+            "avg_results": round(self.results / self.queries, 1) if self.queries else 0.0,
+        }
+
+
+class QueryCostTracker:
+    """Process-wide, thread-safe aggregation of Gremlin RU costs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_shape: Dict[str, _CostStats] = {}
+        self._by_selection: Dict[str, _CostStats] = {}
+
+    def record(self, shape: str, selection: Optional[str], request_charge: float,
+               server_time_ms: float, results: int):
+        with self._lock:
+            self._by_shape.setdefault(shape, _CostStats()).add(request_charge, server_time_ms, results)
+            if selection:
+                self._by_selection.setdefault(selection, _CostStats()).add(request_charge, server_time_ms, results)
+
+    def ru_per_result(self, shape: str) -> Optional[float]:
+        """Average RU per returned result for a shape, or None if never seen"""
+        with self._lock:
+            stats = self._by_shape.get(shape)
+            if not stats or not stats.queries:
+                return None
+            return stats.request_charge / max(stats.results, 1)
+
+    def report(self, by: str = "selection", top: int = 20) -> List[dict]:
+        """Aggregated cost rows sorted by total RU, most expensive first"""
+        with self._lock:
+            source = self._by_selection if by == "selection" else self._by_shape
+            rows = [dict(key=key, **stats.as_dict()) for key, stats in source.items()]
+        rows.sort(key=lambda row: row["total_ru"], reverse=True)
+        return rows[:top]
+
+    def reset(self):
+        with self._lock:
+            self._by_shape.clear()
+            self._by_selection.clear()
+
+
+cost_tracker = QueryCostTracker()
+
+
+def get_query_budget() -> float:
+    """Per-query RU budget (0 disables it)"""
+    return float(os.getenv("GREMLIN_QUERY_RU_BUDGET", "0"))
+
+
+def get_session_budget() -> float:
+    """Per-session RU budget (0 disables it)"""
+    return float(os.getenv("GREMLIN_SESSION_RU_BUDGET", "0"))
+
+
+def plan_result_limit(shape: str, session_spent: float = 0.0) -> Tuple[Optional[int], bool]:
+    """
+    Decide how to run a query shape within the configured budgets.
+
+    Returns (limit, use_cheap_plan). The limit caps the result size so the
+    predicted charge stays within the per-query budget; the cheap plan is used
+    once the session budget is spent.
+    """
+    session_budget = get_session_budget()
+    if session_budget and session_spent >= session_budget:
+        return FALLBACK_RESULT_LIMIT, True
+
+    query_budget = get_query_budget()
+    ru_per_result = cost_tracker.ru_per_result(shape)
+    if query_budget and ru_per_result:
+        return max(1, int(query_budget / ru_per_result)), False
+    return None, False
+
+
+def submit_gremlin(gremlin_client, query: str, selection: Optional[str] = None,
+                   shape: Optional[str] = None) -> Tuple[list, dict]:
+    """
+    Submit a Gremlin query and record its cost.
+    Returns (results, cost) where cost has request_charge, server_time_ms,
+    results, elapsed_ms and shape. The call has a deadline and goes through
+    the Gremlin circuit breaker; raises BackendUnavailable when either gives up.
+    """
+    shape = shape or normalize_query_shape(query)
+    record_backend_call("gremlin")
+
+    def submit():
+        result_set = gremlin_client.submit(query)
+        return result_set, result_set.all().result()
+
+    start = time.perf_counter()
+    result_set, results = gremlin_backend.call(submit)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    attributes = getattr(result_set, "status_attributes", None) or {}
+    cost = {
+        "shape": shape,
+        "request_charge": _first_attribute(attributes, REQUEST_CHARGE_ATTRIBUTES),
+        "server_time_ms": _first_attribute(attributes, SERVER_TIME_ATTRIBUTES),
+        "results": len(results),
+        "elapsed_ms": round(elapsed_ms, 2),
+    }
+    cost_tracker.record(shape, selection, cost["request_charge"], cost["server_time_ms"], len(results))
+    return results, cost
+
+
+def describe_selection(entities: Dict[str, set]) -> str:
+    """Stable, human readable key for an entity selection"""
+    parts = []
+    for label, names in sorted(entities.items()):
+        if names:
+            parts.append(f"{label}: {', '.join(sorted(names))}")
+    return " | ".join(parts)
@@ -0,0 +1,289 @@
+"""
+Document summarization with Groq.
+
+Document content is compacted before it is sent (see prompt_compaction).
+With a ModelRouter each request is sent to the fast or the large model by
+document length, load and latency SLO (see model_routing).
+Short documents can be summarized in batches: several are packed into one
+JSON-mode prompt within a token budget, and any document whose summary is
+missing from the parsed reply falls back to a single request.
+"""
+import json
+import sqlite3
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from groq import Groq
+
+from caches import summary_cache
+from model_routing import LARGE_MODEL_NAME, ModelRouter, Route
+from prompt_compaction import compact_content, count_tokens
+from summary_store import content_digest, get_summary_store
+
+DEFAULT_MODEL_NAME = LARGE_MODEL_NAME
+SYSTEM_PROMPT = "You are a document analysis expert that provides clear, structured summaries in bullet points."
+
+# Completion tokens of a single summary request
+SUMMARY_MAX_TOKENS = 500
+# Prompt tokens of a summary request besides the document content
+PROMPT_OVERHEAD_TOKENS = 80
+# Prompt tokens of a batched request besides the documents (instructions and delimiters)
+BATCH_PROMPT_OVERHEAD_TOKENS = 200
+# Prompt plus completion tokens of one batched request
+BATCH_TOKEN_BUDGET = 6000
+MAX_BATCH_DOCUMENTS = 8
+# Documents with larger prompts are always summarized on their own
+MAX_BATCHED_DOCUMENT_TOKENS = 700
+# Completion tokens reserved per document in a batch, by number of points
+BATCH_COMPLETION_TOKENS = {"three": 160, "five": 260, "seven": 360}
+
+T = TypeVar("T")
+
+
+def summary_points(content: str) -> str:
+    """Number of summary points for a document, by its length"""
+    content_words = len(content.split())
+    if content_words < 500:
+        return "three"
+    elif content_words < 1000:
+        return "five"
+    return "seven"
+
+
+def pack_batches(documents: List[Tuple[str, str]], token_budget: int = BATCH_TOKEN_BUDGET,
+                 max_documents: int = MAX_BATCH_DOCUMENTS) -> List[List[Tuple[str, str]]]:
+    """
+    First-fit decreasing bin packing of (key, content) pairs into batches
+    whose prompt plus reserved completion tokens fit the budget. Documents
+    too large to batch come back as batches of one.
+    """
+    sized = []
+    for key, content in documents:
+        prompt_tokens = compact_content(content).tokens
+        cost = prompt_tokens + BATCH_COMPLETION_TOKENS[summary_points(content)]
+        sized.append((cost, prompt_tokens, key, content))
+    sized.sort(key=lambda item: item[0], reverse=True)
+
+    batches: List[List[Tuple[str, str]]] = []
+    loads: List[int] = []
+    for cost, prompt_tokens, key, content in sized:
+        if prompt_tokens > MAX_BATCHED_DOCUMENT_TOKENS:
+            batches.append([(key, content)])
+            loads.append(token_budget)
+            continue
+        for idx, load in enumerate(loads):
+            if load + cost <= token_budget and len(batches[idx]) < max_documents:
+                batches[idx].append((key, content))
+                loads[idx] += cost
+                break
+        else:
+            batches.append([(key, content)])
+            loads.append(BATCH_PROMPT_OVERHEAD_TOKENS + cost)
+    return batches
+
+
+class GroqAnalyzer:
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL_NAME, router: Optional[ModelRouter] = None):
+        """Initialize Groq analyzer with API key. Without a router every request uses `model_name`."""
+        self.client = Groq(api_key=api_key)
+        self.model_name = model_name
+        self.router = router
+
+    def route_tokens(self, prompt_tokens: int, completion_tokens: int,
+                     document_tokens: Optional[int] = None) -> Route:
+        if self.router is None:
+            return Route(self.model_name, "fixed", 0.0)
+        return self.router.route(prompt_tokens, completion_tokens, document_tokens)
+
+    def route(self, content: str) -> Route:
+        """Model for summarizing `content` now: by the document's full length, budgeted on the compacted prompt"""
+        compacted = compact_content(content)
+        return self.route_tokens(compacted.tokens + PROMPT_OVERHEAD_TOKENS,
+                                 BATCH_COMPLETION_TOKENS[summary_points(content)],
+                                 document_tokens=compacted.original_tokens)
+
+    def _track(self, route: Route):
+        return self.router.track(route) if self.router is not None else nullcontext()
+
+    def build_messages(self, content: str) -> List[dict]:
+        """Build the chat messages for a summary request"""
+        points = summary_points(content)
+
+        prompt = f"""Analyze the following document content and provide a {points}-point summary:
+        Document Content: {compact_content(content).text}
+
+        Provide a clear, bullet-point summary that includes {points} main points.
+        Make each point concise but informative."""
+
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def summarize(self, content: str, route: Optional[Route] = None) -> str:
+        """Generate a summary, raising on API errors"""
+        route = route or self.route(content)
+        with self._track(route):
+            response = self.client.chat.completions.create(
+                model=route.model,
+                messages=self.build_messages(content),
+                temperature=0.3,
+                max_tokens=SUMMARY_MAX_TOKENS
+            )
+        return response.choices[0].message.content
+
+    def build_batch_messages(self, documents: List[Tuple[str, str]]) -> List[dict]:
+        """Chat messages asking for a JSON object of summaries, keyed by position in the batch"""
+        sections = []
+        for number, (_, content) in enumerate(documents, 1):
+            sections.append(f'<document id="{number}" points="{summary_points(content)}">\n'
+                            f'{compact_content(content).text}\n</document>')
+        prompt = (
+            "Summarize each of the following documents independently.\n\n"
+            + "\n\n".join(sections)
+            + "\n\nFor each document provide a clear, bullet-point summary with the number of points given "
+              "in its `points` attribute. Make each point concise but informative.\n"
+              'Reply with a JSON object mapping each document id to its summary as a markdown bullet list, '
+              'for example {"1": "- first point\\n- second point", "2": "..."}.'
+        )
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def summarize_batch(self, documents: List[Tuple[str, str]]) -> Dict[str, str]:
+        """
+        Summarize several (key, content) documents in one request. Returns the
+        summaries that could be parsed, by key; raises on API errors.
+        """
+        completion_tokens = sum(BATCH_COMPLETION_TOKENS[summary_points(content)] for _, content in documents)
+        messages = self.build_batch_messages(documents)
+        route = self.route_tokens(sum(count_tokens(message["content"]) for message in messages), completion_tokens)
+        with self._track(route):
+            response = self.client.chat.completions.create(
+                model=route.model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=completion_tokens + 100,
+                response_format={"type": "json_object"}
+            )
+        return parse_batch_summaries(response.choices[0].message.content, documents)
+
+    def summarize_many(self, documents: List[Tuple[str, str]],
+                       run: Optional[Callable[[Callable[[], T], int], T]] = None,
+                       token_budget: int = BATCH_TOKEN_BUDGET) -> Tuple[Dict[str, str], Dict[str, Exception]]:
+        """
+        Summarize (key, content) documents in as few requests as possible.
+        `run(request, tokens)` executes each request, e.g. within rate limits;
+        by default requests are simply called. Returns (summaries, errors) by key.
+        """
+        run = run or (lambda request, tokens: request())
+        summaries: Dict[str, str] = {}
+        errors: Dict[str, Exception] = {}
+        for batch in pack_batches(documents, token_budget):
+            if len(batch) > 1:
+                tokens = sum(count_tokens(message["content"]) for message in self.build_batch_messages(batch))
+                tokens += sum(BATCH_COMPLETION_TOKENS[summary_points(content)] for _, content in batch)
+                try:
+                    summaries.update(run(lambda: self.summarize_batch(batch), tokens))
+                except Exception as e:
+                    print(f"DEBUG - Batch summary failed, summarizing one by one: {str(e)}")  # For debugging
+
+            # Single requests for unbatched documents and anything the batch reply missed
+            for key, content in batch:
+                if key in summaries:
+                    continue
+                tokens = compact_content(content).tokens + SUMMARY_MAX_TOKENS
+                try:
+                    summaries[key] = run(lambda: self.summarize(content), tokens)
+                except Exception as e:
+                    errors[key] = e
+        return summaries, errors
+
+    def stream_summary(self, content: str, route: Optional[Route] = None) -> Iterator[str]:
+        """Generate a summary as a stream of text chunks, raising on API errors"""
+        route = route or self.route(content)
+        with self._track(route):
+            stream = self.client.chat.completions.create(
+                model=route.model,
+                messages=self.build_messages(content),
+                temperature=0.3,
+                max_tokens=SUMMARY_MAX_TOKENS,
+                stream=True
+            )
+            for chunk in stream:
+                text = chunk.choices[0].delta.content
+                if text:
+                    yield text
+
+    def generate_summary(self, content: str) -> str:
+        """Generate a concise summary of document content"""
+        try:
+            return self.summarize(content)
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+
+def parse_batch_summaries(reply: str, documents: List[Tuple[str, str]]) -> Dict[str, str]:
+    """Summaries by document key from a batch reply; unparseable or empty entries are left out"""
+    try:
+        parsed = json.loads(reply or "")
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    summaries = {}
+    for number, (key, _) in enumerate(documents, 1):
+        summary = parsed.get(str(number))
+        if isinstance(summary, list):
+            summary = "\n".join(f"- {str(point).lstrip('- ')}" for point in summary)
+        if isinstance(summary, str) and summary.strip():
+            summaries[key] = summary.strip()
+    return summaries
+
+
+def summary_cache_key(doc_name: str, content: str) -> str:
+    """Summaries are keyed by document name and content, so edited documents are re-summarized"""
+    return f"{doc_name}:{content_digest(content)}"
+
+
+def stored_summary(doc_name: str, content: str) -> Optional[str]:
+    """Summary from the durable summary store, if one was generated for this content"""
+    store = get_summary_store()
+    if store is None:
+        return None
+    try:
+        return store.get(doc_name, content_digest(content))
+    except sqlite3.Error as e:
+        print(f"DEBUG - Summary store read failed: {str(e)}")  # For debugging
+        return None
+
+
+def store_summary(doc_name: str, content: str, summary: str, model: Optional[str] = None) -> bool:
+    """Write a summary to the durable summary store. Returns whether it was stored."""
+    store = get_summary_store()
+    if store is None:
+        return False
+    try:
+        store.put(doc_name, content_digest(content), summary, model)
+        return True
+    except sqlite3.Error as e:
+        print(f"DEBUG - Summary store write failed: {str(e)}")  # For debugging
+        return False
+
+
+def get_summary(analyzer: GroqAnalyzer, doc_name: str, content: str, cache_key: Optional[str] = None) -> str:
+    """
+    Summary from the shared cache, then the durable summary store, generated
+    on a miss. Raises on API errors. `cache_key` overrides the per-document
+    key, e.g. to share one summary across a near-duplicate cluster.
+    """
+    def compute():
+        summary = stored_summary(doc_name, content)
+        if summary is None:
+            route = analyzer.route(content)
+            summary = analyzer.summarize(content, route)
+            store_summary(doc_name, content, summary, route.model)
+        return summary
+
+    return summary_cache.get_or_compute(cache_key or summary_cache_key(doc_name, content), compute)
@@ -0,0 +1,211 @@
+"""
+Per-library metadata schema and OData filter compilation.
+
+Each library declares its metadata fields once: display label, results-table
+column and width, how its values are typed, and how the field can be
+filtered. The registry drives the results tables and their typed frames, the
+document metadata view and the filter widgets, and
+compile_filter turns the widget values into an Azure Search OData `filter`:
+
+- filterable fields compile to `eq` / `search.in(...)` (or-ed `eq` for
+  numeric and date fields), or to `ge` / `le` for range fields (dates,
+  years, numbers);
+- fields that are only searchable compile to `search.ismatch(...)` on that
+  field;
+- anything else cannot be filtered on.
+
+The declared flags are a fallback: when the live index schema is available,
+its filterable/searchable attributes and types win.
+"""
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+NUMERIC_TYPES = ("Edm.Int32", "Edm.Int64", "Edm.Double")
+# Types compared with typed literals rather than strings
+TYPED_LITERAL_TYPES = NUMERIC_TYPES + ("Edm.DateTimeOffset",)
+
+
+class MetadataField(NamedTuple):
+    field: str
+    # Label in the document metadata view and filter widgets
+    label: str
+    # Results-table header and relative width; not shown in the table without one
+    column: Optional[str] = None
+    width: float = 1.0
+    # "text" filters on values, "range" on a from/to pair
+    kind: str = "text"
+    # How values are parsed for sorting and grouping: "string", "date" or "number"
+    dtype: str = "string"
+    odata_type: str = "Edm.String"
+    filterable: bool = False
+    searchable: bool = True
+
+
+class LibrarySchema(NamedTuple):
+    name: str
+    fields: Tuple[MetadataField, ...]
+    view_width: float = 0.5
+    # Many columns: smaller text in a horizontally scrollable table
+    compact: bool = False
+
+    @property
+    def table_fields(self) -> Tuple[MetadataField, ...]:
+        return tuple(field for field in self.fields if field.column)
+
+
+class FieldCapability(NamedTuple):
+    """A field's attributes in the live index"""
+    odata_type: str
+    filterable: bool
+    searchable: bool
+
+
+class FilterError(ValueError):
+    """Raised when a filter value cannot be compiled for its field"""
+
+
+LIBRARY_FIELD = MetadataField("Library", "Library", filterable=True)
+
+LIBRARY_SCHEMAS: Dict[str, LibrarySchema] = {schema.name: schema for schema in (
+    LibrarySchema("General", (
+        MetadataField("Doc_Type_General", "Document Type", "Document Type", 2, filterable=True),
+        MetadataField("Date_General", "Date", "Date", 1.5, kind="range", dtype="date", filterable=True),
+        MetadataField("Remarks_General", "Remarks", "Remarks", 2.5),
+    )),
+    LibrarySchema("HR", (
+        MetadataField("Employee_No_HR", "Employee Number", "Emp #", 1, filterable=True),
+        MetadataField("Department_HR", "Department", "Department", 1.5, filterable=True),
+        MetadataField("Document_Type_HR", "Document Type", "Document Type", 1.5, filterable=True),
+        MetadataField("Name_HR", "Name", "Name", 1.5),
+        MetadataField("Date_HR", "Date", "Date", 1, kind="range", dtype="date", filterable=True),
+        MetadataField("Country_HR", "Country", filterable=True),
+    )),
+    LibrarySchema("Florix", (
+        MetadataField("Document_Type_Florix", "Document Type", "Document Type", 2, filterable=True),
+        MetadataField("Remarks_Florix", "Remarks", "Remarks", 3),
+    )),
+    LibrarySchema("DFTROPIO", (
+        MetadataField("SERIAL_NO_DFTROPIO", "Serial No", "Serial No", 0.8, filterable=True),
+        MetadataField("Name_DFTROPIO", "Name", "Name", 1.2),
+        MetadataField("DOB_DFTROPIO", "DOB", "DOB", 0.8, kind="range", dtype="date", filterable=True),
+        MetadataField("BOOK_CATEGORY_DFTROPIO", "Book Category", "Book Category", 1, filterable=True),
+        MetadataField("DESCRIPTION_DFTROPIO", "Description", "Description", 1.2),
+        MetadataField("VOLUME_NUMBER_DFTROPIO", "Volume Number", "Volume No", 0.8, filterable=True),
+        MetadataField("SERIAL_RANGE_DFTROPIO", "Serial Range", "Serial Range", 1),
+        MetadataField("ACT_NUMBER_DFTROPIO", "Act Number", "Act Number", 0.8, filterable=True),
+    ), view_width=0.4, compact=True),
+    LibrarySchema("Finance", (
+        MetadataField("Document_ID_Finance", "Document ID", "Document ID", 1.5, filterable=True),
+        MetadataField("Document_Type_Finance", "Document Type", "Document Type", 1.5, filterable=True),
+        MetadataField("Date_Finance", "Date", "Date", 1, kind="range", dtype="date", filterable=True),
+        MetadataField("Info_Finance", "Info", "Info", 2),
+    )),
+    LibrarySchema("Ayala_Annual_Report", (
+        MetadataField("Name_Ayala_Annual_Report", "Name", "Name", 2),
+        MetadataField("Year_Ayala_Annual_Report", "Year", "Year", 1, kind="range", dtype="number", filterable=True),
+        MetadataField("DocumentType_Ayala_Annual_Report", "Document Type", "Document Type", 1.5, filterable=True),
+        MetadataField("Remarks_Ayala_Annual_Report", "Remarks", "Remarks", 2),
+    )),
+    LibrarySchema("Ayala_Legal_Docs", (
+        MetadataField("Name_Ayala_Legal_Docs", "Name", "Name", 2.5),
+        MetadataField("DocumentType_Ayala_Legal_Docs", "Document Type", "Document Type", 1.5, filterable=True),
+        MetadataField("Remarks_Ayala_Legal_Docs", "Remarks", "Remarks", 2.5),
+    )),
+)}
+
+
+def effective_capability(field: MetadataField,
+                         capabilities: Optional[Dict[str, FieldCapability]] = None) -> FieldCapability:
+    """The field's attributes in the live index if known, else as declared"""
+    if capabilities and field.field in capabilities:
+        return capabilities[field.field]
+    return FieldCapability(field.odata_type, field.filterable, field.searchable)
+
+
+def filter_fields(schema: LibrarySchema,
+                  capabilities: Optional[Dict[str, FieldCapability]] = None) -> List[MetadataField]:
+    """Fields of a library that can be filtered on"""
+    fields = []
+    for field in schema.fields:
+        capability = effective_capability(field, capabilities)
+        if capability.filterable or (field.kind == "text" and capability.searchable):
+            fields.append(field)
+    return fields
+
+
+def odata_string(value: str) -> str:
+    """OData string literal; single quotes are escaped by doubling"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def odata_literal(field: MetadataField, capability: FieldCapability, value: Any) -> str:
+    """Typed OData literal for a filter value"""
+    text = str(value).strip()
+    if capability.odata_type in NUMERIC_TYPES:
+        try:
+            number = float(text)
+        except ValueError:
+            raise FilterError(f"{field.label}: '{text}' is not a number")
+        return str(int(number)) if number.is_integer() else str(number)
+    if capability.odata_type == "Edm.DateTimeOffset":
+        try:
+            day = value if isinstance(value, date) else date.fromisoformat(text)
+        except ValueError:
+            raise FilterError(f"{field.label}: '{text}' is not a date (YYYY-MM-DD)")
+        return f"{day.isoformat()}T00:00:00Z"
+    # String fields compare lexically, which orders ISO dates and same-width years correctly
+    return odata_string(text)
+
+
+def field_condition(field: MetadataField, value: Any,
+                    capabilities: Optional[Dict[str, FieldCapability]] = None) -> Optional[str]:
+    """OData condition for one field's filter value, or None when the value is empty"""
+    capability = effective_capability(field, capabilities)
+    name = field.field
+
+    if field.kind == "range":
+        low, high = value
+        if low in (None, "") and high in (None, ""):
+            return None
+        if not capability.filterable:
+            raise FilterError(f"{field.label} is not filterable in the search index")
+        bounds = []
+        if low not in (None, ""):
+            bounds.append(f"{name} ge {odata_literal(field, capability, low)}")
+        if high not in (None, ""):
+            bounds.append(f"{name} le {odata_literal(field, capability, high)}")
+        return " and ".join(bounds)
+
+    values = [part.strip() for part in str(value or "").split(",") if part.strip()]
+    if not values:
+        return None
+    if capability.filterable:
+        if capability.odata_type in TYPED_LITERAL_TYPES:
+            # search.in only takes strings
+            return " or ".join(f"{name} eq {odata_literal(field, capability, part)}" for part in values)
+        if len(values) == 1:
+            return f"{name} eq {odata_string(values[0])}"
+        return f"search.in({name}, {odata_string('|'.join(values))}, '|')"
+    if capability.searchable:
+        # Any of the values as a phrase, matched within this field only
+        phrases = " | ".join('"' + part.replace('"', '') + '"' for part in values)
+        return f"search.ismatch({odata_string(phrases)}, {odata_string(name)})"
+    raise FilterError(f"{field.label} is neither filterable nor searchable in the search index")
+
+
+def compile_filter(library: Optional[str], values: Dict[str, Any],
+                   capabilities: Optional[Dict[str, FieldCapability]] = None) -> Optional[str]:
+    """
+    OData filter for a library and its field values (text for "text" fields,
+    (from, to) for "range" fields). Returns None when nothing is filtered.
+    """
+    clauses = []
+    if library:
+        clauses.append(field_condition(LIBRARY_FIELD, library, capabilities))
+        schema = LIBRARY_SCHEMAS.get(library)
+        for field in (schema.fields if schema else ()):
+            if field.field in values:
+                condition = field_condition(field, values[field.field], capabilities)
+                if condition:
+                    clauses.append(f"({condition})" if " and " in condition or " or " in condition else condition)
+    return " and ".join(clauses) or None
@@ -0,0 +1,162 @@
+"""
+Offline slow-query analyzer for the JSONL query log (see query_log.py).
+
+Groups search and related-document records by query shape, library mix or
+entity count, and reports latency percentiles, payload sizes and backend
+calls per group. Given a baseline log it flags groups whose tail latency
+regressed, and exits non-zero so it can gate a release.
+
+    python log_analyzer.py logs/query_log.jsonl --group-by shape
+    python log_analyzer.py current.jsonl --baseline previous.jsonl --metric p95 --threshold 1.2
+"""
+import argparse
+import json
+import re
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+_PHRASE = re.compile(r'"[^"]*"')
+_TERM = re.compile(r"[\w.]+(\*)?")
+
+
+def search_query_shape(query: str) -> str:
+    """
+    Structure of a search query with the words abstracted away, e.g.
+    'annual report 2003' -> 'w w w' and '"ayala land" +manila*' -> 'phrase +w*'.
+    """
+    shape = _PHRASE.sub(" phrase ", query or "")
+    shape = _TERM.sub(lambda m: m.group(0) if m.group(0) == "phrase" else "w" + (m.group(1) or ""), shape)
+    return " ".join(shape.split()) or "(empty)"
+
+
+def entity_count(record: dict) -> int:
+    return sum(len(names) for names in (record.get("entities") or {}).values())
+
+
+def record_shape(record: dict) -> str:
+    if record.get("kind") == "related":
+        counts = ",".join(f"{label}={len(names)}" for label, names in sorted((record.get("entities") or {}).items()))
+        return f"related[{counts}]"
+    return f"search[{search_query_shape(record.get('query', ''))}]"
+
+
+def record_library_mix(record: dict) -> str:
+    libraries = record.get("libraries")
+    if libraries is None:
+        return f"{record.get('kind')}:(not logged)"
+    return f"{record.get('kind')}:{'+'.join(libraries) or '(none)'}"
+
+
+def record_entity_count(record: dict) -> str:
+    if record.get("kind") == "related":
+        return f"related:{entity_count(record)} entities"
+    return f"search:{len((record.get('query') or '').split())} terms"
+
+
+GROUPINGS: Dict[str, Callable[[dict], str]] = {
+    "shape": record_shape,
+    "libraries": record_library_mix,
+    "entities": record_entity_count,
+}
+
+
+def read_log(path: str) -> Iterator[dict]:
+    """Records of one log file; malformed lines are skipped"""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and "latency_ms" in record:
+                yield record
+
+
+def summarize(records: Iterable[dict], group_by: str) -> Dict[str, dict]:
+    """Per-group counts, latency percentiles, payload size and backend calls"""
+    key_of = GROUPINGS[group_by]
+    groups: Dict[str, List[dict]] = {}
+    for record in records:
+        groups.setdefault(key_of(record), []).append(record)
+
+    summary = {}
+    for key, members in groups.items():
+        latencies = np.array([record["latency_ms"] for record in members], dtype=np.float64)
+        row = {"count": len(members)}
+        for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+            row[f"p{percentile}"] = float(value)
+        row["max"] = float(latencies.max())
+        row["mean_results"] = float(np.mean([record.get("result_count", 0) for record in members]))
+        row["mean_payload_chars"] = float(np.mean([record.get("payload_chars", 0) for record in members]))
+        row["mean_backend_calls"] = float(np.mean([sum((record.get("backend_calls") or {}).values())
+                                                   for record in members]))
+        summary[key] = row
+    return summary
+
+
+def find_regressions(current: Dict[str, dict], baseline: Dict[str, dict], metric: str,
+                     threshold: float, min_count: int) -> List[dict]:
+    """Groups whose `metric` grew by more than `threshold` times, with enough samples on both sides"""
+    regressions = []
+    for key, row in current.items():
+        before = baseline.get(key)
+        if before is None or row["count"] < min_count or before["count"] < min_count:
+            continue
+        if before[metric] > 0 and row[metric] > before[metric] * threshold:
+            regressions.append({"group": key, "baseline": before[metric], "current": row[metric],
+                                "ratio": row[metric] / before[metric]})
+    return sorted(regressions, key=lambda r: r["ratio"], reverse=True)
+
+
+def format_table(summary: Dict[str, dict], sort_by: str, top: Optional[int]) -> str:
+    rows = sorted(summary.items(), key=lambda item: item[1][sort_by], reverse=True)[:top]
+    width = max([len(key) for key, _ in rows] + [5])
+    columns = ["count"] + [f"p{p}" for p in PERCENTILES] + ["max", "mean_results", "mean_payload_chars",
+                                                           "mean_backend_calls"]
+    lines = [f"{'group':<{width}}  " + "  ".join(f"{column:>10}" for column in columns)]
+    for key, row in rows:
+        cells = [f"{row['count']:>10d}"] + [f"{row[column]:>10.1f}" for column in columns[1:]]
+        lines.append(f"{key:<{width}}  " + "  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report slow queries from JSONL query logs")
+    parser.add_argument("log", nargs="+", help="Query log file(s) to analyze")
+    parser.add_argument("--baseline", nargs="+", help="Earlier log file(s) to compare against")
+    parser.add_argument("--group-by", choices=sorted(GROUPINGS), default="shape")
+    parser.add_argument("--metric", default="p95", choices=[f"p{p}" for p in PERCENTILES] + ["max"],
+                        help="Latency statistic used for sorting and regression checks")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Flag groups whose metric grew by more than this factor")
+    parser.add_argument("--min-count", type=int, default=5, help="Minimum samples per group for regression checks")
+    parser.add_argument("--top", type=int, default=20, help="Groups to print")
+    args = parser.parse_args(argv)
+
+    current = summarize((record for path in args.log for record in read_log(path)), args.group_by)
+    if not current:
+        print("No query records found.")
+        return 0
+    print(format_table(current, args.metric, args.top))
+
+    if not args.baseline:
+        return 0
+    baseline = summarize((record for path in args.baseline for record in read_log(path)), args.group_by)
+    regressions = find_regressions(current, baseline, args.metric, args.threshold, args.min_count)
+    print()
+    if not regressions:
+        print(f"No {args.metric} regressions above {args.threshold}x.")
+        return 0
+    print(f"{len(regressions)} {args.metric} regression(s) above {args.threshold}x:")
+    for regression in regressions:
+        print(f"  {regression['group']}: {regression['baseline']:.1f} ms -> {regression['current']:.1f} ms "
+              f"({regression['ratio']:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Latency-aware routing of summary requests between Groq models.
+
+Short documents (by their full length, not the compacted prompt) always go
+to the fast model. Longer ones get the large model
+unless its predicted latency, given the tokens of the request and the
+requests already in flight to it, would break the latency SLO; then the fast
+model takes them while it can meet the SLO. Predictions start from static
+throughput profiles and are corrected by observed latencies.
+
+Policies: "routed" (default), "large" and "fast" (always one model), set
+with SUMMARY_ROUTING_POLICY.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional
+
+LARGE_MODEL_NAME = "llama-3.3-70b-versatile"
+FAST_MODEL_NAME = "llama-3.1-8b-instant"
+POLICIES = ("routed", "large", "fast")
+# Weight of the newest observation in the latency correction factor
+CORRECTION_ALPHA = 0.2
+
+
+class ModelProfile(NamedTuple):
+    name: str
+    # Request overhead and time to first token
+    base_seconds: float
+    prompt_tokens_per_second: float
+    completion_tokens_per_second: float
+    # Requests served in parallel before they start queueing
+    concurrency: int
+
+
+LARGE_MODEL = ModelProfile(LARGE_MODEL_NAME, 0.4, 6000.0, 275.0,
+                           int(os.getenv("SUMMARY_LARGE_CONCURRENCY", "4")))
+FAST_MODEL = ModelProfile(FAST_MODEL_NAME, 0.2, 20000.0, 750.0,
+                          int(os.getenv("SUMMARY_FAST_CONCURRENCY", "8")))
+
+
+class Route(NamedTuple):
+    model: str
+    reason: str
+    predicted_seconds: float
+
+
+class ModelRouter:
+    """Chooses the model of each summary request and tracks requests in flight per model"""
+
+    def __init__(self, large: ModelProfile = LARGE_MODEL, fast: ModelProfile = FAST_MODEL,
+                 slo_seconds: float = 3.0, short_prompt_tokens: int = 300, policy: str = "routed"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown routing policy {policy!r}, expected one of {POLICIES}")
+        self.large = large
+        self.fast = fast
+        self.slo_seconds = slo_seconds
+        self.short_prompt_tokens = short_prompt_tokens
+        self.policy = policy
+        self._profiles = {large.name: large, fast.name: fast}
+        self._in_flight: Dict[str, int] = {large.name: 0, fast.name: 0}
+        self._correction: Dict[str, float] = {large.name: 1.0, fast.name: 1.0}
+        self._routes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def predict(self, profile: ModelProfile, prompt_tokens: int, completion_tokens: int) -> float:
+        """Expected seconds for a request if sent to `profile` now"""
+        service = (profile.base_seconds
+                   + prompt_tokens / profile.prompt_tokens_per_second
+                   + completion_tokens / profile.completion_tokens_per_second)
+        with self._lock:
+            in_flight = self._in_flight[profile.name]
+            correction = self._correction[profile.name]
+        # Requests beyond the model's concurrency wait for earlier ones
+        queued = max(0, in_flight + 1 - profile.concurrency)
+        return service * (1 + queued / profile.concurrency) * correction
+
+    def route(self, prompt_tokens: int, completion_tokens: int, document_tokens: Optional[int] = None) -> Route:
+        """
+        Model for a request of `prompt_tokens`. `document_tokens` is the
+        uncompacted length of the document, used to pick out short documents;
+        it defaults to the prompt size.
+        """
+        document_tokens = prompt_tokens if document_tokens is None else document_tokens
+        large_seconds = self.predict(self.large, prompt_tokens, completion_tokens)
+        fast_seconds = self.predict(self.fast, prompt_tokens, completion_tokens)
+        if self.policy == "large":
+            route = Route(self.large.name, "policy", large_seconds)
+        elif self.policy == "fast":
+            route = Route(self.fast.name, "policy", fast_seconds)
+        elif document_tokens <= self.short_prompt_tokens:
+            route = Route(self.fast.name, "short document", fast_seconds)
+        elif large_seconds <= self.slo_seconds:
+            route = Route(self.large.name, "within SLO", large_seconds)
+        elif fast_seconds <= self.slo_seconds:
+            route = Route(self.fast.name, "large model over SLO", fast_seconds)
+        elif fast_seconds < large_seconds:
+            route = Route(self.fast.name, "both over SLO", fast_seconds)
+        else:
+            route = Route(self.large.name, "both over SLO", large_seconds)
+        with self._lock:
+            key = f"{route.model}: {route.reason}"
+            self._routes[key] = self._routes.get(key, 0) + 1
+        return route
+
+    @contextmanager
+    def track(self, route: Route) -> Iterator[None]:
+        """Count a request in flight and learn from its latency if it succeeds"""
+        with self._lock:
+            self._in_flight[route.model] = self._in_flight.get(route.model, 0) + 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight[route.model] -= 1
+        if route.model in self._correction and route.predicted_seconds > 0:
+            ratio = (time.monotonic() - start) / (route.predicted_seconds / self._correction[route.model])
+            with self._lock:
+                self._correction[route.model] += CORRECTION_ALPHA * (ratio - self._correction[route.model])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "slo_seconds": self.slo_seconds,
+                "in_flight": dict(self._in_flight),
+                "correction": {name: round(value, 3) for name, value in self._correction.items()},
+                "routes": dict(self._routes),
+            }
+
+
+summary_router = ModelRouter(
+    slo_seconds=float(os.getenv("SUMMARY_LATENCY_SLO_SECONDS", "3.0")),
+    short_prompt_tokens=int(os.getenv("SUMMARY_SHORT_PROMPT_TOKENS", "300")),
+    policy=os.getenv("SUMMARY_ROUTING_POLICY", "routed"),
+)
@@ -0,0 +1,216 @@
+"""
+Offline bulk pre-summarization.
+
+Pages through the search index and writes a Groq summary for every document
+to the durable summary store (summary_store.py), so most document views are
+served without an LLM call. Documents whose current content already has a
+stored summary are skipped, which makes repeated runs incremental; with
+--modified-field only documents changed since the last completed run's
+watermark are even fetched.
+
+Short documents are packed several to a request (see groq_analyzer.
+pack_batches). Batches are spread over a thread pool within Groq's request
+and token rate limits, retrying rate-limit errors with backoff. Finished
+documents are recorded in a checkpoint file, so an interrupted run resumes
+where it stopped:
+
+    python presummarize.py --workers 4 --rpm 30 --tpm 6000
+    python presummarize.py --modified-field metadata_storage_last_modified --since-watermark
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Set, Tuple, TypeVar
+
+from groq import RateLimitError
+
+from groq_analyzer import DEFAULT_MODEL_NAME, GroqAnalyzer, pack_batches, store_summary, stored_summary
+from search_core import create_search_client, iter_index_documents
+from summary_store import get_summary_store
+
+WATERMARK_KEY = "presummarize_watermark"
+MAX_ATTEMPTS = 5
+
+T = TypeVar("T")
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, shared by all workers"""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        """Block until one request of `tokens` tokens fits in both budgets"""
+        # A request larger than the whole per-minute budget waits for a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed_minutes = (now - self._updated) / 60
+                self._updated = now
+                self._requests = min(self.requests_per_minute,
+                                     self._requests + elapsed_minutes * self.requests_per_minute)
+                self._tokens = min(self.tokens_per_minute, self._tokens + elapsed_minutes * self.tokens_per_minute)
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_seconds = 60 * max((1 - self._requests) / self.requests_per_minute,
+                                        (tokens - self._tokens) / self.tokens_per_minute)
+            time.sleep(max(wait_seconds, 0.05))
+
+
+def run_within_limits(limiter: RateLimiter, request: Callable[[], T], tokens: int) -> T:
+    """Run one Groq request within the rate limits, backing off on rate-limit errors"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        limiter.acquire(tokens)
+        try:
+            return request()
+        except RateLimitError as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            retry_after = getattr(getattr(e, "response", None), "headers", {}).get("retry-after")
+            delay = float(retry_after) if retry_after else 2 ** attempt
+            print(f"Rate limited, retrying in {delay:.0f}s", file=sys.stderr)
+            time.sleep(delay)
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Document names finished by an interrupted previous run"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as checkpoint_file:
+        return {line.rstrip("\n") for line in checkpoint_file if line.strip()}
+
+
+def build_filter(args, watermark: Optional[str]) -> Optional[str]:
+    since = args.since or (watermark if args.since_watermark else None)
+    if not since:
+        return None
+    if not args.modified_field:
+        raise SystemExit("--since / --since-watermark need --modified-field")
+    return f"{args.modified_field} ge {since}"
+
+
+def run_presummarize(args) -> int:
+    store = get_summary_store()
+    if store is None:
+        print("The summary store is disabled (SUMMARY_STORE_PATH is empty)", file=sys.stderr)
+        return 1
+
+    started_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    search_filter = build_filter(args, store.get_meta(WATERMARK_KEY))
+    completed = load_checkpoint(args.checkpoint)
+    print(f"Filter: {search_filter or 'none'}; {len(completed)} documents done in a previous run",
+          file=sys.stderr)
+
+    search_client = create_search_client()
+    analyzer = GroqAnalyzer(api_key=os.getenv("GROQ_API_KEY"), model_name=args.model)
+    limiter = RateLimiter(args.rpm, args.tpm)
+    slots = threading.BoundedSemaphore(args.workers * 2)
+    checkpoint_lock = threading.Lock()
+    counts = {"summarized": 0, "skipped": 0, "failed": 0}
+    requests_made = [0]
+    futures = []
+
+    def run(request, tokens):
+        with checkpoint_lock:
+            requests_made[0] += 1
+        return run_within_limits(limiter, request, tokens)
+
+    with open(args.checkpoint, "a", encoding="utf-8") as checkpoint_file:
+
+        def mark_done(doc_name: str, outcome: str):
+            with checkpoint_lock:
+                counts[outcome] += 1
+                if outcome != "failed":
+                    checkpoint_file.write(doc_name + "\n")
+                    checkpoint_file.flush()
+                    os.fsync(checkpoint_file.fileno())
+                done = sum(counts.values())
+                if done % 50 == 0:
+                    print(f"[{done}] {counts}", file=sys.stderr)
+
+        def worker(documents: List[Tuple[str, str]]):
+            try:
+                summaries, errors = analyzer.summarize_many(documents, run=run)
+                for doc_name, content in documents:
+                    if doc_name in summaries:
+                        # The summary is durable before the document is checkpointed
+                        if store_summary(doc_name, content, summaries[doc_name], analyzer.model_name):
+                            mark_done(doc_name, "summarized")
+                        else:
+                            print(f"Storing the summary failed for {doc_name}", file=sys.stderr)
+                            mark_done(doc_name, "failed")
+                    else:
+                        print(f"Summary failed for {doc_name}: {errors.get(doc_name)}", file=sys.stderr)
+                        mark_done(doc_name, "failed")
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            for page in iter_index_documents(search_client, args.search_text, key_field=args.key_field,
+                                             page_size=args.page_size, max_results=args.max_docs,
+                                             filter=search_filter):
+                pending = []
+                for doc in page:
+                    doc_name = doc.get('DocumentName')
+                    content = doc.get('merged_content') or ''
+                    if not doc_name or not content.strip() or doc_name in completed \
+                            or stored_summary(doc_name, content) is not None:
+                        counts["skipped"] += 1
+                        continue
+                    pending.append((doc_name, content))
+                # Each page is packed into as few requests as possible
+                for batch in pack_batches(pending):
+                    # Bounded in-flight work keeps paging from running ahead of the rate limit
+                    slots.acquire()
+                    futures.append(executor.submit(worker, batch))
+
+    crashed = [future.exception() for future in futures if future.exception() is not None]
+    for error in crashed:
+        print(f"Summary batch failed: {error!r}", file=sys.stderr)
+    print(f"Finished: {counts} in {requests_made[0]} Groq requests", file=sys.stderr)
+    if counts["failed"] or crashed:
+        return 1
+    # A complete run moves the watermark and starts the next run without a checkpoint
+    store.set_meta(WATERMARK_KEY, started_at)
+    os.remove(args.checkpoint)
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize every indexed document into the summary store")
+    parser.add_argument("--search-text", default="*", help="Documents to summarize (default: all)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--key-field", default="DocumentName",
+                        help="Unique, sortable and filterable index field to page by")
+    parser.add_argument("--max-docs", type=int, help="Stop after this many documents")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30")),
+                        help="Groq requests per minute")
+    parser.add_argument("--tpm", type=float, default=float(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000")),
+                        help="Groq tokens per minute")
+    parser.add_argument("--model", default=DEFAULT_MODEL_NAME)
+    parser.add_argument("--modified-field", help="Filterable last-modified index field, for --since")
+    parser.add_argument("--since", help="Only documents modified at or after this ISO 8601 time")
+    parser.add_argument("--since-watermark", action="store_true",
+                        help="Only documents modified since the last completed run")
+    parser.add_argument("--checkpoint", default="presummarize.checkpoint", help="Checkpoint file")
+    args = parser.parse_args(argv)
+    args.workers = max(1, args.workers)
+    return args
+
+
+if __name__ == "__main__":
+    sys.exit(run_presummarize(parse_args()))
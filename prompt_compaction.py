@@ -0,0 +1,261 @@
+"""
+Token-aware compaction of document content for summary prompts.
+
+OCR text is sent to Groq after whitespace is normalized, page markers are
+dropped, headers and footers repeated at page boundaries are kept once, and
+the result is cut to a token budget on a word boundary. Pages end at form
+feeds and at "Page N" / "N of M" lines. Body text is never de-duplicated, and
+bare numbers are only dropped as page numbers at page boundaries. Tokens are
+counted with tiktoken when it is installed and estimated otherwise.
+
+    python prompt_compaction.py document.txt [--budget 1000]
+"""
+import argparse
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from typing import List, NamedTuple, Optional
+
+from caches import compaction_cache
+from summary_store import content_digest
+
+# Content tokens sent per document (replaces the old 4000-character cut)
+CONTENT_TOKEN_BUDGET = int(os.getenv("SUMMARY_CONTENT_TOKENS", "1000"))
+# Only the start of very long documents is cleaned; the budget is far smaller
+MAX_SCAN_CHARS = 200_000
+TIKTOKEN_ENCODING = "cl100k_base"
+# Non-blank lines at each end of a page that may be headers, footers or page numbers
+BOUNDARY_LINES = 3
+
+_WORD = re.compile(r"\w+|[^\w\s]")
+_INLINE_SPACE = re.compile(r"[ \t\f\v ]+")
+_NON_WORD = re.compile(r"[\W_]+")
+# "Page 3", "Page 3 of 12" and "3 of 12" lines, matched against line_key
+_PAGE_MARKER = re.compile(r"(?:page|pg) \d+(?: of \d+)?|\d+ of \d+")
+_BARE_NUMBER = re.compile(r"\d+")
+
+
+class CompactedContent(NamedTuple):
+    text: str
+    original_tokens: int
+    # Tokens after cleaning, before truncation
+    cleaned_tokens: int
+    tokens: int
+    lines_removed: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.original_tokens - self.tokens
+
+    @property
+    def truncated(self) -> bool:
+        return self.tokens < self.cleaned_tokens
+
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding, or None when tiktoken is not installed"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TIKTOKEN_ENCODING)
+                except Exception as e:  # Not installed, or the encoding could not be downloaded
+                    print(f"DEBUG - tiktoken unavailable, estimating tokens: {str(e)}")  # For debugging
+                _encoding_loaded = True
+    return _encoding
+
+
+def _word_tokens(word: str) -> int:
+    """Estimated tokens of one word or punctuation mark: common words are one token, long ones split"""
+    return 1 + (len(word) - 1) // 8
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return sum(_word_tokens(match.group()) for match in _WORD.finditer(text))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """The longest prefix of `text` within `budget` tokens that ends on a word boundary"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= budget:
+            return text
+        prefix = encoding.decode(tokens[:budget])
+        if len(prefix) < len(text) and not text[len(prefix)].isspace():
+            # Drop the partial word the cut left behind
+            prefix = prefix[:max(prefix.rfind(" "), prefix.rfind("\n"), 0)]
+        return prefix.rstrip()
+
+    used, end = 0, 0
+    for match in _WORD.finditer(text):
+        used += _word_tokens(match.group())
+        if used > budget:
+            break
+        end = match.end()
+    else:
+        return text
+    return text[:end]
+
+
+def line_key(line: str) -> str:
+    """Lines with equal keys are near-duplicates: case, spacing and punctuation are ignored"""
+    return _NON_WORD.sub(" ", line.lower()).strip()
+
+
+def split_pages(text: str) -> List[List[str]]:
+    """Normalized lines of each page; a page ends at a form feed or after a page marker line"""
+    pages: List[List[str]] = []
+    for chunk in text.split("\f"):
+        page: List[str] = []
+        for line in chunk.splitlines():
+            line = _INLINE_SPACE.sub(" ", line).strip()
+            page.append(line)
+            if _PAGE_MARKER.fullmatch(line_key(line)):
+                pages.append(page)
+                page = []
+        pages.append(page)
+    return [page for page in pages if any(page)]
+
+
+def boundary_positions(page: List[str]) -> List[int]:
+    """Indices of the first and last BOUNDARY_LINES non-blank lines of a page"""
+    filled = [idx for idx, line in enumerate(page) if line_key(line)]
+    return sorted(set(filled[:BOUNDARY_LINES] + filled[-BOUNDARY_LINES:]))
+
+
+def clean_lines(text: str) -> List[str]:
+    """
+    Normalized lines without page markers, separator rules and repeated
+    headers and footers. A line at a page boundary that also appears at the
+    boundary of another page is kept once, where it first appears; bare
+    numbers at page boundaries are dropped when they count up with the pages
+    on at least two of them.
+    """
+    pages = split_pages(text)
+    boundaries = [set(boundary_positions(page)) for page in pages]
+    # Pages each line appears on at a boundary
+    boundary_pages = Counter(key for page, positions in zip(pages, boundaries)
+                             for key in {line_key(page[idx]) for idx in positions})
+    # Page numbers are the boundary numbers at one offset from the page index, e.g. 1, 2, 3
+    offsets = Counter(offset for _, offset in {
+        (int(line_key(page[idx])), int(line_key(page[idx])) - page_number)
+        for page_number, (page, positions) in enumerate(zip(pages, boundaries))
+        for idx in positions if _BARE_NUMBER.fullmatch(line_key(page[idx]))
+    })
+    page_offset, numbered_pages = offsets.most_common(1)[0] if offsets else (None, 0)
+
+    cleaned: List[str] = []
+    seen = set()
+    for page_number, (page, positions) in enumerate(zip(pages, boundaries)):
+        for idx, line in enumerate(page):
+            if not line:
+                # Paragraph breaks survive, collapsed to one blank line
+                if cleaned and cleaned[-1]:
+                    cleaned.append("")
+                continue
+            key = line_key(line)
+            if not key or _PAGE_MARKER.fullmatch(key):
+                continue
+            if idx in positions:
+                if numbered_pages > 1 and _BARE_NUMBER.fullmatch(key) and int(key) - page_number == page_offset:
+                    continue
+                if boundary_pages[key] > 1:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+            cleaned.append(line)
+    while cleaned and not cleaned[-1]:
+        cleaned.pop()
+    return cleaned
+
+
+def compact_content(content: str, budget: int = CONTENT_TOKEN_BUDGET) -> CompactedContent:
+    """
+    Cleaned content cut to `budget` tokens, with the token counts before and
+    after. Results are cached by content digest, not by the content itself.
+    """
+    return compaction_cache.get_or_compute((content_digest(content), budget),
+                                           lambda: _compact(content, budget))
+
+
+def _compact(content: str, budget: int) -> CompactedContent:
+    original_tokens = count_tokens(content)
+    scanned = content[:MAX_SCAN_CHARS]
+    lines = clean_lines(scanned)
+    text = "\n".join(lines)
+    cleaned_tokens = count_tokens(text)
+    if len(scanned) < len(content):
+        # Unscanned content would only have been cut off
+        cleaned_tokens += original_tokens - count_tokens(scanned)
+    lines_removed = len(scanned.splitlines()) - len(lines)
+    text = truncate_to_tokens(text, budget)
+    compacted = CompactedContent(text, original_tokens, cleaned_tokens, count_tokens(text), lines_removed)
+    compaction_stats.record(compacted)
+    return compacted
+
+
+class CompactionStats:
+    """Token savings of compaction across documents"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.original_tokens = 0
+        self.cleaned_tokens = 0
+        self.tokens = 0
+
+    def record(self, compacted: CompactedContent):
+        with self._lock:
+            self.documents += 1
+            self.original_tokens += compacted.original_tokens
+            self.cleaned_tokens += compacted.cleaned_tokens
+            self.tokens += compacted.tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "documents": self.documents,
+                "original_tokens": self.original_tokens,
+                "tokens_sent": self.tokens,
+                "saved_by_cleaning": self.original_tokens - self.cleaned_tokens,
+                "saved_by_truncation": self.cleaned_tokens - self.tokens,
+            }
+
+
+compaction_stats = CompactionStats()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report the prompt tokens compaction saves per document")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--budget", type=int, default=CONTENT_TOKEN_BUDGET)
+    parser.add_argument("--show", action="store_true", help="Print the compacted text")
+    args = parser.parse_args(argv)
+
+    tokenizer = "tiktoken" if _get_encoding() is not None else "estimate"
+    print(f"{'document':40} {'original':>9} {'cleaned':>8} {'sent':>6} {'saved':>6}  ({tokenizer})")
+    for path in args.files:
+        with open(path, encoding="utf-8", errors="replace") as document_file:
+            compacted = compact_content(document_file.read(), args.budget)
+        print(f"{os.path.basename(path)[:40]:40} {compacted.original_tokens:9} {compacted.cleaned_tokens:8} "
+              f"{compacted.tokens:6} {compacted.tokens_saved:6}")
+        if args.show:
+            print(compacted.text, end="\n\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Structured log of searches and related-document lookups.
+
+Each record is one JSON line in a size-rotated local file (QUERY_LOG_PATH,
+default logs/query_log.jsonl; an empty value disables logging). The log
+feeds the cache warm-up job (warm_up.py), which replays the most popular
+queries and entity sets after a deployment.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_PATH = os.path.join("logs", "query_log.jsonl")
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+_WHITESPACE = re.compile(r"\s+")
+
+_logger: Optional[logging.Logger] = None
+_calls = threading.local()
+
+
+def log_path() -> str:
+    return os.getenv("QUERY_LOG_PATH", DEFAULT_PATH)
+
+
+def normalize_query(text: str) -> str:
+    """Lower-cased query with collapsed whitespace, used to aggregate records"""
+    return _WHITESPACE.sub(" ", text or "").strip().lower()
+
+
+def _get_logger() -> Optional[logging.Logger]:
+    global _logger
+    if _logger is None:
+        path = log_path()
+        if not path:
+            return None
+        logger = logging.getLogger("query_log")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        if not logger.handlers:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+@contextmanager
+def count_backend_calls():
+    """
+    Count backend calls made by this thread inside the block, by kind.
+    Cache hits make no backend call, so they count zero.
+    """
+    counts: Counter = Counter()
+    previous = getattr(_calls, "counts", None)
+    _calls.counts = counts
+    try:
+        yield counts
+    finally:
+        _calls.counts = previous
+
+
+def record_backend_call(kind: str):
+    """Called by the backend wrappers for every Azure Search / Gremlin request"""
+    counts = getattr(_calls, "counts", None)
+    if counts is not None:
+        counts[kind] += 1
+
+
+def result_libraries(results: Iterable[dict], key: str = "Library") -> List[str]:
+    """Sorted libraries present in a result list"""
+    return sorted({str(doc.get(key)) for doc in results})
+
+
+def _write(record: dict):
+    try:
+        logger = _get_logger()
+        if logger is not None:
+            logger.info(json.dumps(record, default=str))
+    except OSError as e:
+        # Logging must never break a search
+        print(f"DEBUG - Query log unavailable: {str(e)}")  # For debugging
+
+
+def log_search(query: str, latency_ms: float, result_count: int, **extra):
+    """Record a search; `query` is kept as typed so it can be replayed exactly"""
+    record = {
+        "ts": time.time(),
+        "kind": "search",
+        "query": query,
+        "normalized": normalize_query(query),
+        "latency_ms": round(latency_ms, 1),
+        "result_count": result_count,
+    }
+    record.update(extra)
+    _write(record)
+
+
+def log_related(entities: Dict[str, Iterable[str]], latency_ms: float, result_count: int, **extra):
+    """Record a related-document lookup for an entity selection"""
+    record = {
+        "ts": time.time(),
+        "kind": "related",
+        "entities": {label: sorted(names) for label, names in entities.items()},
+        "latency_ms": round(latency_ms, 1),
+        "result_count": result_count,
+    }
+    record.update(extra)
+    _write(record)
+
+
+def read_records(path: Optional[str] = None) -> Iterator[dict]:
+    """All records, oldest rotated file first. Malformed lines are skipped."""
+    path = path or log_path()
+    files = [f"{path}.{n}" for n in range(BACKUP_COUNT, 0, -1)] + [path]
+    for file_path in files:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def popular_queries(records: Iterable[dict], top_k: int) -> List[Tuple[str, Optional[str], int]]:
+    """
+    Top-K searches by normalized query and filter, as (query, filter, count).
+    The query returned is the most frequent spelling, so replaying it with the
+    filter hits the same cache key.
+    """
+    counts: Counter = Counter()
+    spellings: Dict[Tuple[str, Optional[str]], Counter] = {}
+    for record in records:
+        if record.get("kind") != "search" or not record.get("normalized"):
+            continue
+        key = (record["normalized"], record.get("filter"))
+        counts[key] += 1
+        spellings.setdefault(key, Counter())[record["query"]] += 1
+    return [(spellings[key].most_common(1)[0][0], key[1], count)
+            for key, count in counts.most_common(top_k)]
+
+
+def popular_entity_sets(records: Iterable[dict], top_k: int) -> List[Tuple[Dict[str, List[str]], int]]:
+    """Top-K related-document entity selections, as (entities by label, count)"""
+    counts: Counter = Counter()
+    for record in records:
+        entities = record.get("entities")
+        if record.get("kind") != "related" or not entities:
+            continue
+        counts[json.dumps(entities, sort_keys=True)] += 1
+    return [(json.loads(key), count) for key, count in counts.most_common(top_k)]
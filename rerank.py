@@ -0,0 +1,121 @@
+"""
+Local BM25 re-ranking of search results.
+
+Scores the top-N returned documents against the query with vectorized NumPy
+BM25 over `merged_content`, plus boosts for query terms found in the library
+metadata and for recent `Date_*` / `Year_*` values. The index score is kept as
+a small tie-breaker.
+
+Term frequencies are counted with `str.count` on the lower-cased leading
+window of each document, which matches term affixes as well as whole words.
+Both choices keep scoring of 1,000 candidates inside the 20 ms budget (see
+benchmarks/rerank.py).
+"""
+import re
+from typing import List, Optional
+
+import numpy as np
+
+from search_core import LIBRARY_METADATA_FIELDS
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Weights of the non-BM25 signals
+METADATA_MATCH_BOOST = 1.0
+RECENCY_BOOST = 0.5
+INDEX_SCORE_WEIGHT = 0.1
+
+DEFAULT_TOP_N = 1000
+# Leading window of merged_content that is scored
+MAX_SCORED_CHARS = 2000
+
+# Metadata fields per library; the date ones feed the recency boost
+METADATA_FIELD_NAMES = {
+    library: tuple(field for _, field in fields)
+    for library, fields in LIBRARY_METADATA_FIELDS.items()
+}
+DATE_FIELDS = {
+    library: tuple(field for field in fields if field.startswith("Date_") or field.startswith("Year_"))
+    for library, fields in METADATA_FIELD_NAMES.items()
+}
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_YEAR_PATTERN = re.compile(r"\b(1[89]\d\d|20\d\d)\b")
+
+
+def query_terms(query: str) -> List[str]:
+    """Unique lower-cased query terms, ignoring one-character tokens"""
+    terms = []
+    for term in _TOKEN_PATTERN.findall(query.lower()):
+        if len(term) > 1 and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def document_year(doc: dict) -> Optional[int]:
+    """Latest year found in the document's date metadata"""
+    years = [int(year)
+             for value in map(doc.get, DATE_FIELDS.get(doc.get('Library'), ())) if value
+             for year in _YEAR_PATTERN.findall(str(value))]
+    return max(years) if years else None
+
+
+def bm25_scores(terms: List[str], contents: List[str]) -> np.ndarray:
+    """BM25 score of every content string for the given terms"""
+    n_docs = len(contents)
+    if not terms or not n_docs:
+        return np.zeros(n_docs)
+
+    # Character length stands in for token length in the length normalization
+    lengths = np.fromiter((len(content) for content in contents), dtype=np.float64, count=n_docs)
+    tf = np.empty((n_docs, len(terms)), dtype=np.float64)
+    for col, term in enumerate(terms):
+        tf[:, col] = [content.count(term) for content in contents]
+
+    doc_freq = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = K1 * (1 - B + B * lengths / max(lengths.mean(), 1.0))
+    return ((tf * (K1 + 1)) / (tf + norm[:, None])) @ idf
+
+
+def rerank_documents(query: str, documents: List[dict], top_n: int = DEFAULT_TOP_N) -> List[dict]:
+    """
+    Re-order the top-N documents by local relevance. Documents beyond top-N keep
+    their index order after the re-ranked ones. The input list is not modified.
+    """
+    terms = query_terms(query)
+    candidates = documents[:top_n]
+    if not terms or len(candidates) < 2:
+        return list(documents)
+
+    contents = [(doc.get('merged_content') or '')[:MAX_SCORED_CHARS].lower() for doc in candidates]
+    scores = bm25_scores(terms, contents)
+
+    # Query terms found in the library's metadata fields, and the latest metadata year
+    metadata_matches = np.zeros(len(candidates))
+    years = np.zeros(len(candidates))
+    for row, doc in enumerate(candidates):
+        library = doc.get('Library')
+        metadata_text = " ".join([str(value) for value in map(doc.get, METADATA_FIELD_NAMES.get(library, ()))
+                                  if value]).lower()
+        if metadata_text:
+            metadata_matches[row] = sum(term in metadata_text for term in terms)
+            years[row] = document_year(doc) or 0
+    scores += METADATA_MATCH_BOOST * metadata_matches / len(terms)
+
+    # Newer documents rank higher, normalized over the candidate set
+    dated = years > 0
+    if dated.any():
+        oldest, newest = years[dated].min(), years[dated].max()
+        if newest > oldest:
+            scores[dated] += RECENCY_BOOST * (years[dated] - oldest) / (newest - oldest)
+
+    index_scores = np.array([doc.get('@search.score') or 0.0 for doc in candidates], dtype=np.float64)
+    if index_scores.max() > 0:
+        scores += INDEX_SCORE_WEIGHT * index_scores / index_scores.max()
+
+    # Stable sort keeps index order for equal scores
+    order = np.argsort(-scores, kind="stable")
+    return [candidates[i] for i in order] + list(documents[top_n:])
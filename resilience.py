@@ -0,0 +1,208 @@
+"""
+Deadlines, circuit breakers and hedged requests for backend calls.
+
+Every Azure Search and Gremlin request runs on its backend's worker pool so
+the caller can stop waiting at its deadline even when the socket has stalled.
+A circuit breaker per backend opens after consecutive failures and fails
+calls fast until a probe succeeds; callers then serve stale cache entries
+where they have them. Idempotent reads can send one hedged duplicate when
+the first attempt is slower than the backend's recent p95.
+
+A stalled attempt keeps its pool thread until the socket gives up; each pool
+is bounded, so a hung backend ends up failing fast through the breaker
+rather than piling up threads, and cannot take the other backend's threads.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+
+POOL_WORKERS = int(os.getenv("BACKEND_POOL_WORKERS", "32"))
+# Latencies kept per backend for the hedging delay
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 20
+MIN_HEDGE_DELAY_SECONDS = 0.05
+
+
+class BackendUnavailable(Exception):
+    """A backend call could not be completed in time or the backend is failing"""
+
+
+class BackendTimeout(BackendUnavailable):
+    """No attempt finished before the call's deadline"""
+
+
+class CircuitOpenError(BackendUnavailable):
+    """The backend's circuit breaker is open"""
+
+
+def is_backend_failure(error: Exception) -> bool:
+    """
+    Whether an error says the backend is unhealthy. Client errors (bad query,
+    missing document) are the caller's problem and do not trip the breaker.
+    """
+    status = getattr(error, "status_code", None)
+    return status is None or status >= 500 or status == 429
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; one probe is let through after `reset_seconds`"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._probing:
+                return False
+            # Half-open: this caller probes the backend
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Backend:
+    """Call policy of one backend: deadline, breaker, optional hedging and its own worker pool"""
+
+    def __init__(self, name: str, deadline_seconds: float, hedge: bool = False,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 pool_workers: int = POOL_WORKERS):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=pool_workers,
+                                        thread_name_prefix=f"backend-{name.lower().replace(' ', '-')}")
+        self.deadline_seconds = deadline_seconds
+        self.hedge = hedge
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 of recent successful calls, or None until there are enough samples"""
+        with self._lock:
+            if len(self._latencies) < MIN_HEDGE_SAMPLES:
+                return None
+            return max(float(np.percentile(self._latencies, 95)), MIN_HEDGE_DELAY_SECONDS)
+
+    def call(self, func: Callable[[], T], deadline_seconds: Optional[float] = None,
+             hedge: Optional[bool] = None) -> T:
+        """
+        Run `func` within the deadline. Raises CircuitOpenError without calling
+        the backend while the breaker is open, BackendTimeout at the deadline,
+        or the error of the last failed attempt.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open), try again shortly")
+
+        deadline = time.monotonic() + (deadline_seconds or self.deadline_seconds)
+        start = time.monotonic()
+        futures = [self._pool.submit(func)]
+        hedge_delay = self.hedge_delay() if (self.hedge if hedge is None else hedge) else None
+        error: Optional[Exception] = None
+
+        while futures:
+            timeout = deadline - time.monotonic()
+            if hedge_delay is not None and len(futures) == 1:
+                timeout = min(timeout, start + hedge_delay - time.monotonic())
+            done, _ = wait(futures, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+            if not done:
+                if time.monotonic() >= deadline:
+                    break
+                # First attempt is slower than usual: race a duplicate against it
+                futures.append(self._pool.submit(func))
+                hedge_delay = None
+                with self._lock:
+                    self.hedges_sent += 1
+                continue
+
+            for future in done:
+                futures.remove(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if futures:
+                    with self._lock:
+                        self.hedges_won += 1
+                self._record_success(time.monotonic() - start)
+                return result
+
+        if error is not None and not futures:
+            if is_backend_failure(error):
+                self.breaker.record_failure()
+            else:
+                # The backend answered, so it is healthy
+                self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        raise BackendTimeout(f"{self.name} did not respond within {deadline_seconds or self.deadline_seconds:g}s")
+
+    def _record_success(self, elapsed: float):
+        self.breaker.record_success()
+        with self._lock:
+            self._latencies.append(elapsed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = list(self._latencies)
+        return {
+            "backend": self.name,
+            "state": self.breaker.state,
+            "p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 1) if latencies else None,
+            "hedges_sent": self.hedges_sent,
+            "hedges_won": self.hedges_won,
+        }
+
+
+search_backend = Backend(
+    "Azure Search",
+    deadline_seconds=float(os.getenv("SEARCH_DEADLINE_SECONDS", "10")),
+    hedge=os.getenv("SEARCH_HEDGING", "1") == "1",
+    failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+    pool_workers=int(os.getenv("SEARCH_POOL_WORKERS", str(POOL_WORKERS))),
+)
+# Hedged Gremlin reads are charged twice, so hedging is opt-in there
+gremlin_backend = Backend(
+    "Gremlin",
+    deadline_seconds=float(os.getenv("GREMLIN_DEADLINE_SECONDS", "20")),
+    hedge=os.getenv("GREMLIN_HEDGING", "0") == "1",
+    failure_threshold=int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+    pool_workers=int(os.getenv("GREMLIN_POOL_WORKERS", str(POOL_WORKERS))),
+)
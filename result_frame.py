@@ -0,0 +1,96 @@
+"""
+Typed, columnar view of a library's search results for in-memory sort,
+filter and group-by.
+
+Each library slice of a result set is parsed once into a pandas DataFrame
+with one column per schema field: dates become datetime64, numbers nullable
+numbers, text stays text. The frame is indexed by the document's position
+in the slice, so a view is just an ordering of positions and the tables keep
+rendering the original documents. Sorting, filtering and grouping are
+vectorized and never go back to Azure Search.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from library_schema import LibrarySchema
+
+SCORE_COLUMN = "_score"
+SEARCH_TEXT_COLUMN = "_text"
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Dates from strings: ISO 8601 first, then any other common format, else NaT"""
+    parsed = pd.to_datetime(values, errors="coerce", format="ISO8601", utc=True)
+    unparsed = parsed.isna() & values.notna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(values[unparsed], errors="coerce", format="mixed", utc=True)
+    return parsed.dt.tz_localize(None)
+
+
+def parse_numbers(values: pd.Series) -> pd.Series:
+    """Numbers from strings such as "2021" or "1,250.5", else NA"""
+    cleaned = values.astype("string").str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce").astype("Float64")
+
+
+def typed_column(values: Sequence, dtype: str) -> pd.Series:
+    series = pd.Series(values, dtype="object").where(lambda column: column != "", None)
+    if dtype == "date":
+        return parse_dates(series)
+    if dtype == "number":
+        return parse_numbers(series)
+    return series.astype("string").str.strip()
+
+
+def library_frame(schema: Optional[LibrarySchema], documents: Iterable[dict]) -> pd.DataFrame:
+    """One row per document (indexed by its position in `documents`), one typed column per field"""
+    documents = list(documents)
+    fields = schema.fields if schema else ()
+    frame = pd.DataFrame({
+        field.field: typed_column([doc.get(field.field) for doc in documents], field.dtype)
+        for field in fields
+    }, index=pd.RangeIndex(len(documents)))
+    frame["DocumentName"] = typed_column([doc.get("DocumentName") for doc in documents], "string")
+    frame[SCORE_COLUMN] = pd.to_numeric(pd.Series([doc.get("@search.score") for doc in documents],
+                                                  dtype="object"), errors="coerce")
+    # Lower-cased text of every column, for "contains" filters
+    text_columns = ["DocumentName"] + [field.field for field in fields]
+    frame[SEARCH_TEXT_COLUMN] = (
+        pd.Series([" ".join(str(doc.get(column) or "") for column in text_columns) for doc in documents],
+                  index=frame.index, dtype="string").str.lower()
+    )
+    return frame
+
+
+def view_positions(frame: pd.DataFrame, sort_by: Optional[str] = None, descending: bool = False,
+                   contains: str = "", group_by: Optional[str] = None) -> List[Tuple[Optional[str], List[int]]]:
+    """
+    Positions of the documents to show, in order, as (group, positions) pairs.
+    Without `sort_by` the result order is kept; rows missing the sort value
+    come last. Without `group_by` there is a single group named None.
+    """
+    view = frame
+    for term in contains.lower().split():
+        view = view[view[SEARCH_TEXT_COLUMN].str.contains(term, regex=False, na=False)]
+    if sort_by:
+        # Stable, so equal values keep their result order
+        view = view.sort_values(sort_by, ascending=not descending, na_position="last", kind="stable")
+
+    if not group_by:
+        return [(None, view.index.tolist())]
+
+    column = view[group_by]
+    if pd.api.types.is_datetime64_any_dtype(column):
+        # Dates group by year
+        keys = column.dt.year.astype("Int64").astype("string")
+    elif pd.api.types.is_float_dtype(column):
+        keys = column.astype("Int64").astype("string") if (column.dropna() % 1 == 0).all() \
+            else column.astype("string")
+    else:
+        keys = column.astype("string")
+    keys = keys.fillna("N/A")
+    # Groups in order of their values (N/A last); rows keep the view order within a group
+    order = sorted(keys.unique(), key=lambda key: (key == "N/A", key))
+    positions = view.index.to_series().groupby(keys.values, sort=False).agg(list)
+    return [(key, positions[key]) for key in order]
@@ -0,0 +1,91 @@
+"""
+Immutable, indexed view of one search's results.
+
+Built once per search, it gives every document a stable key, a key ->
+document map for constant-time selection, and per-library slices in the
+order libraries first appear in the results. Each slice is also parsed, on
+first use, into a typed frame for sorting, filtering and grouping.
+"""
+from collections import Counter
+from types import MappingProxyType
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from library_schema import LIBRARY_SCHEMAS
+from result_frame import library_frame
+
+UNKNOWN_LIBRARY = 'Unknown Library'
+
+
+class LibrarySlice(NamedTuple):
+    """Documents of one library, in result order, with their keys"""
+    documents: Tuple[dict, ...]
+    keys: Tuple[str, ...]
+
+
+def document_key(doc: dict) -> str:
+    """Key of a document, unique within a result set unless names repeat"""
+    return f"{doc.get('Library', UNKNOWN_LIBRARY)}/{doc.get('DocumentName', '')}"
+
+
+class ResultSet:
+    """Search results with stable keys, a key index and per-library slices"""
+
+    __slots__ = ('_documents', '_keys', '_by_key', '_libraries', '_frames')
+
+    def __init__(self, documents: Iterable[dict]):
+        documents = tuple(documents)
+
+        # Repeated names get an ordinal suffix so keys stay unique and stable for this result order
+        seen: Counter = Counter()
+        keys: List[str] = []
+        for doc in documents:
+            base = document_key(doc)
+            keys.append(base if not seen[base] else f"{base}#{seen[base]}")
+            seen[base] += 1
+
+        groups: Dict[str, Tuple[List[dict], List[str]]] = {}
+        for key, doc in zip(keys, documents):
+            group_docs, group_keys = groups.setdefault(doc.get('Library', UNKNOWN_LIBRARY), ([], []))
+            group_docs.append(doc)
+            group_keys.append(key)
+
+        self._documents = documents
+        self._keys = tuple(keys)
+        self._by_key = MappingProxyType(dict(zip(keys, documents)))
+        self._libraries = MappingProxyType({
+            library: LibrarySlice(tuple(group_docs), tuple(group_keys))
+            for library, (group_docs, group_keys) in groups.items()
+        })
+        self._frames: Dict[str, pd.DataFrame] = {}
+
+    @property
+    def documents(self) -> Tuple[dict, ...]:
+        return self._documents
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+
+    @property
+    def libraries(self) -> Mapping[str, LibrarySlice]:
+        return self._libraries
+
+    def frame(self, library: str) -> pd.DataFrame:
+        """Typed frame of a library's documents, indexed by position in its slice"""
+        frame = self._frames.get(library)
+        if frame is None:
+            frame = self._frames[library] = library_frame(LIBRARY_SCHEMAS.get(library),
+                                                          self._libraries[library].documents)
+        return frame
+
+    def get(self, key: Optional[str]) -> Optional[dict]:
+        """Document for a key, or None"""
+        return self._by_key.get(key)
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self._documents)
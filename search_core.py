@@ -0,0 +1,292 @@
+"""
+Backend access shared by the Streamlit app and the headless tools.
+
+Nothing in this module depends on Streamlit: errors are raised to the caller,
+which decides how to surface them.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from azure.core.credentials import AzureKeyCredential
+from azure.search.documents import SearchClient
+from azure.search.documents.indexes import SearchIndexClient
+from dotenv import load_dotenv
+from gremlin_python.driver import client, serializer
+
+from caches import document_cache, entity_names_cache, related_cache, search_cache
+from graph_explore import ENTITY_LABELS, build_related_documents_query
+from gremlin_cost import describe_selection, normalize_query_shape, plan_result_limit, submit_gremlin
+from library_schema import LIBRARY_SCHEMAS, FieldCapability, odata_string
+from query_log import record_backend_call
+from resilience import BackendUnavailable, search_backend
+
+# Fields returned by every search: the basic fields plus every library's metadata
+SEARCH_SELECT_FIELDS = [
+    "DocumentName", "Library", "merged_content",
+    "people", "organizations", "locations",
+] + [field.field for schema in LIBRARY_SCHEMAS.values() for field in schema.fields]
+
+# Metadata shown for each library as (label, field) pairs
+LIBRARY_METADATA_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    library: [(field.label, field.field) for field in schema.fields]
+    for library, schema in LIBRARY_SCHEMAS.items()
+}
+
+
+class ConfigurationError(Exception):
+    """Raised when required backend settings are missing"""
+
+
+def create_search_client() -> SearchClient:
+    """Create the Azure Search client from environment settings"""
+    load_dotenv()
+    search_endpoint = os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT")
+    search_key = os.getenv("AZURE_SEARCH_API_KEY")
+    index_name = os.getenv("AZURE_SEARCH_INDEX_NAME")
+    if not all([search_endpoint, search_key, index_name]):
+        raise ConfigurationError(
+            "Missing Azure Search credentials: AZURE_SEARCH_SERVICE_ENDPOINT, "
+            "AZURE_SEARCH_API_KEY and AZURE_SEARCH_INDEX_NAME are required"
+        )
+    return SearchClient(endpoint=search_endpoint,
+                        index_name=index_name,
+                        credential=AzureKeyCredential(search_key))
+
+
+# A failed schema read is retried after this many seconds
+CAPABILITIES_RETRY_SECONDS = 60.0
+
+_capabilities: Optional[Dict[str, FieldCapability]] = None
+_capabilities_failed_at: Optional[float] = None
+_capabilities_lock = threading.Lock()
+
+
+def fetch_index_capabilities() -> Dict[str, FieldCapability]:
+    """
+    Type and filterable/searchable attributes of each index field. Empty when
+    the schema cannot be read (e.g. with a query key), in which case callers
+    fall back to the declared library schema. A successful read is kept for
+    the life of the process; a failed one is retried after a minute.
+    """
+    global _capabilities, _capabilities_failed_at
+    with _capabilities_lock:
+        if _capabilities is not None:
+            return _capabilities
+        if _capabilities_failed_at is not None \
+                and time.monotonic() - _capabilities_failed_at < CAPABILITIES_RETRY_SECONDS:
+            return {}
+        load_dotenv()
+        try:
+            index_client = SearchIndexClient(endpoint=os.getenv("AZURE_SEARCH_SERVICE_ENDPOINT"),
+                                             credential=AzureKeyCredential(os.getenv("AZURE_SEARCH_API_KEY") or ""))
+            index = index_client.get_index(os.getenv("AZURE_SEARCH_INDEX_NAME"))
+        except Exception as e:
+            print(f"DEBUG - Index schema unavailable, using declared field attributes: {str(e)}")  # For debugging
+            _capabilities_failed_at = time.monotonic()
+            return {}
+        _capabilities = {
+            field.name: FieldCapability(str(field.type), bool(field.filterable), bool(field.searchable))
+            for field in index.fields
+        }
+        return _capabilities
+
+
+def create_gremlin_client():
+    """Create the Cosmos DB Gremlin client from environment settings"""
+    load_dotenv()
+    return client.Client(
+        f'wss://{os.getenv("GREMLIN_HOST")}:{os.getenv("GREMLIN_PORT")}/',
+        'g',
+        username=f'/dbs/{os.getenv("GREMLIN_DATABASE")}/colls/{os.getenv("GREMLIN_COLLECTION")}',
+        password=os.getenv("GREMLIN_PASSWORD"),
+        message_serializer=serializer.GraphSONSerializersV2d0()
+    )
+
+
+def run_search(search_client, search_text: str, top: Optional[int] = None,
+               skip: Optional[int] = None, filter: Optional[str] = None,
+               order_by: Optional[List[str]] = None) -> List[dict]:
+    """
+    Run a full-text search and return the documents as a list. The call has a
+    deadline and goes through the Azure Search circuit breaker; raises
+    BackendUnavailable when either gives up.
+    """
+    record_backend_call("search")
+
+    def search():
+        results = search_client.search(
+            search_text,
+            select=SEARCH_SELECT_FIELDS,
+            top=top,
+            skip=skip,
+            filter=filter,
+            order_by=order_by,
+            include_total_count=True
+        )
+        return list(results)  # Convert to list to make it reusable
+
+    return search_backend.call(search)
+
+
+def search_with_fallback(search_client, search_text: str, top: Optional[int] = None,
+                         skip: Optional[int] = None, filter: Optional[str] = None) -> Tuple[List[dict], bool]:
+    """
+    Run a search through the shared search cache. Returns (results, stale);
+    stale results are an expired cache entry served while Azure Search is
+    unavailable.
+    """
+    # Unfiltered searches keep their existing cache keys
+    key = (search_text, top, skip) if filter is None else (search_text, top, skip, filter)
+    try:
+        return search_cache.get_or_compute(
+            key,
+            lambda: run_search(search_client, search_text, top=top, skip=skip, filter=filter)
+        ), False
+    except BackendUnavailable:
+        found, results = search_cache.get_stale(key)
+        if not found:
+            raise
+        return results, True
+
+
+def cached_search(search_client, search_text: str, top: Optional[int] = None,
+                  skip: Optional[int] = None) -> List[dict]:
+    """Run a search through the shared search cache"""
+    return search_with_fallback(search_client, search_text, top=top, skip=skip)[0]
+
+
+def fetch_document(search_client, doc_name: str) -> Optional[dict]:
+    """Fetch a single document by name through the shared document cache"""
+    def compute():
+        results = run_search(search_client, f"DocumentName eq '{doc_name}'")
+        # Prefer the exact name match over other hits for the same text
+        for doc in results:
+            if doc.get('DocumentName') == doc_name:
+                return doc
+        return results[0] if results else None
+    try:
+        return document_cache.get_or_compute(doc_name, compute)
+    except BackendUnavailable:
+        found, doc = document_cache.get_stale(doc_name)
+        if not found:
+            raise
+        return doc
+
+
+def fetch_related_documents(gremlin_client, entities: Dict[str, set],
+                            session_spent: float = 0.0,
+                            limit: Optional[int] = None) -> Tuple[list, dict, bool]:
+    """
+    Get documents mentioning any of the entities, within the configured RU budgets.
+    With `limit` only that many documents are returned, those matching the most
+    entities first, ranked and cut in the graph database.
+    Returns (results, cost, used_cheap_plan). Results come from the shared
+    related-documents cache when possible, in which case no RU is charged.
+    """
+    ranked = bool(limit)
+    query = build_related_documents_query(entities, limit=limit, ranked=ranked)
+    if not query:
+        return [], {"request_charge": 0.0, "server_time_ms": 0.0, "results": 0}, False
+
+    # Cap the result size or fall back to the cheaper plan to stay within RU budgets
+    shape = normalize_query_shape(query)
+    budget_limit, use_cheap_plan = plan_result_limit(shape, session_spent)
+    if budget_limit:
+        limit = min(limit, budget_limit) if limit else budget_limit
+    if use_cheap_plan:
+        query = build_related_documents_query(entities, limit=limit, matched_only=True, ranked=ranked)
+        shape = normalize_query_shape(query)
+    elif budget_limit:
+        query = build_related_documents_query(entities, limit=limit, ranked=ranked)
+
+    found, results = related_cache.get(query)
+    if found:
+        return results, {"request_charge": 0.0, "server_time_ms": 0.0, "results": len(results),
+                         "cached": True}, use_cheap_plan
+
+    # Execute query and record its RU cost
+    try:
+        results, cost = submit_gremlin(gremlin_client, query, selection=describe_selection(entities), shape=shape)
+    except BackendUnavailable:
+        found, results = related_cache.get_stale(query)
+        if not found:
+            raise
+        return results, {"request_charge": 0.0, "server_time_ms": 0.0, "results": len(results),
+                         "cached": True, "stale": True}, use_cheap_plan
+    related_cache.set(query, results)
+    return results, cost, use_cheap_plan
+
+
+def fetch_entity_names(gremlin_client) -> Dict[str, List[str]]:
+    """Every entity name in the graph by vertex label, through the shared entity names cache"""
+    def compute():
+        names = {}
+        for label in ENTITY_LABELS:
+            results, _ = submit_gremlin(gremlin_client, f"g.V().hasLabel('{label}').values('name').dedup()",
+                                        selection="entity index")
+            names[label] = [str(name) for name in results]
+        return names
+    try:
+        return entity_names_cache.get_or_compute("all", compute)
+    except BackendUnavailable:
+        found, names = entity_names_cache.get_stale("all")
+        if not found:
+            raise
+        return names
+
+
+def iter_search_pages(search_client, search_text: str, page_size: int = 50,
+                      max_results: Optional[int] = None, filter: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Yield search results in relevance order one page at a time using top/skip
+    paging. Azure Search rejects skip above 100,000 and does not keep the order
+    stable between pages; use iter_index_documents to walk a whole index.
+    """
+    fetched = 0
+    while max_results is None or fetched < max_results:
+        top = page_size if max_results is None else min(page_size, max_results - fetched)
+        page = run_search(search_client, search_text, top=top, skip=fetched, filter=filter)
+        if page:
+            yield page
+        fetched += len(page)
+        if len(page) < top:
+            break
+
+
+def iter_index_documents(search_client, search_text: str = "*", key_field: str = "DocumentName",
+                         page_size: int = 100, max_results: Optional[int] = None,
+                         filter: Optional[str] = None) -> Iterator[List[dict]]:
+    """
+    Yield every matching document exactly once, one page at a time, ordered by
+    `key_field` and paged with a range filter on the last key seen. The field
+    must be unique, sortable and filterable.
+    """
+    fetched = 0
+    last_key = None
+    while max_results is None or fetched < max_results:
+        top = page_size if max_results is None else min(page_size, max_results - fetched)
+        clauses = [f"({filter})"] if filter else []
+        if last_key is not None:
+            clauses.append(f"{key_field} gt {odata_string(str(last_key))}")
+        page = run_search(search_client, search_text, top=top, filter=" and ".join(clauses) or None,
+                          order_by=[f"{key_field} asc"])
+        if page:
+            yield page
+            last_key = page[-1].get(key_field)
+        fetched += len(page)
+        if len(page) < top or last_key is None:
+            break
+
+
+def project_metadata(doc: dict, by_field: bool = False) -> Dict[str, str]:
+    """
+    Project a document onto its library's metadata fields, with "N/A" for
+    missing values. Keys are display labels, or index field names if `by_field`.
+    """
+    fields = LIBRARY_METADATA_FIELDS.get(doc.get('Library'), [])
+    return {
+        (field if by_field else label): doc.get(field) or "N/A"
+        for label, field in fields
+    }
@@ -0,0 +1,85 @@
+"""
+Background execution of searches with stale-query suppression.
+
+Each session owns a LatestSearch. Submitting a query starts it on a shared
+worker pool under a new generation number; a query still in flight for the
+same session is cancelled if it has not started, and its result is ignored
+otherwise. The script thread only ever waits on the newest generation, in
+short polls, so Streamlit can stop the run as soon as the user submits a
+refined query instead of blocking on the old request.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Hashable, List, NamedTuple, Optional
+
+from query_log import count_backend_calls
+from rerank import rerank_documents
+from search_core import search_with_fallback
+
+_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SEARCH_EXECUTOR_WORKERS", "8")),
+                           thread_name_prefix="search")
+
+
+class SearchOutcome(NamedTuple):
+    results: List[dict]
+    stale: bool
+    latency_ms: float
+    backend_calls: dict
+
+
+def run_search_job(search_client, search_text: str, rerank: bool,
+                   filter: Optional[str] = None) -> SearchOutcome:
+    """Search (and optionally re-rank) off the script thread. Must not touch Streamlit."""
+    started = time.perf_counter()
+    with count_backend_calls() as calls:
+        results, stale = search_with_fallback(search_client, search_text, filter=filter)
+    latency_ms = (time.perf_counter() - started) * 1000
+    if rerank:
+        results = rerank_documents(search_text, results)
+    return SearchOutcome(results, stale, latency_ms, dict(calls))
+
+
+class LatestSearch:
+    """The newest search of one session"""
+
+    def __init__(self):
+        self.generation = 0
+        self.completed_generation = 0
+        self.pending_key: Optional[Hashable] = None
+        self._future: Optional[Future] = None
+        self._lock = threading.Lock()
+
+    def submit(self, key: Hashable, func: Callable[[], SearchOutcome]) -> int:
+        """Start a search, superseding the one in flight. Returns its generation."""
+        with self._lock:
+            if self._future is not None and not self._future.done():
+                # Not started yet: never run it. Running: its result is dropped.
+                self._future.cancel()
+            self.generation += 1
+            self.pending_key = key
+            self._future = _pool.submit(func)
+            return self.generation
+
+    def wait(self, timeout: float) -> Optional[Future]:
+        """The newest search's future once it is done, or None if still running after `timeout`"""
+        with self._lock:
+            future = self._future
+        if future is None:
+            return None
+        done, _ = wait([future], timeout=timeout)
+        return future if done else None
+
+    def finish(self, future: Future) -> bool:
+        """
+        Mark a completed future as consumed. Returns False if a newer search
+        was submitted meanwhile, in which case its result must be discarded.
+        """
+        with self._lock:
+            if future is not self._future:
+                return False
+            self.completed_generation = self.generation
+            self.pending_key = None
+            self._future = None
+            return True
@@ -0,0 +1,245 @@
+"""
+Per-session memory accounting and idle-session eviction for the Streamlit app.
+
+Every script run registers its session. A background sweeper measures the
+deep size of each session's state and, for sessions idle longer than
+SESSION_IDLE_EVICT_SECONDS, drops the large payloads (search results,
+similar documents, the open document and its summaries). What is needed to
+fetch a payload again is kept under `evicted_keys`, and the session restores
+it lazily on its next run; the data itself comes back from the shared
+caches.
+
+Sessions are held by weak reference, so closed sessions drop out of the
+registry. Reaching another session's state uses Streamlit's runtime
+internals; if they change, measuring and eviction are disabled rather than
+breaking the app.
+"""
+import os
+import sys
+import threading
+import time
+import types
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+IDLE_EVICT_SECONDS = float(os.getenv("SESSION_IDLE_EVICT_SECONDS", "900"))
+SWEEP_SECONDS = float(os.getenv("SESSION_SWEEP_SECONDS", "60"))
+# Sessions smaller than this are not worth evicting
+EVICT_MIN_BYTES = int(os.getenv("SESSION_EVICT_MIN_BYTES", str(256 * 1024)))
+
+# Payloads that can be fetched again, and their empty values
+EVICTABLE_KEYS = {
+    "search_results": None,
+    "similar_docs": [],
+    "current_doc_content": None,
+    "document_summaries": {},
+}
+EVICTED_KEY = "evicted_keys"
+# Clients and other process-wide resources are not session payload
+RESOURCE_KEYS = {"gremlin_client", "search_client", "groq_analyzer", "latest_search"}
+# Shared code objects reachable from state are not counted
+_NOT_PAYLOAD = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_size(obj: Any) -> int:
+    """Bytes of `obj` and everything it references, each object counted once"""
+    seen = set()
+    pending = deque([obj])
+    total = 0
+    while pending:
+        item = pending.pop()
+        if id(item) in seen or isinstance(item, _NOT_PAYLOAD):
+            continue
+        seen.add(id(item))
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            # Columnar data reports its own size; walking it would touch every cell
+            total += int(np.sum(item.memory_usage(deep=True)))
+            continue
+        if isinstance(item, np.ndarray):
+            total += item.nbytes
+            continue
+        total += sys.getsizeof(item)
+        if isinstance(item, (str, bytes, bytearray, int, float, bool)) or item is None:
+            continue
+        if hasattr(item, "items") and callable(item.items):
+            for key, value in item.items():
+                pending.append(key)
+                pending.append(value)
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            pending.extend(item)
+        if hasattr(item, "__dict__"):
+            pending.append(vars(item))
+        for slot in getattr(type(item), "__slots__", ()):
+            if hasattr(item, slot):
+                pending.append(getattr(item, slot))
+    return total
+
+
+def restore_hint(key: str, value: Any) -> Any:
+    """What must be kept to fetch an evicted payload again"""
+    if key == "current_doc_content" and isinstance(value, dict):
+        return value.get("DocumentName")
+    return None
+
+
+class SessionRecord:
+    def __init__(self, session_id: str, state):
+        self.session_id = session_id
+        self.state_ref = weakref.ref(state)
+        self.last_active = time.monotonic()
+        self.sizes: Dict[str, int] = {}
+        self.measured_at: Optional[float] = None
+        self.evictions = 0
+
+
+class SessionMemoryRegistry:
+    """Live sessions of this process with their last measured state sizes"""
+
+    def __init__(self):
+        self._records: Dict[str, SessionRecord] = {}
+        self._lock = threading.Lock()
+
+    def touch(self, session_id: str, state):
+        """Record activity of a session; `state` is its Streamlit SessionState"""
+        with self._lock:
+            record = self._records.get(session_id)
+            if record is None or record.state_ref() is not state:
+                record = self._records[session_id] = SessionRecord(session_id, state)
+            record.last_active = time.monotonic()
+
+    def _live(self) -> List[SessionRecord]:
+        with self._lock:
+            for session_id in [sid for sid, record in self._records.items() if record.state_ref() is None]:
+                del self._records[session_id]
+            return list(self._records.values())
+
+    def measure(self, record: SessionRecord) -> Dict[str, int]:
+        state = record.state_ref()
+        if state is None:
+            return {}
+        try:
+            items = dict(state.filtered_state)
+        except RuntimeError:
+            # The session changed its state mid-copy; measure it next sweep
+            return record.sizes
+        record.sizes = {key: deep_size(value) for key, value in items.items() if key not in RESOURCE_KEYS}
+        record.measured_at = time.monotonic()
+        return record.sizes
+
+    def evict(self, record: SessionRecord) -> int:
+        """Drop the session's evictable payloads, keeping restore hints. Returns bytes freed."""
+        state = record.state_ref()
+        if state is None:
+            return 0
+        evicted = dict(state[EVICTED_KEY]) if EVICTED_KEY in state else {}
+        freed = 0
+        for key, empty in EVICTABLE_KEYS.items():
+            if key not in state or not state[key]:
+                continue
+            value = state[key]
+            evicted[key] = restore_hint(key, value)
+            freed += record.sizes.get(key, 0)
+            state[key] = type(empty)() if empty is not None else None
+        if freed:
+            state[EVICTED_KEY] = evicted
+            record.evictions += 1
+            for key in evicted:
+                record.sizes[key] = deep_size(state[key]) if key in state else 0
+        return freed
+
+    def measure_all(self):
+        for record in self._live():
+            self.measure(record)
+
+    def sweep(self, idle_seconds: float = IDLE_EVICT_SECONDS) -> dict:
+        """Measure every session and evict large idle ones"""
+        stats = {"sessions": 0, "evicted": 0, "freed_bytes": 0}
+        now = time.monotonic()
+        for record in self._live():
+            stats["sessions"] += 1
+            sizes = self.measure(record)
+            if now - record.last_active >= idle_seconds and sum(sizes.values()) >= EVICT_MIN_BYTES:
+                freed = self.evict(record)
+                if freed:
+                    stats["evicted"] += 1
+                    stats["freed_bytes"] += freed
+        return stats
+
+    def report(self) -> List[dict]:
+        """One row per live session, largest first"""
+        now = time.monotonic()
+        rows = []
+        for record in self._live():
+            sizes = record.sizes
+            largest = max(sizes, key=sizes.get) if sizes else None
+            rows.append({
+                "session": record.session_id[:8],
+                "idle_seconds": round(now - record.last_active),
+                "state_kb": round(sum(sizes.values()) / 1024, 1),
+                "largest_key": largest,
+                "largest_kb": round(sizes[largest] / 1024, 1) if largest else 0.0,
+                "evictions": record.evictions,
+            })
+        return sorted(rows, key=lambda row: row["state_kb"], reverse=True)
+
+
+session_registry = SessionMemoryRegistry()
+
+
+def register_current_session() -> Optional[str]:
+    """Register the session of the running script. Returns its id, or None outside a script run."""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        if ctx is None:
+            return None
+        # The SafeSessionState wrapper is recreated per run; its SessionState lives with the session
+        state = getattr(ctx.session_state, "_state", ctx.session_state)
+        session_registry.touch(ctx.session_id, state)
+        return ctx.session_id
+    except Exception as e:
+        print(f"DEBUG - Session memory tracking unavailable: {str(e)}")  # For debugging
+        return None
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), or None"""
+    try:
+        with open("/proc/self/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+_sweeper_started = False
+_sweeper_lock = threading.Lock()
+
+
+def start_session_sweeper():
+    """Measure and evict idle sessions in the background, once per process"""
+    global _sweeper_started
+    if IDLE_EVICT_SECONDS <= 0:
+        return
+    with _sweeper_lock:
+        if _sweeper_started:
+            return
+        _sweeper_started = True
+
+    def run():
+        while True:
+            time.sleep(SWEEP_SECONDS)
+            try:
+                stats = session_registry.sweep()
+                if stats["evicted"]:
+                    print(f"DEBUG - Evicted idle sessions: {stats}")  # For debugging
+            except Exception as e:
+                print(f"DEBUG - Session sweep failed: {str(e)}")  # For debugging
+
+    threading.Thread(target=run, name="session-sweeper", daemon=True).start()
@@ -0,0 +1,266 @@
+"""
+SQLite-backed cache tier shared by all worker processes on a node.
+
+Entries are pickled values with a wall-clock expiry, stored per namespace.
+Cross-process single-flight uses short-lived lock rows: the process that
+inserts the lock computes the value, the others poll for the entry until it
+appears or the lock lease runs out. Hits and misses are counted per
+namespace in the same database, so the numbers cover the whole node; each
+process buffers its counts and flushes them every few seconds or lookups, so
+reads do not queue on SQLite's writer lock.
+
+The database lives at SHARED_CACHE_PATH (default: a file in the system temp
+directory). Set SHARED_CACHE_PATH to an empty string to disable the tier.
+"""
+import atexit
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Any, Hashable, Optional, Tuple
+
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "ai_search_shared_cache.sqlite")
+LOCK_LEASE_SECONDS = 60.0
+POLL_INTERVAL_SECONDS = 0.05
+# Expired rows are purged every this many writes
+PURGE_EVERY_WRITES = 500
+# Buffered hit/miss counts are written every this many lookups or seconds
+STATS_FLUSH_EVERY = 200
+STATS_FLUSH_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS locks (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def storage_key(key: Hashable) -> str:
+    """Stable string form of a cache key, identical in every process"""
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+class SharedCacheStore:
+    """Node-wide key/value store with expiry, lock rows and per-namespace counters"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.owner = f"{os.getpid()}-{id(self)}"
+        self._local = threading.local()
+        self._writes = 0
+        # (namespace, "hits" | "misses") -> count not yet written
+        self._pending_stats: Counter = Counter()
+        self._pending_lookups = 0
+        self._stats_flushed = time.monotonic()
+        self._stats_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        # Only this user can read the pickled values
+        os.chmod(self.path, 0o600)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _read(self, namespace: str, key: str) -> Tuple[bool, Any, float]:
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, now)
+        ).fetchone()
+        if row is None:
+            return False, None, 0.0
+        return True, pickle.loads(row[0]), row[1] - now
+
+    def get(self, namespace: str, key: str, count_miss: bool = True) -> Tuple[bool, Any, float]:
+        """
+        Return (found, value, seconds until the entry expires), counting the
+        lookup against the namespace. Callers that go on to wait for another
+        process pass count_miss=False and record the outcome themselves.
+        """
+        found, value, ttl = self._read(namespace, key)
+        if found or count_miss:
+            self.record(namespace, hit=found)
+        return found, value, ttl
+
+    def set(self, namespace: str, key: str, value: Any, ttl_seconds: float):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO entries (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (namespace, key, time.time() + ttl_seconds, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        )
+        self._writes += 1
+        if self._writes % PURGE_EVERY_WRITES == 0:
+            self.purge_expired()
+
+    def delete(self, namespace: str, key: Optional[str] = None):
+        """Drop one key, or the whole namespace if no key is given"""
+        if key is None:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+        else:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def acquire(self, namespace: str, key: str, lease_seconds: float = LOCK_LEASE_SECONDS) -> bool:
+        """Try to become the one process computing this key"""
+        conn = self._conn
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # A lock whose lease ran out belongs to a worker that died or hung
+            conn.execute("DELETE FROM locks WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                         (namespace, key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO locks (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, self.owner, now + lease_seconds)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def release(self, namespace: str, key: str):
+        self._conn.execute("DELETE FROM locks WHERE namespace = ? AND key = ? AND owner = ?",
+                           (namespace, key, self.owner))
+
+    def is_locked(self, namespace: str, key: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM locks WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def wait_for(self, namespace: str, key: str, timeout: float = LOCK_LEASE_SECONDS) -> Tuple[bool, Any, float]:
+        """
+        Poll for a value another process is computing. Returns (found, value,
+        seconds until it expires); not found once the lock is gone without a
+        value or the timeout passes.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            found, value, ttl = self._read(namespace, key)
+            if found:
+                self.record(namespace, hit=True)
+                return True, value, ttl
+            if not self.is_locked(namespace, key):
+                return False, None, 0.0
+            time.sleep(POLL_INTERVAL_SECONDS)
+        return False, None, 0.0
+
+    def record(self, namespace: str, hit: bool):
+        """Count a lookup; counts are written in batches by flush_stats"""
+        with self._stats_lock:
+            self._pending_stats[(namespace, "hits" if hit else "misses")] += 1
+            self._pending_lookups += 1
+            due = (self._pending_lookups >= STATS_FLUSH_EVERY
+                   or time.monotonic() - self._stats_flushed >= STATS_FLUSH_SECONDS)
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """Write the buffered hit/miss counts in one transaction"""
+        with self._stats_lock:
+            pending, self._pending_stats = self._pending_stats, Counter()
+            self._pending_lookups = 0
+            self._stats_flushed = time.monotonic()
+        if not pending:
+            return
+        conn = self._conn
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for (namespace, column), count in pending.items():
+                conn.execute(
+                    f"INSERT INTO stats (namespace, {column}) VALUES (?, ?) "
+                    f"ON CONFLICT(namespace) DO UPDATE SET {column} = {column} + excluded.{column}",
+                    (namespace, count)
+                )
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Keep the counts for the next flush
+            with self._stats_lock:
+                self._pending_stats.update(pending)
+            raise
+
+    def stats(self, namespace: str) -> dict:
+        """Node-wide hit/miss counters and live entry count of a namespace"""
+        self.flush_stats()
+        conn = self._conn
+        row = conn.execute("SELECT hits, misses FROM stats WHERE namespace = ?", (namespace,)).fetchone()
+        hits, misses = row if row else (0, 0)
+        entries = conn.execute("SELECT COUNT(*) FROM entries WHERE namespace = ? AND expires_at > ?",
+                               (namespace, time.time())).fetchone()[0]
+        lookups = hits + misses
+        return {
+            "shared_entries": entries,
+            "shared_hits": hits,
+            "shared_misses": misses,
+            "shared_hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+        }
+
+    def purge_expired(self):
+        now = time.time()
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        self._conn.execute("DELETE FROM locks WHERE expires_at <= ?", (now,))
+
+
+def _flush_on_exit(store: SharedCacheStore):
+    try:
+        store.flush_stats()
+    except sqlite3.Error:
+        pass
+
+
+_store: Optional[SharedCacheStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_shared_store() -> Optional[SharedCacheStore]:
+    """The node's shared store, or None when disabled or unavailable"""
+    global _store, _store_failed
+    if _store is not None or _store_failed:
+        return _store
+    with _store_lock:
+        if _store is None and not _store_failed:
+            path = os.getenv("SHARED_CACHE_PATH", DEFAULT_PATH)
+            if not path:
+                _store_failed = True
+                return None
+            try:
+                _store = SharedCacheStore(path)
+                atexit.register(_flush_on_exit, _store)
+            except (sqlite3.Error, OSError) as e:
+                print(f"DEBUG - Shared cache unavailable, using per-process caches only: {str(e)}")  # For debugging
+                _store_failed = True
+    return _store
@@ -0,0 +1,170 @@
+"""
+Query suggestions backed by an Azure Search suggester.
+
+Suggestion responses are cached in a process-wide prefix trie with a TTL so
+that most lookups are answered locally without a round trip to Azure.
+
+Streamlit's text_input only reruns the script on Enter or when the box loses
+focus, so suggestions are offered for the query as submitted, not while it
+is typed. The per-caller debounce only limits suggester calls from rapid
+reruns.
+"""
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+MIN_PREFIX_LENGTH = 2
+MAX_SUGGESTIONS = 8
+MAX_TRIE_ENTRIES = 5000
+
+
+def normalize_prefix(text: str) -> str:
+    """Lower-case and collapse whitespace so equivalent prefixes share a cache entry"""
+    return re.sub(r"\s+", " ", (text or "").lower()).lstrip()
+
+
+class _TrieNode:
+    __slots__ = ("children", "suggestions", "complete", "expires_at")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.suggestions: Optional[List[str]] = None
+        self.complete = False
+        self.expires_at = 0.0
+
+
+class PrefixTrie:
+    """Thread-safe prefix trie that caches suggestion lists with a TTL"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = MAX_TRIE_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._root = _TrieNode()
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def put(self, prefix: str, suggestions: List[str], complete: bool, now: Optional[float] = None):
+        """
+        Cache the suggestions for a prefix. `complete` means the backend returned
+        fewer results than requested, so every longer prefix can be answered by
+        filtering this list locally.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self._entries >= self.max_entries:
+                # Cheap bound on memory: drop everything and start over
+                self._root = _TrieNode()
+                self._entries = 0
+            node = self._root
+            for char in prefix:
+                node = node.children.setdefault(char, _TrieNode())
+            if node.suggestions is None:
+                self._entries += 1
+            node.suggestions = list(suggestions)
+            node.complete = complete
+            node.expires_at = now + self.ttl_seconds
+
+    def lookup(self, prefix: str, now: Optional[float] = None) -> Optional[List[str]]:
+        """
+        Return cached suggestions for the prefix, either stored directly or derived
+        from the nearest complete ancestor. Returns None on a cache miss.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            node = self._root
+            derived = None
+            for char in prefix:
+                if node.suggestions is not None and node.complete and node.expires_at > now:
+                    derived = node.suggestions
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                if node.suggestions is not None and node.expires_at > now:
+                    return list(node.suggestions)
+            if derived is None:
+                return None
+            return _filter_by_prefix(derived, prefix)
+
+    def closest(self, prefix: str, now: Optional[float] = None) -> List[str]:
+        """Best-effort answer from the nearest fresh ancestor, even if it was truncated"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            node = self._root
+            best: List[str] = []
+            for char in prefix:
+                if node.suggestions is not None and node.expires_at > now:
+                    best = node.suggestions
+                node = node.children.get(char)
+                if node is None:
+                    break
+            else:
+                if node.suggestions is not None and node.expires_at > now:
+                    best = node.suggestions
+            return _filter_by_prefix(best, prefix)
+
+    def clear(self):
+        with self._lock:
+            self._root = _TrieNode()
+            self._entries = 0
+
+
+def _filter_by_prefix(suggestions: List[str], prefix: str) -> List[str]:
+    return [s for s in suggestions if normalize_prefix(s).startswith(prefix)]
+
+
+# Process-wide cache shared by every session on this worker
+_trie = PrefixTrie(ttl_seconds=float(os.getenv("SUGGESTION_TTL_SECONDS", "300")))
+# Time of each caller's last remote call, kept only while it is within the debounce window
+_last_remote_call: Dict[str, float] = {}
+_last_remote_lock = threading.Lock()
+
+
+def get_suggestions(search_client, text: str, caller: str = "default") -> List[str]:
+    """
+    Get suggestions for the text submitted so far.
+
+    Answers from the local prefix trie whenever possible. Remote calls to the
+    Azure Search suggester are debounced per caller; while debounced, the closest
+    cached answer is returned instead.
+    """
+    prefix = normalize_prefix(text)
+    if len(prefix.strip()) < MIN_PREFIX_LENGTH:
+        return []
+
+    cached = _trie.lookup(prefix)
+    if cached is not None:
+        return cached[:MAX_SUGGESTIONS]
+
+    debounce_seconds = float(os.getenv("SUGGESTION_DEBOUNCE_SECONDS", "0.3"))
+    now = time.monotonic()
+    with _last_remote_lock:
+        if now - _last_remote_call.get(caller, float("-inf")) < debounce_seconds:
+            return _trie.closest(prefix)[:MAX_SUGGESTIONS]
+        # Callers past the window no longer need an entry; sessions that ended never come back
+        for expired in [key for key, called in _last_remote_call.items() if now - called >= debounce_seconds]:
+            del _last_remote_call[expired]
+        _last_remote_call[caller] = now
+
+    try:
+        results = search_client.autocomplete(
+            text.strip(),
+            os.getenv("AZURE_SEARCH_SUGGESTER_NAME", "sg"),
+            mode="oneTermWithContext",
+            top=MAX_SUGGESTIONS
+        )
+        suggestions = []
+        for result in results:
+            suggestion = result.get("query_plus_text") or result.get("text")
+            if suggestion and suggestion not in suggestions:
+                suggestions.append(suggestion)
+    except Exception as e:
+        print(f"Suggestion lookup failed: {e}")  # For debugging
+        # Cache the miss so a broken suggester is not hammered on every rerun
+        _trie.put(prefix, [], complete=False)
+        return []
+
+    _trie.put(prefix, suggestions, complete=len(suggestions) < MAX_SUGGESTIONS)
+    return suggestions
@@ -0,0 +1,104 @@
+"""
+Durable store of generated document summaries.
+
+Summaries are kept in SQLite (SUMMARY_STORE_PATH, default
+data/summaries.sqlite; an empty value disables the store) keyed by document
+name and a digest of its content, so an edited document is summarized
+again. The store outlives cache TTLs and restarts. It is filled on demand by
+get_summary and in bulk by presummarize.py.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+DEFAULT_PATH = os.path.join("data", "summaries.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    doc_name TEXT NOT NULL,
+    content_digest TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (doc_name, content_digest)
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def content_digest(content: str) -> str:
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+class SummaryStore:
+    """Summaries by (document name, content digest), plus job metadata such as watermarks"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._conn.executescript(_SCHEMA)
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, doc_name: str, digest: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT summary FROM summaries WHERE doc_name = ? AND content_digest = ?", (doc_name, digest)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, doc_name: str, digest: str, summary: str, model: Optional[str] = None):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO summaries (doc_name, content_digest, summary, model, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (doc_name, digest, summary, model, time.time())
+        )
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+
+_store: Optional[SummaryStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_summary_store() -> Optional[SummaryStore]:
+    """The configured summary store, or None when disabled or unavailable"""
+    global _store, _store_failed
+    if _store is not None or _store_failed:
+        return _store
+    with _store_lock:
+        if _store is None and not _store_failed:
+            path = os.getenv("SUMMARY_STORE_PATH", DEFAULT_PATH)
+            if not path:
+                _store_failed = True
+                return None
+            try:
+                _store = SummaryStore(path)
+            except (sqlite3.Error, OSError) as e:
+                print(f"DEBUG - Summary store unavailable: {str(e)}")  # For debugging
+                _store_failed = True
+    return _store
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# The app's modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep tests off the node-wide cache and summary databases
+os.environ.setdefault("SHARED_CACHE_PATH", "")
+os.environ.setdefault("SUMMARY_STORE_PATH", "")
@@ -0,0 +1,82 @@
+import numpy as np
+
+from dedup import (
+    NUM_PERMUTATIONS, CanonicalDocumentIndex, cluster_near_duplicates, find_near_duplicates,
+    find_related_near_duplicates, similarity, text_signature,
+)
+
+REPORT = ("the annual report of the finance department covers revenue expenses and the audit "
+          "of every regional office for the fiscal year ending in june ") * 3
+
+
+def test_identical_text_has_identical_signatures():
+    assert similarity(text_signature(REPORT), text_signature(REPORT.upper())) == 1.0
+
+
+def test_near_duplicate_text_is_similar_and_different_text_is_not():
+    signature = text_signature(REPORT)
+    assert similarity(signature, text_signature(REPORT + " page 2")) >= 0.8
+    assert similarity(signature, text_signature("minutes of the board meeting held on monday " * 3)) < 0.2
+
+
+def test_signature_length():
+    assert text_signature(REPORT).shape == (NUM_PERMUTATIONS,)
+
+
+def test_empty_and_short_text_have_no_signature():
+    assert text_signature("") is None
+    assert text_signature("two words") is None
+
+
+def test_empty_documents_are_not_clustered():
+    documents = [
+        {'DocumentName': 'empty-1.pdf', 'merged_content': ''},
+        {'DocumentName': 'empty-2.pdf'},
+        {'DocumentName': 'short.pdf', 'merged_content': 'page 1'},
+        {'DocumentName': 'short-copy.pdf', 'merged_content': 'page 1'},
+    ]
+    assert find_near_duplicates(documents) == {}
+
+
+def test_related_documents_without_entities_are_not_clustered():
+    assert find_related_near_duplicates([{'matched_entities': {}}, {'matched_entities': None}]) == {}
+
+
+def test_near_duplicates_cluster_under_the_first_document():
+    documents = [
+        {'DocumentName': 'other.pdf', 'merged_content': "minutes of the board meeting held on monday " * 3},
+        {'DocumentName': 'report.pdf', 'merged_content': REPORT},
+        {'DocumentName': 'report-scan.pdf', 'merged_content': REPORT + " page 2"},
+    ]
+    assert find_near_duplicates(documents) == {1: [2]}
+
+
+def test_clusters_do_not_chain():
+    # B is similar to A and C to B, but C is not similar to A
+    first = np.arange(NUM_PERMUTATIONS, dtype=np.uint64)
+    second = first.copy()
+    second[:12] += 1000
+    third = second.copy()
+    third[-12:] += 1000
+    assert similarity(first, second) >= 0.8 and similarity(second, third) >= 0.8
+    assert similarity(first, third) < 0.8
+    assert cluster_near_duplicates([first, second, third]) == {0: [1]}
+
+
+def test_missing_signatures_are_skipped():
+    signature = np.arange(NUM_PERMUTATIONS, dtype=np.uint64)
+    assert cluster_near_duplicates([None, signature, None, signature.copy()]) == {1: [3]}
+
+
+def test_canonical_is_the_smallest_similar_name():
+    index = CanonicalDocumentIndex()
+    signature = text_signature(REPORT)
+    assert index.canonical("b.pdf", signature, "digest-b") == ("b.pdf", "digest-b")
+    assert index.canonical("a.pdf", text_signature(REPORT + " page 2"), "digest-a") == ("a.pdf", "digest-a")
+    assert index.canonical("b.pdf", signature, "digest-b") == ("a.pdf", "digest-a")
+
+
+def test_documents_without_signature_are_their_own_canonical():
+    index = CanonicalDocumentIndex()
+    assert index.canonical("empty-1.pdf", None, "d41d8") == ("empty-1.pdf", "d41d8")
+    assert index.canonical("empty-2.pdf", None, "d41d8") == ("empty-2.pdf", "d41d8")
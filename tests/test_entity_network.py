@@ -0,0 +1,59 @@
+import entity_network
+from entity_network import DOCUMENT_KIND, build_network, get_layout, graph_key, network_documents, node_id
+from graph_explore import PEOPLE_LABEL, build_related_documents_query
+
+SELECTED = {PEOPLE_LABEL: {"Alice"}}
+
+
+def document(name, people):
+    return {'document': name, 'library': 'HR', 'matched_entities': {PEOPLE_LABEL: people}}
+
+
+DOCUMENTS = [
+    document("a.pdf", ["Bob", "Carol"]),
+    document("b.pdf", ["Alice", "Bob"]),
+    document("c.pdf", ["Alice", "Bob", "Dave", "Erin"]),
+    document("d.pdf", ["Bob", "Frank"]),
+]
+
+
+def test_document_cap_keeps_the_best_matches():
+    graph = build_network(DOCUMENTS, SELECTED, max_documents=2)
+    assert network_documents(graph) == ["b.pdf", "c.pdf"]
+
+
+def test_entity_cap_keeps_selected_then_most_shared():
+    graph = build_network(DOCUMENTS, SELECTED, max_entities=2)
+    entities = {data['name'] for _, data in graph.nodes(data=True) if data['kind'] != DOCUMENT_KIND}
+    assert entities == {"Alice", "Bob"}
+    assert graph.nodes[node_id(PEOPLE_LABEL, "Alice")]['selected']
+
+
+def test_graph_key_ignores_input_order():
+    assert graph_key(build_network(DOCUMENTS, SELECTED)) == graph_key(build_network(DOCUMENTS[::-1], SELECTED))
+
+
+def test_graph_key_changes_with_an_edge():
+    changed = DOCUMENTS[:-1] + [document("d.pdf", ["Bob", "Carol"])]
+    assert graph_key(build_network(DOCUMENTS, SELECTED)) != graph_key(build_network(changed, SELECTED))
+
+
+def test_layout_is_computed_once_per_graph(monkeypatch):
+    calls = []
+    compute_layout = entity_network.compute_layout
+    monkeypatch.setattr(entity_network, "compute_layout", lambda graph: calls.append(1) or compute_layout(graph))
+    graph = build_network(DOCUMENTS + [document("layout-test.pdf", ["Grace"])], SELECTED)
+    positions = get_layout(graph)
+    assert set(positions) == set(graph.nodes)
+    assert get_layout(build_network(DOCUMENTS[::-1] + [document("layout-test.pdf", ["Grace"])], SELECTED)) == positions
+    assert len(calls) == 1
+
+
+def test_empty_graph_has_no_layout():
+    assert get_layout(build_network([], SELECTED)) == {}
+
+
+def test_ranked_query_orders_before_the_limit():
+    query = build_related_documents_query(SELECTED, limit=200, ranked=True)
+    assert query.index(".order().by(out('mentions').or(") < query.index(".limit(200)")
+    assert ".order()" not in build_related_documents_query(SELECTED, limit=200)
@@ -0,0 +1,94 @@
+import pytest
+
+from library_schema import FieldCapability, FilterError, compile_filter, odata_string
+
+NOT_FILTERABLE = FieldCapability("Edm.String", False, False)
+
+
+def test_library_only():
+    assert compile_filter("HR", {}) == "Library eq 'HR'"
+
+
+def test_no_library_no_filter():
+    assert compile_filter(None, {"Department_HR": "IT"}) is None
+
+
+def test_empty_values_are_skipped():
+    assert compile_filter("HR", {"Department_HR": " , ", "Date_HR": ("", None)}) == "Library eq 'HR'"
+
+
+@pytest.mark.parametrize("value, literal", [
+    ("plain", "'plain'"),
+    ("O'Brien", "'O''Brien'"),
+    ("''", "''''''"),
+])
+def test_string_literals_double_single_quotes(value, literal):
+    assert odata_string(value) == literal
+
+
+def test_quotes_are_escaped_in_values_and_library():
+    assert compile_filter("HR", {"Department_HR": "R&D's"}) == "Library eq 'HR' and Department_HR eq 'R&D''s'"
+
+
+def test_several_exact_values_use_search_in():
+    assert compile_filter("HR", {"Department_HR": "IT, Finance"}) == \
+        "Library eq 'HR' and search.in(Department_HR, 'IT|Finance', '|')"
+
+
+def test_numeric_fields_use_typed_literals():
+    capabilities = {"Employee_No_HR": FieldCapability("Edm.Int64", True, False)}
+    assert compile_filter("HR", {"Employee_No_HR": "12, 15.0"}, capabilities) == \
+        "Library eq 'HR' and (Employee_No_HR eq 12 or Employee_No_HR eq 15)"
+    with pytest.raises(FilterError):
+        compile_filter("HR", {"Employee_No_HR": "twelve"}, capabilities)
+
+
+def test_string_range():
+    assert compile_filter("HR", {"Date_HR": ("2020", "2021-06-30")}) == \
+        "Library eq 'HR' and (Date_HR ge '2020' and Date_HR le '2021-06-30')"
+
+
+def test_open_ended_range():
+    assert compile_filter("HR", {"Date_HR": ("", "2021")}) == "Library eq 'HR' and Date_HR le '2021'"
+
+
+def test_date_range_on_a_date_field():
+    capabilities = {"Date_HR": FieldCapability("Edm.DateTimeOffset", True, False)}
+    assert compile_filter("HR", {"Date_HR": ("2020-01-01", "")}, capabilities) == \
+        "Library eq 'HR' and Date_HR ge 2020-01-01T00:00:00Z"
+    with pytest.raises(FilterError):
+        compile_filter("HR", {"Date_HR": ("01/02/2020", "")}, capabilities)
+
+
+def test_number_range_rejects_text():
+    capabilities = {"Year_Ayala_Annual_Report": FieldCapability("Edm.Int32", True, False)}
+    assert compile_filter("Ayala_Annual_Report", {"Year_Ayala_Annual_Report": ("2019", "2021")}, capabilities) == \
+        "Library eq 'Ayala_Annual_Report' and (Year_Ayala_Annual_Report ge 2019 and Year_Ayala_Annual_Report le 2021)"
+    with pytest.raises(FilterError):
+        compile_filter("Ayala_Annual_Report", {"Year_Ayala_Annual_Report": ("last year", "")}, capabilities)
+
+
+def test_searchable_only_fields_fall_back_to_ismatch():
+    assert compile_filter("HR", {"Name_HR": 'Ann "Lee", O\'Neil'}) == \
+        "Library eq 'HR' and search.ismatch('\"Ann Lee\" | \"O''Neil\"', 'Name_HR')"
+
+
+def test_live_capabilities_override_declared_flags():
+    capabilities = {"Department_HR": FieldCapability("Edm.String", False, True)}
+    assert compile_filter("HR", {"Department_HR": "IT"}, capabilities) == \
+        "Library eq 'HR' and search.ismatch('\"IT\"', 'Department_HR')"
+
+
+def test_unfilterable_text_field_raises():
+    with pytest.raises(FilterError):
+        compile_filter("HR", {"Department_HR": "IT"}, {"Department_HR": NOT_FILTERABLE})
+
+
+def test_unfilterable_range_field_raises():
+    with pytest.raises(FilterError):
+        compile_filter("HR", {"Date_HR": ("2020", "")}, {"Date_HR": NOT_FILTERABLE})
+
+
+def test_unfilterable_library_raises():
+    with pytest.raises(FilterError):
+        compile_filter("HR", {}, {"Library": NOT_FILTERABLE})
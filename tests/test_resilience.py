@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from resilience import (
+    MIN_HEDGE_SAMPLES, Backend, BackendTimeout, CircuitBreaker, CircuitOpenError, gremlin_backend, search_backend,
+)
+
+
+class ClientError(Exception):
+    status_code = 400
+
+
+def fail(error=RuntimeError("backend down")):
+    def func():
+        raise error
+    return func
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_call_times_out_at_the_deadline():
+    backend = Backend("slow", deadline_seconds=0.05, failure_threshold=1)
+    started = time.monotonic()
+    with pytest.raises(BackendTimeout):
+        backend.call(lambda: time.sleep(0.5))
+    assert time.monotonic() - started < 0.4
+    assert backend.breaker.state == "open"
+
+
+def test_open_breaker_fails_fast_without_calling():
+    backend = Backend("down", deadline_seconds=1, failure_threshold=1)
+    with pytest.raises(RuntimeError):
+        backend.call(fail())
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        backend.call(lambda: calls.append(1))
+    assert calls == []
+
+
+def test_client_errors_do_not_trip_the_breaker():
+    backend = Backend("healthy", deadline_seconds=1, failure_threshold=1)
+    with pytest.raises(ClientError):
+        backend.call(fail(ClientError("bad query")))
+    assert backend.breaker.state == "closed"
+
+
+def test_slow_first_attempt_is_hedged():
+    backend = Backend("hedged", deadline_seconds=2, hedge=True)
+    for _ in range(MIN_HEDGE_SAMPLES):
+        backend._record_success(0.01)
+    attempts = []
+    lock = threading.Lock()
+
+    def func():
+        with lock:
+            attempts.append(1)
+            first = len(attempts) == 1
+        if first:
+            time.sleep(1)
+            return "slow"
+        return "fast"
+
+    assert backend.call(func) == "fast"
+    assert backend.hedges_sent == 1 and backend.hedges_won == 1
+
+
+def test_no_hedge_without_enough_samples():
+    backend = Backend("cold", deadline_seconds=1, hedge=True)
+    assert backend.hedge_delay() is None
+    assert backend.call(lambda: "ok") == "ok"
+    assert backend.hedges_sent == 0
+
+
+def test_backends_have_their_own_pools():
+    assert search_backend._pool is not gremlin_backend._pool
+
+
+def test_stalled_backend_does_not_block_another():
+    stalled = Backend("stalled", deadline_seconds=0.05, pool_workers=1)
+    other = Backend("other", deadline_seconds=1, pool_workers=1)
+    release = threading.Event()
+    try:
+        with pytest.raises(BackendTimeout):
+            stalled.call(release.wait)
+        assert other.call(lambda: "ok") == "ok"
+    finally:
+        release.set()
@@ -0,0 +1,56 @@
+from result_set import UNKNOWN_LIBRARY, ResultSet, document_key
+
+
+def make_documents():
+    return [
+        {"Library": "HR", "DocumentName": "a.pdf"},
+        {"Library": "Finance", "DocumentName": "b.pdf"},
+        {"Library": "HR", "DocumentName": "a.pdf"},
+        {"DocumentName": "c.pdf"},
+        {"Library": "HR", "DocumentName": "a.pdf"},
+    ]
+
+
+def test_keys_are_unique_and_stable():
+    results = ResultSet(make_documents())
+    assert results.keys == ("HR/a.pdf", "Finance/b.pdf", "HR/a.pdf#1", f"{UNKNOWN_LIBRARY}/c.pdf", "HR/a.pdf#2")
+    assert ResultSet(make_documents()).keys == results.keys
+
+
+def test_get_returns_the_document_of_each_key():
+    documents = make_documents()
+    results = ResultSet(documents)
+    for key, doc in zip(results.keys, documents):
+        assert results.get(key) is doc
+    assert results.get(None) is None
+    assert results.get("HR/missing.pdf") is None
+
+
+def test_slices_follow_first_appearance_and_keep_keys_aligned():
+    documents = make_documents()
+    results = ResultSet(documents)
+    assert list(results.libraries) == ["HR", "Finance", UNKNOWN_LIBRARY]
+
+    hr = results.libraries["HR"]
+    assert hr.documents == (documents[0], documents[2], documents[4])
+    assert hr.keys == ("HR/a.pdf", "HR/a.pdf#1", "HR/a.pdf#2")
+    for key, doc in zip(hr.keys, hr.documents):
+        assert results.get(key) is doc
+
+
+def test_empty_result_set():
+    results = ResultSet([])
+    assert len(results) == 0
+    assert results.keys == ()
+    assert dict(results.libraries) == {}
+
+
+def test_document_key_defaults():
+    assert document_key({}) == f"{UNKNOWN_LIBRARY}/"
+
+
+def test_frame_is_built_once_per_library():
+    results = ResultSet(make_documents())
+    frame = results.frame("HR")
+    assert results.frame("HR") is frame
+    assert list(frame.index) == [0, 1, 2]
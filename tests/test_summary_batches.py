@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+import pytest
+
+import groq_analyzer
+from groq_analyzer import (
+    BATCH_COMPLETION_TOKENS, BATCH_PROMPT_OVERHEAD_TOKENS, MAX_BATCHED_DOCUMENT_TOKENS, pack_batches,
+    parse_batch_summaries
+)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One prompt token per word, so sizes do not depend on the tokenizer"""
+    monkeypatch.setattr(groq_analyzer, "compact_content",
+                        lambda content: SimpleNamespace(tokens=len(content.split()), text=content))
+
+
+def document(key, words):
+    return key, " ".join(["word"] * words)
+
+
+def cost(words):
+    # Documents under 500 words get three summary points
+    return words + BATCH_COMPLETION_TOKENS["three"]
+
+
+def keys(batches):
+    return [[key for key, _ in batch] for batch in batches]
+
+
+def test_first_fit_decreasing():
+    documents = [document("small", 100), document("large", 400), document("medium", 300), document("tiny", 50)]
+    budget = BATCH_PROMPT_OVERHEAD_TOKENS + cost(400) + cost(100)
+    batches = pack_batches(documents, token_budget=budget)
+    # Largest first; each document goes into the first batch it fits
+    assert keys(batches) == [["large", "small"], ["medium", "tiny"]]
+
+
+def test_batches_stay_within_budget_and_keep_every_document():
+    documents = [document(f"doc{i}", 20 + 37 * i % 400) for i in range(30)]
+    budget = 2000
+    batches = pack_batches(documents, token_budget=budget, max_documents=5)
+    assert sorted(key for batch in keys(batches) for key in batch) == sorted(key for key, _ in documents)
+    for batch in batches:
+        assert len(batch) <= 5
+        assert BATCH_PROMPT_OVERHEAD_TOKENS + sum(cost(len(content.split())) for _, content in batch) <= budget
+
+
+def test_oversize_documents_are_sent_alone():
+    documents = [document("huge", MAX_BATCHED_DOCUMENT_TOKENS + 1), document("a", 10), document("b", 10)]
+    batches = pack_batches(documents)
+    assert ["huge"] in keys(batches)
+    assert sorted(keys(batches)) == [["a", "b"], ["huge"]]
+
+
+def test_document_larger_than_the_budget_gets_its_own_batch():
+    batches = pack_batches([document("a", 300), document("b", 300)], token_budget=100)
+    assert sorted(keys(batches)) == [["a"], ["b"]]
+
+
+def test_no_documents():
+    assert pack_batches([]) == []
+
+
+DOCUMENTS = [("a", "first"), ("b", "second"), ("c", "third")]
+
+
+def test_parse_summaries_by_position():
+    reply = '{"1": "Summary A", "2": ["point one", "- point two"], "3": "  "}'
+    assert parse_batch_summaries(reply, DOCUMENTS) == {
+        "a": "Summary A",
+        "b": "- point one\n- point two",
+    }
+
+
+@pytest.mark.parametrize("reply", [
+    None,
+    "",
+    "not json",
+    '{"1": "cut off',
+    '["Summary A", "Summary B"]',
+    '"Summary A"',
+])
+def test_malformed_replies_give_no_summaries(reply):
+    assert parse_batch_summaries(reply, DOCUMENTS) == {}
+
+
+def test_unexpected_entries_are_ignored():
+    reply = '{"1": 42, "2": {"text": "nested"}, "4": "extra", "3": "Summary C"}'
+    assert parse_batch_summaries(reply, DOCUMENTS) == {"c": "Summary C"}
@@ -0,0 +1,147 @@
+"""
+Cache warm-up from the query log.
+
+Replays the most popular searches (with their filters) and related-document
+entity selections into the shared caches, then pre-generates summaries for
+the top documents of those searches. The job stops at whichever limit comes first: wall
+time, Gremlin RU spent or number of Groq summaries generated.
+
+The app runs it once per node in a background thread at startup (disable
+with WARM_UP_ON_STARTUP=0). It can also be run by hand:
+
+    python warm_up.py --top-k 50 --max-seconds 120 --max-ru 5000 --max-summaries 20
+"""
+import argparse
+import os
+import threading
+import time
+from typing import Optional
+
+from caches import summary_cache
+from dedup import cluster_summary_key
+from groq_analyzer import DEFAULT_MODEL_NAME, GroqAnalyzer, get_summary
+from query_log import popular_entity_sets, popular_queries, read_records
+from search_core import create_gremlin_client, create_search_client, fetch_related_documents, search_with_fallback
+from shared_cache import get_shared_store
+
+DEFAULT_TOP_K = int(os.getenv("WARM_UP_TOP_K", "50"))
+DEFAULT_MAX_SECONDS = float(os.getenv("WARM_UP_MAX_SECONDS", "120"))
+DEFAULT_MAX_RU = float(os.getenv("WARM_UP_MAX_RU", "5000"))
+DEFAULT_MAX_SUMMARIES = int(os.getenv("WARM_UP_MAX_SUMMARIES", "20"))
+# Documents per popular query whose summaries are pre-generated
+SUMMARIES_PER_QUERY = 3
+
+
+def warm_up(search_client, gremlin_client, analyzer: Optional[GroqAnalyzer],
+            top_k: int = DEFAULT_TOP_K, max_seconds: float = DEFAULT_MAX_SECONDS,
+            max_ru: float = DEFAULT_MAX_RU, max_summaries: int = DEFAULT_MAX_SUMMARIES) -> dict:
+    """Replay popular queries into the caches within the limits. Returns counters."""
+    deadline = time.monotonic() + max_seconds
+    records = list(read_records())
+    stats = {"searches": 0, "related": 0, "ru_spent": 0.0, "summaries": 0, "errors": 0}
+
+    # Searches first: they are cheap and their results pick the documents to summarize
+    search_results = []
+    for query, search_filter, _ in popular_queries(records, top_k):
+        if time.monotonic() >= deadline:
+            return stats
+        try:
+            # Re-ranking happens after the cache, so the filter is all that makes up the key
+            search_results.append(search_with_fallback(search_client, query, filter=search_filter)[0])
+            stats["searches"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"DEBUG - Warm-up search failed for {query!r}: {str(e)}")  # For debugging
+
+    for entities, _ in popular_entity_sets(records, top_k):
+        if time.monotonic() >= deadline or stats["ru_spent"] >= max_ru:
+            break
+        try:
+            # Same plan as a fresh session, so the cached result is the one users hit
+            _, cost, _ = fetch_related_documents(gremlin_client, entities)
+            stats["ru_spent"] += cost["request_charge"]
+            stats["related"] += 1
+        except Exception as e:
+            stats["errors"] += 1
+            print(f"DEBUG - Warm-up related lookup failed: {str(e)}")  # For debugging
+
+    if analyzer is None:
+        return stats
+    for results in search_results:
+        for doc in results[:SUMMARIES_PER_QUERY]:
+            if time.monotonic() >= deadline or stats["summaries"] >= max_summaries:
+                return stats
+            key = cluster_summary_key(doc)
+            if summary_cache.get(key)[0]:
+                continue
+            try:
+                get_summary(analyzer, doc.get('DocumentName'), doc.get('merged_content') or '', cache_key=key)
+                stats["summaries"] += 1
+            except Exception as e:
+                stats["errors"] += 1
+                print(f"DEBUG - Warm-up summary failed: {str(e)}")  # For debugging
+    return stats
+
+
+def run_warm_up(**limits) -> dict:
+    """Warm up with freshly created clients"""
+    search_client = create_search_client()
+    gremlin_client = create_gremlin_client()
+    analyzer = GroqAnalyzer(api_key=os.getenv("GROQ_API_KEY"), model_name=DEFAULT_MODEL_NAME) \
+        if os.getenv("GROQ_API_KEY") else None
+    try:
+        return warm_up(search_client, gremlin_client, analyzer, **limits)
+    finally:
+        gremlin_client.close()
+
+
+_started = False
+_started_lock = threading.Lock()
+
+
+def start_background_warm_up():
+    """
+    Start the warm-up once per process. With the shared cache tier enabled,
+    only the worker holding the warm-up lock runs it; the lock is released
+    when the run ends, and later workers find the caches already warm.
+    """
+    global _started
+    if os.getenv("WARM_UP_ON_STARTUP", "1") == "0":
+        return
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+
+    def run():
+        store = get_shared_store()
+        locked = False
+        try:
+            if store is not None:
+                locked = store.acquire("warm_up", "startup", lease_seconds=DEFAULT_MAX_SECONDS)
+                if not locked:
+                    return
+            stats = run_warm_up()
+            print(f"DEBUG - Cache warm-up finished: {stats}")  # For debugging
+        except Exception as e:
+            print(f"DEBUG - Cache warm-up failed: {str(e)}")  # For debugging
+        finally:
+            if locked:
+                try:
+                    store.release("warm_up", "startup")
+                except Exception:
+                    # The lease expires on its own
+                    pass
+
+    threading.Thread(target=run, name="cache-warm-up", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm the shared caches from the query log")
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help="Popular queries and entity sets to replay")
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS)
+    parser.add_argument("--max-ru", type=float, default=DEFAULT_MAX_RU, help="Gremlin RU budget")
+    parser.add_argument("--max-summaries", type=int, default=DEFAULT_MAX_SUMMARIES, help="Groq summaries to generate")
+    args = parser.parse_args()
+    print(run_warm_up(top_k=args.top_k, max_seconds=args.max_seconds,
+                      max_ru=args.max_ru, max_summaries=args.max_summaries))